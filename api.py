@@ -0,0 +1,276 @@
+"""Headless HTTP API over the CV generation backend
+
+Run it with `python -m cvolve api` (or `uvicorn api:app`). Requests authenticate with an X-API-Key header;
+keys are mapped to user emails in CVOLVE_API_KEYS ("key1:alice@example.com,key2:batch@example.com"),
+so rate limits, credits and generation history apply to the API exactly as they do to the Streamlit UI.
+Every route but /healthz requires a key, /metrics included; scrapers that can't send one should use the
+loopback endpoint started with METRICS_PORT instead.
+"""
+import os
+import hmac
+import time
+import hashlib
+import threading
+from typing import Dict, Literal, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import anyio
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+from database import init_db, reserve_credit, commit_reservation, release_reservation, save_cv_generation
+from payment import check_subscription
+from cv_generator import (
+    StructuredCV, generate_cv_document, generate_cover_letter, generate_interview_qa, build_cover_letter_prompt,
+    build_interview_qa_prompt, stream_generate_text
+)
+from templates import get_available_templates, apply_template, create_word_document
+from rate_limiter import get_rate_limiter
+from tracing import trace
+from metrics import render_metrics, timed, RENDER_SECONDS, EXPORT_CACHE_REQUESTS, HANDLED_ERRORS
+from utils import optimize_keywords, calculate_ats_score
+from keywords import get_background
+
+# "key:email" pairs accepted in the X-API-Key header
+API_KEYS = dict(
+    pair.strip().split(":", 1) for pair in os.getenv("CVOLVE_API_KEYS", "").split(",") if ":" in pair
+)
+
+# Charge credits for LLM actions, as in the Streamlit app
+CREDIT_CHECK_ENABLED = os.getenv("CREDIT_CHECK_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Threads available to blocking LLM, database and render calls (shared by every request)
+API_WORKER_THREADS = int(os.getenv("API_WORKER_THREADS", "40"))
+
+# Rendered PDF/DOCX exports kept in memory, keyed by content, template and format
+EXPORT_CACHE_SIZE = 64
+
+DEFAULT_SECTIONS = {
+    "Professional Summary": True, "Key Skills": True, "Work Experience": True, "Education": True,
+    "Certifications": True, "Projects": True, "Awards": False, "Languages": False
+}
+
+_export_cache = OrderedDict()
+_export_cache_lock = threading.Lock()
+
+class CVRequest(BaseModel):
+    resume_text: str = Field(min_length=1)
+    job_description: str = Field(min_length=1)
+    target_match: int = Field(90, ge=50, le=100)
+    template: str = "professional"
+    sections: Dict[str, bool] = Field(default_factory=lambda: dict(DEFAULT_SECTIONS))
+    generation_mode: Literal["standard", "structured", "parallel"] = "standard"
+
+class CVResponse(BaseModel):
+    cv_text: str
+    structured_cv: Optional[StructuredCV] = None
+    ats_score: int
+    generation_id: Optional[int] = None
+    stage_timings: Dict[str, float]
+
+class DocumentRequest(BaseModel):
+    resume_text: str = Field(min_length=1)
+    job_description: str = Field(min_length=1)
+
+class KeywordRequest(BaseModel):
+    cv_text: str = Field(min_length=1)
+    job_description: str = Field(min_length=1)
+    target_match: Optional[int] = Field(None, ge=0, le=100)
+
+class RenderRequest(BaseModel):
+    cv_text: Optional[str] = None
+    structured_cv: Optional[StructuredCV] = None
+    template: str = "professional"
+    format: Literal["pdf", "docx"] = "pdf"
+
+@asynccontextmanager
+async def lifespan(app):
+    init_db()
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_WORKER_THREADS
+    # Map the keyword statistics before the first request rather than during it
+    get_background()
+    yield
+
+app = FastAPI(title="CVOLVE PRO API", version="1", lifespan=lifespan)
+
+def authenticate(x_api_key: str = Header(default="")):
+    """Map the X-API-Key header to the user email it was issued to"""
+    for key, email in API_KEYS.items():
+        if x_api_key and hmac.compare_digest(x_api_key, key):
+            return email
+    raise HTTPException(status_code=401, detail="Invalid or missing API key")
+
+def admit(user_email, action):
+    """Apply the rate limits and reserve a credit; return the reservation ID (None if nothing was reserved)"""
+    result = get_rate_limiter().acquire(user_email, action)
+    if not result.allowed:
+        raise HTTPException(
+            status_code=429, detail=result.message, headers={"Retry-After": str(max(1, int(result.retry_after + 0.999)))}
+        )
+
+    if not CREDIT_CHECK_ENABLED or check_subscription(user_email):
+        return None
+    reservation_id = reserve_credit(user_email, 1, action)
+    if reservation_id is None:
+        raise HTTPException(status_code=402, detail="Insufficient credits")
+    return reservation_id
+
+def settle(reservation_id, success):
+    """Keep a reserved credit after a successful call, or refund it after a failure"""
+    if reservation_id is None:
+        return
+    try:
+        if success:
+            commit_reservation(reservation_id)
+        else:
+            release_reservation(reservation_id)
+    except Exception as e:
+        HANDLED_ERRORS.inc(where="api_settle_credit")
+
+async def run_charged(user_email, action, fn, *args, **kwargs):
+    """Run a blocking LLM call in the worker threads, charging a credit only if it succeeds"""
+    reservation_id = await run_in_threadpool(admit, user_email, action)
+    try:
+        result = await run_in_threadpool(fn, *args, **kwargs)
+    except Exception as e:
+        await run_in_threadpool(settle, reservation_id, False)
+        raise HTTPException(status_code=502, detail=str(e))
+    await run_in_threadpool(settle, reservation_id, True)
+    return result
+
+def stream_charged(reservation_id, chunks):
+    """Pass streamed chunks through, settling the credit once the stream finishes or is abandoned"""
+    success = False
+    try:
+        yield from chunks
+        success = True
+    finally:
+        settle(reservation_id, success)
+
+def strip_markdown_emphasis(chunks):
+    """Drop the markdown bold/italic markers generate_cover_letter removes from the full text"""
+    for chunk in chunks:
+        yield chunk.replace("*", "")
+
+def generate_and_record(user_email, request):
+    """Generate a CV and save it to the user's generation history"""
+    started = time.time()
+    with trace() as generation_trace:
+        cv_text, structured_cv = generate_cv_document(
+            request.resume_text, request.job_description, request.target_match,
+            request.template, request.sections, generation_mode=request.generation_mode
+        )
+    ats_score = calculate_ats_score(cv_text, request.job_description)
+    stage_timings = generation_trace.as_dict()
+
+    generation_id = None
+    try:
+        generation_id = save_cv_generation(
+            user_email, request.job_description, request.resume_text, cv_text, request.template,
+            ats_score, request.target_match, time.time() - started, stage_timings
+        )
+    except Exception as e:
+        # History is best effort; the CV itself is returned either way
+        HANDLED_ERRORS.inc(where="api_record_cv_generation")
+
+    return CVResponse(
+        cv_text=cv_text, structured_cv=structured_cv, ats_score=ats_score,
+        generation_id=generation_id, stage_timings=stage_timings
+    )
+
+def render_export(request):
+    """Render a CV export once per content, template and format, reusing it across requests"""
+    content_key = request.structured_cv.model_dump_json() if request.structured_cv else request.cv_text
+    cache_key = hashlib.sha256(f"{request.format}|{request.template}|{content_key}".encode("utf-8")).hexdigest()
+
+    with _export_cache_lock:
+        if cache_key in _export_cache:
+            _export_cache.move_to_end(cache_key)
+            EXPORT_CACHE_REQUESTS.inc(result="hit")
+            return _export_cache[cache_key]
+    EXPORT_CACHE_REQUESTS.inc(result="miss")
+
+    if request.format == "pdf":
+        buffer = apply_template(request.structured_cv or request.cv_text.replace("**", ""), request.template)
+    else:
+        cv_text = request.cv_text or request.structured_cv.to_text()
+        with timed(RENDER_SECONDS, format="docx", template="word"):
+            buffer = create_word_document(cv_text)
+
+    with _export_cache_lock:
+        _export_cache[cache_key] = buffer.getvalue()
+        while len(_export_cache) > EXPORT_CACHE_SIZE:
+            _export_cache.popitem(last=False)
+        return _export_cache[cache_key]
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(user_email: str = Depends(authenticate)):
+    """Prometheus metrics; they expose traffic, latency and error counts, so they need a key like the other routes"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/v1/templates")
+async def list_templates(user_email: str = Depends(authenticate)):
+    return get_available_templates()
+
+@app.post("/v1/cv", response_model=CVResponse)
+async def create_cv(request: CVRequest, user_email: str = Depends(authenticate)):
+    """Generate a tailored CV"""
+    return await run_charged(user_email, "cv", generate_and_record, user_email, request)
+
+@app.post("/v1/cover-letter")
+async def create_cover_letter(request: DocumentRequest, stream: bool = Query(False),
+                              user_email: str = Depends(authenticate)):
+    """Generate a cover letter, optionally streamed as plain text while it is written"""
+    if not stream:
+        cover_letter = await run_charged(
+            user_email, "cover_letter", generate_cover_letter, request.resume_text, request.job_description
+        )
+        return {"cover_letter": cover_letter}
+
+    reservation_id = await run_in_threadpool(admit, user_email, "cover_letter")
+    chunks = stream_generate_text(build_cover_letter_prompt(request.resume_text, request.job_description), call="cover_letter")
+    return StreamingResponse(stream_charged(reservation_id, strip_markdown_emphasis(chunks)), media_type="text/plain; charset=utf-8")
+
+@app.post("/v1/interview-qa")
+async def create_interview_qa(request: DocumentRequest, stream: bool = Query(False),
+                              user_email: str = Depends(authenticate)):
+    """Generate interview questions and answers, optionally streamed as plain text while they are written"""
+    if not stream:
+        qa_content = await run_charged(
+            user_email, "interview_qa", generate_interview_qa, request.resume_text, request.job_description
+        )
+        return {"qa_content": qa_content}
+
+    reservation_id = await run_in_threadpool(admit, user_email, "interview_qa")
+    chunks = stream_generate_text(build_interview_qa_prompt(request.resume_text, request.job_description), call="interview_qa")
+    return StreamingResponse(stream_charged(reservation_id, chunks), media_type="text/plain; charset=utf-8")
+
+@app.post("/v1/keywords")
+async def analyze_keywords(request: KeywordRequest, user_email: str = Depends(authenticate)):
+    """Keyword match and ATS analysis of a CV against a job description (no LLM call, no credit)"""
+    return await run_in_threadpool(optimize_keywords, request.cv_text, request.job_description, request.target_match)
+
+@app.post("/v1/render")
+async def render(request: RenderRequest, user_email: str = Depends(authenticate)):
+    """Render a CV (text or structured) to PDF with a template, or to DOCX"""
+    if not request.cv_text and not request.structured_cv:
+        raise HTTPException(status_code=422, detail="Either cv_text or structured_cv is required")
+    if request.template not in get_available_templates():
+        raise HTTPException(status_code=422, detail=f"Unknown template: {request.template}")
+
+    content = await run_in_threadpool(render_export, request)
+    if request.format == "pdf":
+        media_type = "application/pdf"
+    else:
+        media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    return Response(
+        content, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="cv_{request.template}.{request.format}"'}
+    )
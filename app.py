@@ -5,6 +5,8 @@ from datetime import datetime
 import json
 import re
 import os
+import hashlib
+from collections import OrderedDict
 from io import BytesIO
 import PyPDF2 as pdf
 from docx import Document
@@ -13,16 +15,21 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.shared import Pt, Inches
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
 
 # Import custom modules
-from database import init_db, get_user_data, save_user_session, get_user_credits, get_db_connection
-from auth import authenticate_user, logout_user, get_current_user
+from database import init_db, start_reservation_sweeper, get_user_data, auto_save_session, flush_auto_save, get_user_credits, get_db_connection, reserve_credit, commit_reservation, release_reservation, save_cv_generation, get_user_daily_stats, add_generation_stage_timings, get_stage_timing_percentiles
+from auth import authenticate_user, logout_user, get_current_user, is_admin_user
 from payment import process_payment, check_subscription, apply_discount_code
-from cv_generator import generate_cv, generate_cover_letter, extract_resume_text, analyze_cv_ats_score, generate_interview_qa, export_interview_qa
-from templates import get_available_templates, apply_template
-from utils import optimize_keywords, enforce_page_limit, get_gemini_response
+from cv_generator import StructuredCV, generate_cv_document, regenerate_section, list_cv_roles, generate_cover_letter, extract_resume_text, analyze_cv_ats_score, generate_interview_qa, export_interview_qa
+from templates import get_available_templates, apply_template, create_word_document
+from jobs import init_job_queue, submit_job, get_job, retry_job
+from rate_limiter import get_rate_limiter
+from jd_fetcher import fetch_job_descriptions, parse_urls
+from tracing import trace, stage, STAGES
+from profiling import profile_rerun, PROFILE_ENABLED
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from metrics import start_metrics_server, timed, RENDER_SECONDS, EXPORT_CACHE_REQUESTS, HANDLED_ERRORS
+from utils import optimize_keywords, enforce_page_limit, get_gemini_response, extract_keywords_from_text, calculate_ats_score
 
 # Load secrets into environment
 os.environ["DATABASE_URL"] = st.secrets["DATABASE_URL"]
@@ -31,6 +38,21 @@ os.environ["GEMINI_API_KEY"] = st.secrets["GEMINI_API_KEY"]
 # Initialize database
 init_db()
 
+# Serve /metrics on METRICS_PORT (once per process; reruns reuse the running server)
+start_metrics_server()
+
+# Charge credits for LLM actions (bypassed for testing unless enabled)
+CREDIT_CHECK_ENABLED = os.getenv("CREDIT_CHECK_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Run LLM work through the background job queue (requires `python -m cvolve worker`)
+JOB_QUEUE_ENABLED = os.getenv("JOB_QUEUE_ENABLED", "").lower() in ("1", "true", "yes")
+JOB_POLL_INTERVAL = 2
+if JOB_QUEUE_ENABLED:
+    init_job_queue()
+else:
+    # Refund credits reserved by reruns that died mid-generation (the job worker does this when the queue is on)
+    start_reservation_sweeper()
+
 # Page config
 st.set_page_config(
     page_title="CVOLVE PRO - AI-Powered Resume Optimization",
@@ -43,24 +65,38 @@ st.set_page_config(
 with open("styles.css") as f:
     st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
+# Number of rendered PDF/DOCX exports kept per session
+EXPORT_CACHE_SIZE = 8
+
 # Initialize session state
 if 'user_data' not in st.session_state:
     st.session_state.user_data = None
 if 'cv_preview' not in st.session_state:
     st.session_state.cv_preview = None
+if 'cv_structured' not in st.session_state:
+    st.session_state.cv_structured = None
 if 'auto_save' not in st.session_state:
     st.session_state.auto_save = {}
 if 'selected_template' not in st.session_state:
     st.session_state.selected_template = "professional"
+if 'generation_mode' not in st.session_state:
+    st.session_state.generation_mode = "standard"
+if 'export_cache' not in st.session_state:
+    st.session_state.export_cache = OrderedDict()
+if 'background_jobs' not in st.session_state:
+    st.session_state.background_jobs = {}
+if 'cv_generation_id' not in st.session_state:
+    st.session_state.cv_generation_id = None
 
 def auto_save_progress():
     """Auto-save user progress"""
     if st.session_state.user_data and st.session_state.auto_save:
         try:
-            save_user_session(st.session_state.user_data['email'], st.session_state.auto_save)
+            # Skips unchanged payloads and debounces writes per user
+            auto_save_session(st.session_state.user_data['email'], st.session_state.auto_save)
         except Exception as e:
             # Silently handle auto-save errors to not interrupt user flow
-            pass
+            HANDLED_ERRORS.inc(where="auto_save")
 
 def main():
     # Auto-save progress only when user is logged in and has data to save
@@ -100,8 +136,19 @@ def main():
             show_payment_page()
             
         if st.button("🚪 Logout"):
+            # Write changes still held back by the auto-save debounce before the session is cleared
+            try:
+                flush_auto_save(current_user['email'])
+            except Exception:
+                HANDLED_ERRORS.inc(where="auto_save")
             logout_user()
             st.rerun()
+
+        if is_admin_user(current_user):
+            with st.expander("🛡️ Rate Limiter"):
+                st.json(get_rate_limiter().get_stats())
+            with st.expander("⏱️ Stage Timings"):
+                show_stage_timings()
             
         st.markdown("---")
         
@@ -129,6 +176,21 @@ def main():
         }
         
         st.session_state.auto_save['sections'] = sections
+
+        # Generation mode
+        st.subheader("⚙️ Generation Mode")
+        generation_modes = {
+            "standard": "Standard (plain text)",
+            "structured": "Structured (JSON)",
+            "parallel": "Section-parallel (fastest)"
+        }
+        st.session_state.generation_mode = st.selectbox(
+            "Select generation mode",
+            options=list(generation_modes.keys()),
+            format_func=lambda x: generation_modes[x],
+            help="Structured mode returns validated JSON that is rendered without re-parsing; "
+                 "section-parallel mode plans once and generates each section concurrently"
+        )
         
         # Quick links
         st.markdown("---")
@@ -231,8 +293,30 @@ def show_cv_generation_page():
         st.session_state.jd_input = ""
         st.session_state.job_description = ""
 
+    def import_jd_from_url():
+        results = fetch_job_descriptions(parse_urls(st.session_state.jd_url_input))
+        fetched = [result for result in results if result.ok]
+        st.session_state.jd_fetch_errors = [f"{result.url}: {result.error}" for result in results if not result.ok]
+        if not results:
+            st.session_state.jd_fetch_errors = ["Enter a URL starting with http:// or https://"]
+        if fetched:
+            st.session_state.jd_input = "\n\n".join(result.text for result in fetched)
+
     # Job Description Input
     st.markdown("### 📋 Job Description")
+    url_col, button_col = st.columns([4, 1])
+    with url_col:
+        st.text_input(
+            "Or import it from the job posting URL",
+            placeholder="https://careers.example.com/jobs/12345",
+            key="jd_url_input"
+        )
+    with button_col:
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.button("🔗 Import", help="Fetch the job description from the posting", on_click=import_jd_from_url)
+    for error in st.session_state.pop("jd_fetch_errors", []):
+        st.error(f"Could not import job description from {error}")
+
     jd = st.text_area(
         "Paste the job description here",
         height=200,
@@ -266,38 +350,30 @@ def show_cv_generation_page():
 
     # ATS Score Check
     if uploaded_file and jd.strip():
-        if st.button("📊 Check ATS Score"):
-            try:
-                resume_text = extract_resume_text(uploaded_file)
-                analysis = analyze_cv_ats_score(resume_text, jd)
-
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("ATS Score", f"{analysis['score']}%")
-                    st.progress(analysis['score'] / 100)
-                    if analysis['score'] < 32:
-                        st.warning("⚠️ Your ATS score is critically low.")
-                with col2:
-                    st.metric("Keyword Match", f"{analysis['keyword_match']}%")
-                    st.progress(analysis['keyword_match'] / 100)
-
-                # Show suggestions
-                if analysis.get('suggestions'):
-                    st.markdown("### 💡 Improvement Suggestions")
-                    for suggestion in analysis['suggestions']:
-                        st.markdown(f"• {suggestion}")
-
-                # Show missing keywords
-                if analysis.get('missing_keywords'):
-                    st.markdown("### 🔍 Missing Keywords")
-                    for keyword in analysis['missing_keywords'][:5]:
-                        st.markdown(f"• {keyword}")
-
-                # ✅ Deduct credit
-                deduct_user_credits(st.session_state.user_data['email'], 1)
+        if st.button("📊 Check ATS Score") and check_rate_limit("ats"):
+            allowed, reservation_id = check_user_access("ats")
+            if not allowed:
+                reject_for_credits()
+            else:
+                try:
+                    resume_text = extract_resume_text(uploaded_file)
 
-            except Exception as e:
-                st.error(f"❌ Error analyzing ATS score: {str(e)}")
+                    if JOB_QUEUE_ENABLED:
+                        # Queues the job and reruns the page; its status is shown by show_background_job
+                        submit_background_job("ats", {"resume_text": resume_text, "job_description": jd}, reservation_id)
+                    else:
+                        # Raises if the analysis failed, so the reserved credit is refunded below
+                        analysis = analyze_cv_ats_score(resume_text, jd)
+                        show_ats_analysis(analysis)
+
+                        # ✅ Charge the reserved credit
+                        settle_user_credit(reservation_id, success=True)
+
+                except Exception as e:
+                    settle_user_credit(reservation_id, success=False)
+                    st.error(f"❌ Error analyzing ATS score: {str(e)}")
+
+        show_background_job("ats", "ATS analysis", lambda result: show_ats_analysis(result['analysis']))
     else:
         st.info("Please upload your resume and enter a job description to check ATS score.")
 
@@ -325,9 +401,12 @@ def show_cv_generation_page():
     # Generate CV
     if generate_cv_btn:
         if uploaded_file and jd.strip():
-            # Check credits/subscription
-            if not check_user_access():
-                st.error("⚠️ Insufficient credits. Please purchase more credits or upgrade your subscription.")
+            if not check_rate_limit("cv"):
+                return
+            # Check credits/subscription and reserve a credit until generation finishes
+            allowed, reservation_id = check_user_access("cv")
+            if not allowed:
+                reject_for_credits()
                 return
             
             loading_placeholder = st.empty()
@@ -345,102 +424,83 @@ def show_cv_generation_page():
 
                 
             try:
-                # Extract resume text
-                resume_text = extract_resume_text(uploaded_file)
+                # Collects per-stage timings, saved with the generation
+                with trace() as generation_trace:
+                    # Extract resume text
+                    with stage("extract"):
+                        resume_text = extract_resume_text(uploaded_file)
                 
-                # Generate optimized CV
-                sections_to_use = st.session_state.auto_save.get('sections', {
-                    "Professional Summary": True,
-                    "Key Skills": True,
-                    "Work Experience": True,
-                    "Education": True,
-                    "Certifications": True,
-                    "Projects": True,
-                    "Awards": False,
-                    "Languages": False,
-                    "Hobbies": False
-                })
+                    # Generate optimized CV
+                    sections_to_use = st.session_state.auto_save.get('sections', {
+                        "Professional Summary": True,
+                        "Key Skills": True,
+                        "Work Experience": True,
+                        "Education": True,
+                        "Certifications": True,
+                        "Projects": True,
+                        "Awards": False,
+                        "Languages": False,
+                        "Hobbies": False
+                    })
                 
-                st.session_state["target_match"] = target_match
-
-                cv_content = generate_cv(
-                    resume_text=resume_text,
-                    job_description=jd,
-                    target_match=target_match,
-                    template=st.session_state.selected_template,
-                    sections=sections_to_use,
-                    quantitative_focus=60,
-                    action_verb_intensity="High",
-                    keyword_matching="Balanced"
-                )
-                
-                # Enforce 2-page limit
-                cv_content = enforce_page_limit(cv_content)
-                
-                # Store in session for preview
-                st.session_state.cv_preview = cv_content
-                st.session_state.job_description = jd  # Store JD for ATS analysis
-                loading_placeholder.empty()
-                
-                processing_time = time.time() - start_time
-                
-                st.success(f"✅ CV generated successfully in {processing_time:.1f} seconds!")
-                # === Inline Preview and Download After Generation ===
-                st.markdown("### 👀 Your Optimized CV")
-
-                # Download buttons
-                col1, col2, col3 = st.columns(3)
-
-                with col1:
-                    clean_preview = st.session_state.cv_preview.replace("**", "")  # ✅ Strip asterisks for PDF
-                    pdf_buffer = apply_template(
-                        clean_preview,
-                        st.session_state.selected_template
-                    )
-                    st.download_button(
-                        label="📥 Download PDF",
-                        data=pdf_buffer,
-                        file_name="optimized_cv.pdf",
-                        mime="application/pdf"
-                    )
-
-                with col2:
-                    docx_buffer = create_word_document(st.session_state.cv_preview)
-                    st.download_button(
-                        label="📄 Download DOCX",
-                        data=docx_buffer,
-                        file_name="optimized_cv.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
-
-                with col3:
-                    if st.button("🔄 Regenerate CV"):
-                        st.session_state.cv_preview = None
-                        st.rerun()
-
-                # Show preview content
-                st.markdown("### 📋 Preview Content")
-                st.markdown(st.session_state.cv_preview)
-
-                # Inline ATS Analysis
-                st.markdown("### 📊 ATS Analysis")
-                analyze_ats_compatibility()
-
-                st.info("🔍 Click on the 'CV Preview' tab to review your optimized CV")
-                
-                # Deduct credits
-                deduct_user_credits(st.session_state.user_data['email'], 1)
+                    st.session_state["target_match"] = target_match
+
+                    if JOB_QUEUE_ENABLED:
+                        # Queues the job and reruns the page; its status is shown by show_background_job
+                        submit_background_job("cv", {
+                            "resume_text": resume_text,
+                            "job_description": jd,
+                            "target_match": target_match,
+                            "template": st.session_state.selected_template,
+                            "sections": sections_to_use,
+                            "generation_mode": st.session_state.generation_mode
+                        }, reservation_id)
+                    else:
+                        cv_content, st.session_state.cv_structured = generate_cv_document(
+                            resume_text,
+                            jd,
+                            target_match,
+                            st.session_state.selected_template,
+                            sections_to_use,
+                            generation_mode=st.session_state.generation_mode
+                        )
+
+                if not JOB_QUEUE_ENABLED:
+                    # Store in session for preview
+                    st.session_state.cv_preview = cv_content
+                    st.session_state.cv_resume_text = resume_text
+                    st.session_state.job_description = jd  # Store JD for ATS analysis
+                    loading_placeholder.empty()
+
+                    processing_time = time.time() - start_time
+
+                    st.success(f"✅ CV generated successfully in {processing_time:.1f} seconds!")
+
+                    record_cv_generation(resume_text, jd, cv_content, target_match, processing_time, generation_trace.as_dict())
+
+                    # Charge the reserved credit
+                    settle_user_credit(reservation_id, success=True)
                 
             except Exception as e:
+                settle_user_credit(reservation_id, success=False)
                 st.error(f"❌ Error generating CV: {str(e)}")
         else:
             st.warning("⚠️ Please upload your resume and provide a job description")
+
+    show_background_job("cv", "CV generation", apply_cv_job_result)
+
+    # Keep the generated CV on screen across reruns (downloads, section regeneration)
+    if st.session_state.cv_preview:
+        show_cv_results()
     
     # Generate Cover Letter
     if generate_cover_letter_btn:
         if uploaded_file and jd.strip():
-            if not check_user_access():
-                st.error("⚠️ Insufficient credits. Please purchase more credits or upgrade your subscription.")
+            if not check_rate_limit("cover_letter"):
+                return
+            allowed, reservation_id = check_user_access("cover_letter")
+            if not allowed:
+                reject_for_credits()
                 return
 
             loading_placeholder = st.empty()
@@ -455,103 +515,26 @@ def show_cv_generation_page():
 
             try:
                 resume_text = extract_resume_text(uploaded_file)
-                cover_letter = generate_cover_letter(resume_text, jd)
-
-                # ✅ Clean any Markdown markers like ** or *
-                cover_letter = re.sub(r'\*{1,2}', '', cover_letter)
-
-                loading_placeholder.empty()
-                st.session_state.cover_letter = cover_letter
-
-                from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
-                from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-                from reportlab.lib.enums import TA_JUSTIFY
-                from reportlab.lib.pagesizes import letter
-                from reportlab.lib.units import inch
-                from io import BytesIO
-                from docx import Document
-                from docx.shared import Pt, Inches
-                from docx.enum.text import WD_ALIGN_PARAGRAPH
-
-                with st.expander("📄 Generated Cover Letter"):
-                    # Display in UI
-                    st.markdown(cover_letter)
-
-                    # ===== PDF EXPORT WITH FIXED MARGINS AND JUSTIFIED TEXT =====
-                    pdf_buffer = BytesIO()
-                    doc = SimpleDocTemplate(
-                        pdf_buffer,
-                        pagesize=letter,
-                        leftMargin=40, rightMargin=40,  # ✅ 0.4 inch
-                        topMargin=35, bottomMargin=35   # ✅ 0.5 inch
-                    )
-
-                    styles = getSampleStyleSheet()
-                    justified_style = ParagraphStyle(
-                        name='Justified',
-                        parent=styles['Normal'],
-                        alignment=TA_JUSTIFY,
-                        fontName='Helvetica',
-                        fontSize=11,
-                        leading=16
-                    )
-
-                    flowables = []
-                    for paragraph in cover_letter.strip().split('\n'):
-                        if paragraph.strip():
-                            para = Paragraph(paragraph.strip(), justified_style)
-                            flowables.append(para)
-                            flowables.append(Spacer(1, 0.2 * inch))
-
-                    doc.build(flowables)
-                    pdf_buffer.seek(0)
-
-                    st.download_button(
-                        label="📥 Download as PDF",
-                        data=pdf_buffer,
-                        file_name="cover_letter.pdf",
-                        mime="application/pdf"
-                    )
-
-                    # ===== DOCX EXPORT WITH FIXED MARGINS AND JUSTIFIED TEXT =====
-                    docx_buffer = BytesIO()
-                    word_doc = Document()
-
-                    # ✅ Apply same margins as CV
-                    for section in word_doc.sections:
-                        section.top_margin = Inches(0.5)
-                        section.bottom_margin = Inches(0.5)
-                        section.left_margin = Inches(0.4)
-                        section.right_margin = Inches(0.4)
-
-                    # Set base font and size
-                    style = word_doc.styles['Normal']
-                    font = style.font
-                    font.name = 'Calibri'
-                    font.size = Pt(11)
-
-                    for paragraph in cover_letter.strip().split('\n'):
-                        if paragraph.strip():
-                            para = word_doc.add_paragraph(paragraph.strip())
-                            para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
 
-                    word_doc.save(docx_buffer)
-                    docx_buffer.seek(0)
+                if JOB_QUEUE_ENABLED:
+                    # Queues the job and reruns the page; its status is shown by show_background_job
+                    submit_background_job("cover_letter", {"resume_text": resume_text, "job_description": jd}, reservation_id)
+                else:
+                    cover_letter = generate_cover_letter(resume_text, jd)
 
-                    st.download_button(
-                        label="📥 Download as Word",
-                        data=docx_buffer,
-                        file_name="cover_letter.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
+                    loading_placeholder.empty()
+                    show_cover_letter(cover_letter)
 
-                # Deduct credits
-                deduct_user_credits(st.session_state.user_data['email'], 1)
+                    # Charge the reserved credit
+                    settle_user_credit(reservation_id, success=True)
 
             except Exception as e:
+                settle_user_credit(reservation_id, success=False)
                 loading_placeholder.empty()
                 st.error(f"❌ Error generating cover letter: {str(e)}")
     
+    show_background_job("cover_letter", "Cover letter", lambda result: show_cover_letter(result['cover_letter']))
+
     def show_preview_page():
         """CV preview and download page"""
         st.markdown("## 📄 CV Preview")
@@ -604,39 +587,430 @@ def show_cv_generation_page():
         else:
             st.info("🔍 No CV preview available. Please generate a CV first.")
 
+def show_ats_analysis(analysis):
+    """Display resume ATS analysis results"""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("ATS Score", f"{analysis['score']}%")
+        st.progress(analysis['score'] / 100)
+        if analysis['score'] < 32:
+            st.warning("⚠️ Your ATS score is critically low.")
+    with col2:
+        st.metric("Keyword Match", f"{analysis['keyword_match']}%")
+        st.progress(analysis['keyword_match'] / 100)
+
+    # Show suggestions
+    if analysis.get('suggestions'):
+        st.markdown("### 💡 Improvement Suggestions")
+        for suggestion in analysis['suggestions']:
+            st.markdown(f"• {suggestion}")
+
+    # Show missing keywords
+    if analysis.get('missing_keywords'):
+        st.markdown("### 🔍 Missing Keywords")
+        for keyword in analysis['missing_keywords'][:5]:
+            st.markdown(f"• {keyword}")
+
+def show_cover_letter(cover_letter):
+    """Display the generated cover letter with PDF and Word downloads"""
+    # ✅ Clean any Markdown markers like ** or *
+    cover_letter = re.sub(r'\*{1,2}', '', cover_letter)
+    st.session_state.cover_letter = cover_letter
+
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_JUSTIFY
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from io import BytesIO
+    from docx import Document
+    from docx.shared import Pt, Inches
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    with st.expander("📄 Generated Cover Letter"):
+        # Display in UI
+        st.markdown(cover_letter)
+
+        # ===== PDF EXPORT WITH FIXED MARGINS AND JUSTIFIED TEXT =====
+        pdf_buffer = BytesIO()
+        doc = SimpleDocTemplate(
+            pdf_buffer,
+            pagesize=letter,
+            leftMargin=40, rightMargin=40,  # ✅ 0.4 inch
+            topMargin=35, bottomMargin=35   # ✅ 0.5 inch
+        )
+
+        styles = getSampleStyleSheet()
+        justified_style = ParagraphStyle(
+            name='Justified',
+            parent=styles['Normal'],
+            alignment=TA_JUSTIFY,
+            fontName='Helvetica',
+            fontSize=11,
+            leading=16
+        )
+
+        flowables = []
+        for paragraph in cover_letter.strip().split('\n'):
+            if paragraph.strip():
+                para = Paragraph(paragraph.strip(), justified_style)
+                flowables.append(para)
+                flowables.append(Spacer(1, 0.2 * inch))
+
+        doc.build(flowables)
+        pdf_buffer.seek(0)
+
+        st.download_button(
+            label="📥 Download as PDF",
+            data=pdf_buffer,
+            file_name="cover_letter.pdf",
+            mime="application/pdf"
+        )
+
+        # ===== DOCX EXPORT WITH FIXED MARGINS AND JUSTIFIED TEXT =====
+        docx_buffer = BytesIO()
+        word_doc = Document()
+
+        # ✅ Apply same margins as CV
+        for section in word_doc.sections:
+            section.top_margin = Inches(0.5)
+            section.bottom_margin = Inches(0.5)
+            section.left_margin = Inches(0.4)
+            section.right_margin = Inches(0.4)
+
+        # Set base font and size
+        style = word_doc.styles['Normal']
+        font = style.font
+        font.name = 'Calibri'
+        font.size = Pt(11)
+
+        for paragraph in cover_letter.strip().split('\n'):
+            if paragraph.strip():
+                para = word_doc.add_paragraph(paragraph.strip())
+                para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+        word_doc.save(docx_buffer)
+        docx_buffer.seek(0)
+
+        st.download_button(
+            label="📥 Download as Word",
+            data=docx_buffer,
+            file_name="cover_letter.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+
+def submit_background_job(kind, payload, reservation_id=None):
+    """Queue an LLM job for the worker, remember its ID so the result survives reruns, and rerun the page
+
+    The worker settles the reserved credit when the job finishes, whether or not this session is still open.
+    """
+    job_id = submit_job(kind, payload, user_email=st.session_state.user_data['email'], reservation_id=reservation_id)
+    st.session_state.background_jobs[kind] = job_id
+    st.rerun()
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def watch_background_job(job_id, label):
+    """Poll a queued job without rerunning the whole page, then rerun once it has finished"""
+    job = get_job(job_id)
+    if job and job['status'] in ("succeeded", "failed"):
+        st.rerun()
+    status = job['status'] if job else "queued"
+    st.info(f"⏳ {label} is {status}... (job {job_id[:8]})")
+
+def show_background_job(kind, label, render_result):
+    """Show the status of the session's queued job of this kind and render its result when done"""
+    job_id = st.session_state.background_jobs.get(kind)
+    if not job_id:
+        return
+
+    job = get_job(job_id)
+    if job is None:
+        del st.session_state.background_jobs[kind]
+        return
+
+    if job['status'] == "succeeded":
+        render_result(job['result'])
+    elif job['status'] == "failed":
+        error = (job['error'] or "Unknown error").splitlines()[0]
+        st.error(f"❌ {label} failed after {job['attempts']} attempts: {error}")
+        if st.button(f"🔁 Retry {label}", key=f"retry_job_{kind}"):
+            allowed, reservation_id = check_user_access(kind)
+            if not allowed:
+                st.error("⚠️ Insufficient credits. Please purchase more credits or upgrade your subscription.")
+                return
+            retry_job(job_id, reservation_id)
+            st.rerun()
+    else:
+        watch_background_job(job_id, label)
+
+def apply_cv_job_result(result):
+    """Load a finished CV job into the session preview"""
+    job = get_job(st.session_state.background_jobs.pop("cv"))
+    st.session_state.cv_preview = result['cv_text']
+    st.session_state.cv_structured = (
+        StructuredCV.model_validate(result['structured_cv']) if result['structured_cv'] else None
+    )
+    st.session_state.cv_resume_text = job['payload']['resume_text']
+    st.session_state.job_description = job['payload']['job_description']
+    st.success("✅ CV generated successfully!")
+
+    # Jobs from before generation_seconds was recorded only have the whole queued-to-finished span
+    total_seconds = job['updated_at'] - job['created_at']
+    generation_seconds = result.get('generation_seconds', total_seconds)
+    queue_wait = max(0.0, total_seconds - generation_seconds)
+    record_cv_generation(
+        job['payload']['resume_text'],
+        job['payload']['job_description'],
+        result['cv_text'],
+        job['payload']['target_match'],
+        generation_seconds,
+        {**(result.get('stage_timings') or {}), 'queue_wait': round(queue_wait, 3)}
+    )
+
+def record_cv_generation(resume_text, jd, cv_content, target_match, processing_time, stage_timings=None):
+    """Save a generated CV for history and analytics; its first PDF/DOCX render times are added later"""
+    st.session_state.cv_generation_id = None
+    try:
+        st.session_state.cv_generation_id = save_cv_generation(
+            st.session_state.user_data['email'],
+            jd,
+            resume_text,
+            cv_content,
+            st.session_state.selected_template,
+            calculate_ats_score(cv_content, jd),
+            target_match,
+            processing_time,
+            stage_timings
+        )
+        st.session_state.untimed_exports = {"pdf", "docx"}
+    except Exception as e:
+        # History is best effort; the CV itself is already in the session
+        HANDLED_ERRORS.inc(where="record_cv_generation")
+
+def show_cv_results():
+    """Inline preview, downloads and section regeneration for the generated CV"""
+    st.markdown("### 👀 Your Optimized CV")
+
+    # Download buttons
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.download_button(
+            label="📥 Download PDF",
+            data=get_cached_export("pdf", st.session_state.selected_template),
+            file_name="optimized_cv.pdf",
+            mime="application/pdf"
+        )
+
+    with col2:
+        st.download_button(
+            label="📄 Download DOCX",
+            data=get_cached_export("docx"),
+            file_name="optimized_cv.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+
+    with col3:
+        if st.button("🔄 Regenerate CV"):
+            st.session_state.cv_preview = None
+            st.session_state.cv_structured = None
+            st.rerun()
+
+    # Regenerate a single section without touching the rest of the CV
+    cv_document = st.session_state.cv_structured or st.session_state.cv_preview
+    try:
+        role_labels = list_cv_roles(cv_document)
+    except ValueError:
+        role_labels = []
+    section_options = [("PROFESSIONAL SUMMARY", None), ("KEY SKILLS", None)]
+    section_options += [("WORK EXPERIENCE", i) for i in range(len(role_labels))]
+
+    with st.expander("✏️ Regenerate a Single Section"):
+        selected_section = st.selectbox(
+            "Section to regenerate",
+            options=section_options,
+            format_func=lambda option: (
+                f"Role: {role_labels[option[1]]}" if option[1] is not None else option[0].title()
+            )
+        )
+        if st.button("🔁 Regenerate Section") and check_rate_limit("regenerate_section"):
+            section_name, role_index = selected_section
+            try:
+                with st.spinner("Regenerating section..."):
+                    updated = regenerate_section(
+                        cv_document,
+                        section_name,
+                        st.session_state.get('job_description', ''),
+                        st.session_state.get('cv_resume_text', ''),
+                        target_match=st.session_state.get("target_match", 90),
+                        role_index=role_index
+                    )
+                if st.session_state.cv_structured:
+                    st.session_state.cv_structured = updated
+                    st.session_state.cv_preview = updated.to_text(
+                        extract_keywords_from_text(st.session_state.get('job_description', ''))
+                    )
+                else:
+                    st.session_state.cv_preview = updated
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ Error regenerating section: {str(e)}")
+
+    # Show preview content
+    st.markdown("### 📋 Preview Content")
+    st.markdown(st.session_state.cv_preview)
+
+    # Inline ATS Analysis
+    st.markdown("### 📊 ATS Analysis")
+    analyze_ats_compatibility()
+
+def get_cached_export(export_format, template_name=None):
+    """Render the current CV export once per content and template, reusing it across reruns"""
+    if st.session_state.cv_structured:
+        content_key = st.session_state.cv_structured.model_dump_json()
+    else:
+        content_key = st.session_state.cv_preview
+    cache_key = hashlib.sha256(f"{export_format}|{template_name}|{content_key}".encode("utf-8")).hexdigest()
+
+    export_cache = st.session_state.export_cache
+    if cache_key in export_cache:
+        export_cache.move_to_end(cache_key)
+        EXPORT_CACHE_REQUESTS.inc(result="hit")
+        return export_cache[cache_key]
+    EXPORT_CACHE_REQUESTS.inc(result="miss")
+
+    render_started = time.perf_counter()
+    if export_format == "pdf":
+        clean_preview = st.session_state.cv_preview.replace("**", "")  # ✅ Strip asterisks for PDF
+        buffer = apply_template(st.session_state.cv_structured or clean_preview, template_name)
+    else:
+        with timed(RENDER_SECONDS, format="docx", template="word"):
+            buffer = create_word_document(st.session_state.cv_preview)
+    record_export_timing(export_format, time.perf_counter() - render_started)
+
+    export_cache[cache_key] = buffer.getvalue()
+    while len(export_cache) > EXPORT_CACHE_SIZE:
+        export_cache.popitem(last=False)
+    return export_cache[cache_key]
+
+def record_export_timing(export_format, seconds):
+    """Add the first render time of each export format to the saved generation's stage timings"""
+    untimed_exports = st.session_state.get('untimed_exports', set())
+    generation_id = st.session_state.get('cv_generation_id')
+    if generation_id is None or export_format not in untimed_exports:
+        return
+    untimed_exports.discard(export_format)
+    try:
+        add_generation_stage_timings(generation_id, {f"render_{export_format}": round(seconds, 3)})
+    except Exception as e:
+        # Timings are best effort
+        HANDLED_ERRORS.inc(where="record_export_timing")
+
+def show_stage_timings():
+    """Admin view of stage latency percentiles"""
+    days = st.selectbox("Window", [1, 7, 30], index=1, format_func=lambda d: f"Last {d} days", key="stage_timing_days")
+    try:
+        percentiles = {row['stage']: row for row in get_stage_timing_percentiles(days)}
+    except Exception as e:
+        st.error(f"❌ Error loading stage timings: {str(e)}")
+        return
+    if not percentiles:
+        st.info("No timed generations yet.")
+        return
+
+    # Pipeline order first, then anything else that was recorded
+    order = [name for name in STAGES + ("total",) if name in percentiles]
+    order += sorted(name for name in percentiles if name not in order)
+    st.dataframe(
+        [
+            {
+                "Stage": name,
+                "Samples": percentiles[name]['samples'],
+                "p50 (s)": round(percentiles[name]['p50'], 3),
+                "p95 (s)": round(percentiles[name]['p95'], 3),
+                "p99 (s)": round(percentiles[name]['p99'], 3)
+            }
+            for name in order
+        ],
+        hide_index=True,
+        use_container_width=True
+    )
+    st.caption("llm is the summed model time of all calls in a generation; llm_ttfb is the first call's time to first chunk.")
+
 def show_analytics_page():
     """Analytics dashboard"""
     st.markdown("## 📊 Your Analytics")
     
     user_email = st.session_state.user_data['email']
     
-    # Mock analytics data (replace with actual database queries)
+    period = st.selectbox("Period", [30, 90, 365], index=1, format_func=lambda days: f"Last {days} days")
+
+    try:
+        stats = get_user_daily_stats(user_email, days=period)
+    except Exception as e:
+        st.error(f"❌ Error loading analytics: {str(e)}")
+        return
+
+    if not stats:
+        st.info("📭 No CVs generated in this period yet. Your stats will appear here after your first CV.")
+        return
+
+    cvs_generated = sum(row['cv_count'] for row in stats)
+    ats_count = sum(row['ats_count'] for row in stats)
+    avg_ats = sum(row['ats_sum'] for row in stats) / ats_count if ats_count else None
+    credits_used = sum(row['credits_used'] for row in stats)
+    avg_processing_time = sum(row['processing_time_sum'] for row in stats) / cvs_generated if cvs_generated else None
+
+    # Deltas compare the last 7 days against the rest of the period
+    week_start = datetime.now().date().toordinal() - 6
+    recent = [row for row in stats if row['day'].toordinal() >= week_start]
+    recent_ats_count = sum(row['ats_count'] for row in recent)
+    recent_avg_ats = sum(row['ats_sum'] for row in recent) / recent_ats_count if recent_ats_count else None
+
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("CVs Generated", "12", "2")
+        st.metric("CVs Generated", cvs_generated, f"{sum(row['cv_count'] for row in recent)} this week")
     
     with col2:
-        st.metric("Avg ATS Score", "87%", "5%")
+        st.metric(
+            "Avg ATS Score",
+            f"{avg_ats:.0f}%" if avg_ats is not None else "—",
+            f"{recent_avg_ats - avg_ats:+.1f}% this week" if avg_ats is not None and recent_avg_ats is not None else None
+        )
     
     with col3:
-        st.metric("Credits Used", "24", "3")
+        st.metric("Credits Used", credits_used, f"{sum(row['credits_used'] for row in recent)} this week")
     
     with col4:
-        st.metric("Success Rate", "94%", "1%")
+        st.metric("Avg Generation Time", f"{avg_processing_time:.1f}s" if avg_processing_time is not None else "—")
     
     # Charts
     st.markdown("### 📈 Performance Trends")
-    
-    # Mock data for demo
-    dates = ["2024-01-01", "2024-01-15", "2024-02-01", "2024-02-15"]
-    scores = [82, 85, 87, 89]
-    
+
+    ats_days = [row for row in stats if row['ats_count']]
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=dates, y=scores, mode='lines+markers', name='ATS Score'))
+    fig.add_trace(go.Scatter(
+        x=[row['day'] for row in ats_days], y=[row['ats_max'] for row in ats_days],
+        mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        x=[row['day'] for row in ats_days], y=[row['ats_min'] for row in ats_days],
+        mode='lines', line=dict(width=0), fill='tonexty', name='Min–Max'
+    ))
+    fig.add_trace(go.Scatter(
+        x=[row['day'] for row in ats_days], y=[row['avg_ats_score'] for row in ats_days],
+        mode='lines+markers', name='Avg ATS Score'
+    ))
     fig.update_layout(title="ATS Score Improvement", xaxis_title="Date", yaxis_title="Score %")
     st.plotly_chart(fig, use_container_width=True)
 
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=[row['day'] for row in stats], y=[row['cv_count'] for row in stats], name='CVs Generated'))
+    fig.add_trace(go.Bar(x=[row['day'] for row in stats], y=[row['credits_used'] for row in stats], name='Credits Used'))
+    fig.update_layout(title="Daily Activity", xaxis_title="Date", yaxis_title="Count", barmode='group')
+    st.plotly_chart(fig, use_container_width=True)
+
 def show_billing_page():
     """Billing and subscription management"""
     st.markdown("## 💳 Billing & Subscription")
@@ -696,66 +1070,6 @@ def show_billing_page():
             st.error("❌ Invalid discount code")
 
 
-def create_word_document(content):
-    current_section = ""
-    doc = Document()
-
-    # Set narrow margins
-    sections = doc.sections
-    for section in sections:
-        section.top_margin = Inches(0.5)
-        section.bottom_margin = Inches(0.5)
-        section.left_margin = Inches(0.4)
-        section.right_margin = Inches(0.4)
-
-    # Set base font and spacing
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Calibri'
-    font.size = Pt(11)
-
-    for line in content.split('\n'):
-        if not line.strip():
-            continue
-
-        text = line.strip()
-        clean_text = text.replace("**", "")  # ✅ Remove markdown asterisks only
-
-        # Detect if it's a section header (fully uppercase and ends with ":")
-        is_section_header = clean_text.endswith(':') and clean_text == clean_text.upper()
-
-        if is_section_header:
-            current_section = clean_text[:-1].lower()
-            doc.add_paragraph()
-
-        if current_section == "work experience" and "|" in clean_text and not clean_text.startswith("•"):
-            spacer_para = doc.add_paragraph()
-            spacer_para.paragraph_format.space_after = Pt(1)
-
-        para = doc.add_paragraph()
-        run = para.add_run(clean_text)
-
-        # ✅ Keep formatting rules
-        if is_section_header:
-            run.bold = True
-            add_bottom_border(para)
-
-        elif current_section == "work experience" and "|" in clean_text and not clean_text.startswith("•"):
-            run.bold = True
-
-        elif current_section == "projects" and not clean_text.startswith("•"):
-            run.bold = True
-
-        para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        para.paragraph_format.space_after = Pt(2)
-        para.paragraph_format.line_spacing = 1.0
-
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
-
-
 def analyze_ats_compatibility():
     """Analyze ATS compatibility of generated CV"""
     if st.session_state.cv_preview:
@@ -785,43 +1099,45 @@ def analyze_ats_compatibility():
             for keyword in analysis['missing_keywords'][:5]:  # Show only first 5
                 st.markdown(f"• {keyword}")
 
-# def check_user_access():
-#     """Check if user has sufficient credits or active subscription"""
-#     user_email = st.session_state.user_data['email']
-    
-#     # Check subscription first
-#     subscription = check_subscription(user_email)
-#     if subscription:
-#         return True
-    
-#     # Check credits
-#     credits = get_user_credits(user_email)
-#     return credits > 0
-def check_user_access():
-    """Temporarily allow access without checking credits or subscription"""
-    return True  # 🔓 Credit check bypassed for testing
-
-# def deduct_user_credits(email, amount):
-#     """Deduct credits from user account"""
-#     try:
-#         conn = get_db_connection()
-#         cursor = conn.cursor()
-        
-#         cursor.execute("""
-#             UPDATE users SET credits = credits - %s 
-#             WHERE email = %s AND credits >= %s
-#         """, (amount, email, amount))
-        
-#         conn.commit()
-#         cursor.close()
-#         conn.close()
-#         return True
-#     except Exception as e:
-#         st.error(f"Error deducting credits: {str(e)}")
-#         return False
-def deduct_user_credits(email, amount):
-    """Temporarily disable credit deduction for testing"""
-    return True  # 🔓 Credit deduction skipped for testing
+def check_rate_limit(action):
+    """Apply the per-user and global rate limits to an LLM-backed action, explaining any rejection"""
+    result = get_rate_limiter().acquire(st.session_state.user_data['email'], action)
+    if not result.allowed:
+        st.error(result.message)
+    return result.allowed
+
+def reject_for_credits():
+    """Explain a rejection for lack of credits and give back the rate limit tokens the request took"""
+    get_rate_limiter().refund(st.session_state.user_data['email'])
+    st.error("⚠️ Insufficient credits. Please purchase more credits or upgrade your subscription.")
+
+def check_user_access(action):
+    """Reserve a credit for an LLM action; return (allowed, reservation ID or None if nothing was reserved)"""
+    if not CREDIT_CHECK_ENABLED:
+        return True, None  # 🔓 Credit check bypassed for testing
+
+    user_email = st.session_state.user_data['email']
+
+    # Check subscription first
+    subscription = check_subscription(user_email)
+    if subscription:
+        return True, None
+
+    # Deduct the credit up front in one conditional statement so concurrent tabs can't overdraw
+    reservation_id = reserve_credit(user_email, 1, action)
+    return reservation_id is not None, reservation_id
+
+def settle_user_credit(reservation_id, success):
+    """Keep a reserved credit after a successful generation, or refund it after a failure"""
+    if reservation_id is None:
+        return
+    try:
+        if success:
+            commit_reservation(reservation_id)
+        else:
+            release_reservation(reservation_id)
+    except Exception as e:
+        st.error(f"Error settling credits: {str(e)}")
 
 
 def show_payment_page():
@@ -830,19 +1146,6 @@ def show_payment_page():
     # Implementation would show Stripe payment form
     pass
 
-def add_bottom_border(paragraph):
-    p = paragraph._p
-    pPr = p.get_or_add_pPr()
-    borders = OxmlElement('w:pBdr')
-    bottom = OxmlElement('w:bottom')
-    bottom.set(qn('w:val'), 'single')
-    bottom.set(qn('w:sz'), '12')     # thickness
-    bottom.set(qn('w:space'), '1')
-    bottom.set(qn('w:color'), 'auto')
-    borders.append(bottom)
-    pPr.append(borders)
-
-
 def show_interview_qa_page():
     st.markdown("## 🤖 Interview Preparation Q&A")
     st.markdown("Generate personalized interview questions and answers by entering a Job Description and uploading a Resume here (independent of Tab 1).")
@@ -881,7 +1184,12 @@ def show_interview_qa_page():
 
     # ✅ Generate Q&A Button
     if jd_tab2.strip() and uploaded_resume_tab2:
-        if st.button("🎤 Generate Interview Q&A", key="generate_qa_tab2"):
+        if st.button("🎤 Generate Interview Q&A", key="generate_qa_tab2") and check_rate_limit("interview_qa"):
+            allowed, reservation_id = check_user_access("interview_qa")
+            if not allowed:
+                reject_for_credits()
+                return
+
             loading_placeholder = st.empty()
             loading_placeholder.markdown("""
                 <div style="display: flex; flex-direction: column; align-items: center; padding: 20px;">
@@ -894,46 +1202,69 @@ def show_interview_qa_page():
                 # Extract resume text
                 resume_text_tab2 = extract_resume_text(uploaded_resume_tab2)
 
-                # Generate Q&A
-                qa_content = generate_interview_qa(resume_text_tab2, jd_tab2)
-
-                loading_placeholder.empty()
-
-                # ✅ Display Q&A
-                st.markdown("### 📌 Suggested Questions & Answers")
-                st.markdown(qa_content)
+                if JOB_QUEUE_ENABLED:
+                    # Queues the job and reruns the page; its status is shown by show_background_job
+                    submit_background_job("interview_qa", {"resume_text": resume_text_tab2, "job_description": jd_tab2}, reservation_id)
+                else:
+                    # Generate Q&A
+                    qa_content = generate_interview_qa(resume_text_tab2, jd_tab2)
 
-                # ✅ Export Options
-                pdf_buffer, docx_buffer = export_interview_qa(qa_content)
+                    loading_placeholder.empty()
+                    show_interview_qa(qa_content)
 
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.download_button(
-                        "📥 Download PDF",
-                        data=pdf_buffer,
-                        file_name="interview_QA.pdf",
-                        mime="application/pdf",
-                        key="download_pdf_tab2"
-                    )
-                with col2:
-                    st.download_button(
-                        "📥 Download DOCX",
-                        data=docx_buffer,
-                        file_name="interview_QA.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        key="download_docx_tab2"
-                    )
-
-                # ✅ Deduct credits
-                deduct_user_credits(st.session_state.user_data['email'], 1)
+                    # ✅ Charge the reserved credit
+                    settle_user_credit(reservation_id, success=True)
 
             except Exception as e:
+                settle_user_credit(reservation_id, success=False)
                 loading_placeholder.empty()
                 st.error(f"❌ Error generating Q&A: {str(e)}")
 
     else:
         st.warning("Please provide both Job Description and Resume above to proceed.")
 
+    show_background_job("interview_qa", "Interview Q&A", lambda result: show_interview_qa(result['qa_content']))
+
+def show_interview_qa(qa_content):
+    """Display generated interview Q&A with PDF and DOCX downloads"""
+    # ✅ Display Q&A
+    st.markdown("### 📌 Suggested Questions & Answers")
+    st.markdown(qa_content)
+
+    # ✅ Export Options
+    pdf_buffer, docx_buffer = export_interview_qa(qa_content)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "📥 Download PDF",
+            data=pdf_buffer,
+            file_name="interview_QA.pdf",
+            mime="application/pdf",
+            key="download_pdf_tab2"
+        )
+    with col2:
+        st.download_button(
+            "📥 Download DOCX",
+            data=docx_buffer,
+            file_name="interview_QA.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            key="download_docx_tab2"
+        )
+
+def profiling_enabled():
+    """Profile this session's reruns when CVOLVE_PROFILE is set or an admin opened the app with ?profile=1 (?profile=0 stops)"""
+    requested = st.query_params.get("profile")
+    if requested is not None and is_admin_user(st.session_state.user_data):
+        st.session_state.profiling = requested.lower() in ("1", "true", "yes")
+    return PROFILE_ENABLED or st.session_state.get('profiling', False)
+
+def get_session_id():
+    """Streamlit session ID used to group profiles per browser session"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
 
 if __name__ == "__main__":
-    main()
+    with profile_rerun(get_session_id(), enabled=profiling_enabled()):
+        main()
@@ -0,0 +1,153 @@
+"""Async data access for asyncio code paths (the API, LLM fan-out), on psycopg 3 with its own connection pool
+
+Functions mirror database.py and run the same SQL, which is imported from there, so the two paths can't drift.
+Use these from coroutines instead of the blocking database.py functions, which would stall the event loop.
+"""
+import os
+import time
+import asyncio
+import weakref
+import threading
+from contextlib import asynccontextmanager
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # Optional: only needed for async database access
+    psycopg = None
+
+from database import (
+    DB_POOL_MIN_CONNECTIONS, DB_POOL_MAX_CONNECTIONS, USER_DATA_SQL, USER_CREDITS_SQL, UPDATE_USER_CREDITS_SQL,
+    USER_SNAPSHOT_SQL, RESERVE_CREDIT_SQL, COMMIT_RESERVATION_SQL, RELEASE_RESERVATION_SQL, USER_DAILY_STATS_SQL,
+    SAVE_PAYMENT_SQL, cv_generation_statement
+)
+from metrics import DB_POOL_CHECKOUTS, DB_POOL_HOLD_SECONDS
+
+# Seconds to wait for a free pooled connection before giving up
+ASYNC_DB_POOL_TIMEOUT = float(os.getenv("ASYNC_DB_POOL_TIMEOUT", "30"))
+
+# One pool per event loop: asyncio locks and psycopg's async connections only work on the loop that made them,
+# so each loop (the API server's, or a fresh one per asyncio.run) gets its own, dropped when the loop is collected
+_async_pools = weakref.WeakKeyDictionary()
+_async_pool_locks = weakref.WeakKeyDictionary()
+_registry_lock = threading.Lock()
+
+def _loop_lock(loop):
+    """The lock that guards opening and closing the pool of a loop"""
+    with _registry_lock:
+        lock = _async_pool_locks.get(loop)
+        if lock is None:
+            lock = _async_pool_locks[loop] = asyncio.Lock()
+        return lock
+
+async def get_async_pool():
+    """Async connection pool of the running event loop, opened on first use"""
+    if psycopg is None:
+        raise RuntimeError("psycopg and psycopg_pool are required for async database access")
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is not None:
+        return pool
+    async with _loop_lock(loop):
+        if loop not in _async_pools:
+            pool = AsyncConnectionPool(
+                os.environ.get("DATABASE_URL"), min_size=DB_POOL_MIN_CONNECTIONS, max_size=DB_POOL_MAX_CONNECTIONS,
+                timeout=ASYNC_DB_POOL_TIMEOUT, open=False
+            )
+            await pool.open()
+            _async_pools[loop] = pool
+        return _async_pools[loop]
+
+async def close_async_pool():
+    """Close the running loop's pool (call on shutdown, or before the loop ends)"""
+    loop = asyncio.get_running_loop()
+    async with _loop_lock(loop):
+        pool = _async_pools.pop(loop, None)
+        if pool is not None:
+            await pool.close()
+
+@asynccontextmanager
+async def pooled_connection():
+    """Borrow a pooled connection for one unit of work, committing on success and rolling back on error"""
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        checked_out = time.perf_counter()
+        try:
+            async with conn.transaction():
+                yield conn
+            DB_POOL_CHECKOUTS.inc(outcome="commit")
+        except Exception:
+            DB_POOL_CHECKOUTS.inc(outcome="rollback")
+            raise
+        finally:
+            DB_POOL_HOLD_SECONDS.observe(time.perf_counter() - checked_out)
+
+async def get_user_data(email):
+    """Get user data by email"""
+    async with pooled_connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(USER_DATA_SQL, (email,))
+            return await cursor.fetchone()
+
+async def get_user_credits(email):
+    """Get user's current credits"""
+    async with pooled_connection() as conn:
+        cursor = await conn.execute(USER_CREDITS_SQL, (email,))
+        result = await cursor.fetchone()
+    return result[0] if result else 0
+
+async def update_user_credits(email, credits):
+    """Update user credits"""
+    async with pooled_connection() as conn:
+        await conn.execute(UPDATE_USER_CREDITS_SQL, (credits, email))
+
+async def get_user_snapshot(email):
+    """User data with today's generation count, credits used today and credits reserved; None if no such user"""
+    async with pooled_connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(USER_SNAPSHOT_SQL, (email,))
+            return await cursor.fetchone()
+
+async def reserve_credit(email, amount=1, action=None):
+    """Atomically deduct credits if the user has enough; return the reservation ID or None"""
+    async with pooled_connection() as conn:
+        cursor = await conn.execute(RESERVE_CREDIT_SQL, {'email': email, 'amount': amount, 'action': action})
+        result = await cursor.fetchone()
+    return result[0] if result else None
+
+async def commit_reservation(reservation_id):
+    """Keep the credits of a reservation after a successful generation"""
+    async with pooled_connection() as conn:
+        cursor = await conn.execute(COMMIT_RESERVATION_SQL, (reservation_id,))
+    return cursor.rowcount == 1
+
+async def release_reservation(reservation_id):
+    """Return the credits of a reservation to the user after a failed generation"""
+    async with pooled_connection() as conn:
+        cursor = await conn.execute(RELEASE_RESERVATION_SQL, (reservation_id,))
+    return cursor.rowcount == 1
+
+async def save_cv_generation(user_email, job_description, original_resume, generated_cv, template_used, ats_score, target_match, processing_time, stage_timings=None):
+    """Save CV generation record with its documents and rollups in a single statement; return its ID"""
+    # Hashing and compressing the texts is CPU work, kept off the event loop
+    sql, params = await asyncio.to_thread(
+        cv_generation_statement, user_email, job_description, original_resume, generated_cv, template_used,
+        ats_score, target_match, processing_time, stage_timings
+    )
+    async with pooled_connection() as conn:
+        cursor = await conn.execute(sql, params)
+        result = await cursor.fetchone()
+    return result[0] if result else None
+
+async def get_user_daily_stats(user_email, days=90):
+    """Per-day generation and credit stats for the last N days, oldest first"""
+    async with pooled_connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(USER_DAILY_STATS_SQL, (user_email, days))
+            return await cursor.fetchall()
+
+async def save_payment(user_email, amount, payment_type, stripe_payment_id, credits_purchased=0):
+    """Save payment record"""
+    async with pooled_connection() as conn:
+        await conn.execute(SAVE_PAYMENT_SQL, (user_email, amount, payment_type, stripe_payment_id, credits_purchased))
@@ -90,6 +90,11 @@ def authenticate_linkedin():
     
     return user
 
+def is_admin_user(user):
+    """Check if user is listed in the ADMIN_EMAILS environment variable"""
+    admin_emails = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+    return bool(user) and user['email'].lower() in admin_emails
+
 def get_current_user():
     """Get current authenticated user from session"""
     if 'user_data' in st.session_state and st.session_state.user_data:
@@ -102,5 +107,9 @@ def logout_user():
         del st.session_state.user_data
     if 'cv_preview' in st.session_state:
         del st.session_state.cv_preview
+    if 'cv_structured' in st.session_state:
+        del st.session_state.cv_structured
+    if 'cv_resume_text' in st.session_state:
+        del st.session_state.cv_resume_text
     if 'auto_save' in st.session_state:
         del st.session_state.auto_save
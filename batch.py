@@ -0,0 +1,305 @@
+"""Bulk CV generation for a cohort: many resumes x one JD, or one resume x many JDs
+
+Runs extraction -> generation -> page fit -> PDF/DOCX export as a pipeline. LLM calls run in a bounded thread
+pool; extraction and rendering are CPU-bound and run in a process pool. Every finished pair is appended to
+batch_state.jsonl in the output directory, so rerunning the same command skips work that already succeeded.
+With --record-user, rendered pairs are checkpointed as "rendered" and saved to the database in chunks; a rerun
+only retries the database write of pairs that were rendered but not saved.
+"""
+import os
+import csv
+import json
+import time
+import hashlib
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Files accepted as resumes and job descriptions
+RESUME_EXTENSIONS = (".pdf", ".docx")
+JD_EXTENSIONS = (".txt", ".md", ".pdf", ".docx")
+
+STATE_FILE = "batch_state.jsonl"
+SUMMARY_FILE = "summary.csv"
+
+# Rendered generations saved to the database per transaction with record_user
+RECORD_CHUNK_SIZE = 50
+
+SUMMARY_COLUMNS = (
+    "item", "resume", "job_description", "status", "ats_score", "attempts", "extract_seconds",
+    "generate_seconds", "render_pdf_seconds", "render_docx_seconds", "total_seconds", "error"
+)
+
+DEFAULT_SECTIONS = {
+    "Professional Summary": True, "Key Skills": True, "Work Experience": True, "Education": True,
+    "Certifications": True, "Projects": True, "Awards": False, "Languages": False
+}
+
+def list_inputs(path, extensions):
+    """A file, or the matching files of a directory in name order"""
+    if os.path.isdir(path):
+        return [
+            os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.lower().endswith(extensions) and not name.startswith(".")
+        ]
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No such file or directory: {path}")
+    return [path]
+
+def file_stem(path):
+    """File name with its extension folded in, so jane.pdf and jane.docx don't share outputs or a checkpoint"""
+    name, extension = os.path.splitext(os.path.basename(path))
+    return f"{name}_{extension[1:].lower()}" if extension else name
+
+def item_name(resume_path, jd_path, multiple_jds):
+    """Output file stem of a resume/JD pair"""
+    resume_stem = file_stem(resume_path)
+    if not multiple_jds:
+        return resume_stem
+    return f"{resume_stem}__{file_stem(jd_path)}"
+
+def plan_batch(resume_paths, jd_paths):
+    """Every resume/JD pair as {"item", "resume", "job_description"}"""
+    multiple_jds = len(jd_paths) > 1
+    items = [
+        {"item": item_name(resume, jd, multiple_jds), "resume": resume, "job_description": jd}
+        for resume in resume_paths for jd in jd_paths
+    ]
+    # Same-named files from different directories still collide; those items get a short hash of their paths
+    counts = Counter(item["item"] for item in items)
+    for item in items:
+        if counts[item["item"]] > 1:
+            paths = f"{os.path.abspath(item['resume'])}\0{os.path.abspath(item['job_description'])}"
+            item["item"] = f"{item['item']}_{hashlib.sha256(paths.encode()).hexdigest()[:8]}"
+    return items
+
+def load_state(out_dir):
+    """Latest checkpoint record of each item from a previous run"""
+    state = {}
+    path = os.path.join(out_dir, STATE_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    state[record["item"]] = record
+    return state
+
+def extract_text(path):
+    """Text of a resume or JD file and the seconds it took (runs in the process pool)"""
+    started = time.perf_counter()
+    if path.lower().endswith((".txt", ".md")):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    else:
+        from cv_generator import extract_resume_text
+        with open(path, "rb") as f:
+            text = extract_resume_text(f)
+    if not text.strip():
+        raise ValueError(f"No text could be extracted from {path}")
+    return text, time.perf_counter() - started
+
+def render_outputs(cv_text, structured_cv, template, out_stem):
+    """Write the PDF and DOCX exports of a CV and return their render seconds (runs in the process pool)"""
+    from templates import apply_template, create_word_document
+
+    started = time.perf_counter()
+    pdf = apply_template(structured_cv or cv_text.replace("**", ""), template)
+    with open(f"{out_stem}.pdf", "wb") as f:
+        f.write(pdf.getvalue())
+    render_pdf = time.perf_counter() - started
+
+    started = time.perf_counter()
+    docx = create_word_document(cv_text)
+    with open(f"{out_stem}.docx", "wb") as f:
+        f.write(docx.getvalue())
+    return render_pdf, time.perf_counter() - started
+
+def generate_item(resume_text, jd_text, template, target_match, generation_mode, retries):
+    """Generate one CV, retrying transient LLM failures with backoff; return (cv_text, structured_cv, seconds, attempts)"""
+    from cv_generator import generate_cv_document
+
+    for attempt in range(1, retries + 2):
+        started = time.perf_counter()
+        try:
+            cv_text, structured_cv = generate_cv_document(
+                resume_text, jd_text, target_match, template, DEFAULT_SECTIONS, generation_mode=generation_mode
+            )
+            return cv_text, structured_cv, time.perf_counter() - started, attempt
+        except Exception:
+            if attempt > retries:
+                raise
+            time.sleep(2 ** attempt)
+
+def write_summary(out_dir, items, state):
+    """Write summary.csv with one row per planned item, in plan order"""
+    path = os.path.join(out_dir, SUMMARY_FILE)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for item in items:
+            writer.writerow(state.get(item["item"], {**item, "status": "pending"}))
+    return path
+
+def run_batch(resumes, job_descriptions, out_dir, template="professional", target_match=90,
+              generation_mode="standard", llm_concurrency=4, render_workers=None, retries=2, record_user=None,
+              progress=print):
+    """Generate a CV for every resume/JD pair not already done in out_dir; return the summary counts"""
+    from utils import calculate_ats_score
+
+    os.makedirs(out_dir, exist_ok=True)
+    items = plan_batch(list_inputs(resumes, RESUME_EXTENSIONS), list_inputs(job_descriptions, JD_EXTENSIONS))
+    state = load_state(out_dir)
+    done = ("ok", "rendered")
+    pending = [item for item in items if state.get(item["item"], {}).get("status") not in done]
+    # Pairs rendered by an earlier run whose generation rows were never saved only need the database write
+    unrecorded = [
+        state[item["item"]] for item in items
+        if record_user and state.get(item["item"], {}).get("status") == "rendered"
+    ]
+    progress(
+        f"{len(items)} CVs planned, {len(items) - len(pending) - len(unrecorded)} already done, "
+        f"{len(pending)} to generate" + (f", {len(unrecorded)} to record" if unrecorded else "")
+    )
+
+    with open(os.path.join(out_dir, STATE_FILE), "a") as state_file:
+        def checkpoint(record):
+            state[record["item"]] = record
+            state_file.write(json.dumps(record) + "\n")
+            state_file.flush()
+            progress(f"[{record['status']}] {record['item']}" + (f": {record['error']}" if record.get("error") else ""))
+
+        def finish(record, error=None):
+            if error is not None:
+                record["error"] = str(error)[:500]
+            record["total_seconds"] = round(time.perf_counter() - record.pop("started"), 3)
+            checkpoint(record)
+
+        to_record = []
+
+        def record_generation(record, generated):
+            """Queue a rendered pair's generation row, saving the queue once a chunk has built up"""
+            resume_text, jd_text, cv_text, structured_cv = generated
+            to_record.append((record, {
+                "user_email": record_user, "job_description": jd_text, "original_resume": resume_text,
+                "generated_cv": cv_text, "template_used": template, "ats_score": record.get("ats_score"),
+                "target_match": target_match, "processing_time": record.get("generate_seconds")
+            }))
+            if len(to_record) >= RECORD_CHUNK_SIZE:
+                flush_records()
+
+        def flush_records():
+            """Save the queued generation rows in one transaction; on failure the pairs stay "rendered" for a rerun"""
+            from database import save_cv_generations
+
+            chunk = to_record[:]
+            to_record.clear()
+            try:
+                report = save_cv_generations(generation for record, generation in chunk)
+            except Exception as e:
+                for record, generation in chunk:
+                    record["error"] = f"Rendered, but saving the generation failed: {str(e)[:400]}"
+                    checkpoint(record)
+                return
+            progress(f"Recorded {report['rows']} generations for {record_user} ({report['rows_per_second']} rows/s)")
+            for record, generation in chunk:
+                record["status"] = "ok"
+                record.pop("error", None)
+                checkpoint(record)
+
+        # Spawned workers don't inherit the parent's LLM client threads and connections
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=render_workers, mp_context=context) as processes, \
+                ThreadPoolExecutor(max_workers=llm_concurrency) as llm_threads:
+            # Each distinct file is extracted once, however many pairs it appears in
+            paths = sorted(
+                {item["resume"] for item in pending + unrecorded} | {item["job_description"] for item in pending + unrecorded}
+            )
+            extractions = {path: processes.submit(extract_text, path) for path in paths}
+
+            def generate(item):
+                """Extraction and generation stages of one pair; return its record and the text to render"""
+                record = {**item, "status": "failed", "attempts": 0, "started": time.perf_counter()}
+                try:
+                    resume_text, resume_seconds = extractions[item["resume"]].result()
+                    jd_text, jd_seconds = extractions[item["job_description"]].result()
+                    record["extract_seconds"] = round(resume_seconds + jd_seconds, 3)
+
+                    cv_text, structured_cv, generate_seconds, attempts = generate_item(
+                        resume_text, jd_text, template, target_match, generation_mode, retries
+                    )
+                    record.update(attempts=attempts, generate_seconds=round(generate_seconds, 3))
+                    record["ats_score"] = calculate_ats_score(cv_text, jd_text)
+                    with open(os.path.join(out_dir, f"{item['item']}.txt"), "w", encoding="utf-8") as f:
+                        f.write(cv_text)
+                    return record, (resume_text, jd_text, cv_text, structured_cv)
+                except Exception as e:
+                    record["error"] = str(e)[:500]
+                    return record, None
+
+            def reload(record):
+                """Texts of a pair rendered by an earlier run, read back from its inputs and its .txt output"""
+                try:
+                    resume_text, _ = extractions[record["resume"]].result()
+                    jd_text, _ = extractions[record["job_description"]].result()
+                    with open(os.path.join(out_dir, f"{record['item']}.txt"), encoding="utf-8") as f:
+                        cv_text = f.read()
+                    return record, (resume_text, jd_text, cv_text, None)
+                except Exception as e:
+                    record["error"] = f"Rendered, but its texts could not be reloaded: {str(e)[:400]}"
+                    return record, None
+
+            # One loop waits on generations and renders together: a CV is handed to the render processes as soon
+            # as it is generated, freeing its LLM slot for the next pair, and checkpointed as soon as it is rendered
+            generations = {llm_threads.submit(generate, item) for item in pending}
+            reloads = {llm_threads.submit(reload, record) for record in unrecorded}
+            renders = {}
+            while generations or reloads or renders:
+                finished, _ = wait(generations | reloads | set(renders), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future in reloads:
+                        reloads.discard(future)
+                        record, generated = future.result()
+                        if generated is None:
+                            checkpoint(record)
+                        else:
+                            record_generation(record, generated)
+                        continue
+
+                    if future in generations:
+                        generations.discard(future)
+                        record, generated = future.result()
+                        if generated is None:
+                            finish(record)
+                            continue
+                        resume_text, jd_text, cv_text, structured_cv = generated
+                        out_stem = os.path.join(out_dir, record["item"])
+                        renders[processes.submit(render_outputs, cv_text, structured_cv, template, out_stem)] = (
+                            record, generated
+                        )
+                        continue
+
+                    record, generated = renders.pop(future)
+                    try:
+                        render_pdf, render_docx = future.result()
+                    except Exception as e:
+                        finish(record, e)
+                        continue
+                    record.update(render_pdf_seconds=round(render_pdf, 3), render_docx_seconds=round(render_docx, 3))
+                    # A rendered pair is checkpointed before its database write, so a failed write never costs a rerender
+                    record["status"] = "rendered" if record_user else "ok"
+                    finish(record)
+                    if record_user:
+                        record_generation(record, generated)
+
+        if to_record:
+            flush_records()
+
+    summary_path = write_summary(out_dir, items, state)
+    counts = {"planned": len(items), "ok": 0, "rendered": 0, "failed": 0}
+    for item in items:
+        status = state.get(item["item"], {}).get("status")
+        if status in counts:
+            counts[status] += 1
+    counts["summary"] = summary_path
+    return counts
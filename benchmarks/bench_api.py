@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import rate_limiter
+from rate_limiter import MemoryBucketStore, RateLimiter
+
+API_KEY = "bench-key"
+DOCUMENT = {"resume_text": "Jane Doe, data engineer", "job_description": "Data engineer, Python and SQL"}
+
+@pytest.fixture
+def client(monkeypatch):
+    """Client without the lifespan (no schema or keyword warm-up), one key and an empty rate limiter"""
+    monkeypatch.setattr(api, "API_KEYS", {API_KEY: "bench@example.com"})
+    monkeypatch.setattr(rate_limiter, "_rate_limiter", RateLimiter(MemoryBucketStore()))
+    return TestClient(api.app)
+
+@pytest.fixture
+def charged(monkeypatch, bench_database, bench_user):
+    """Charge credits for the API calls of bench_user; returns a function setting its balance"""
+    monkeypatch.setattr(api, "CREDIT_CHECK_ENABLED", True)
+    def set_credits(credits):
+        bench_database.update_user_credits(bench_user, credits - bench_database.get_user_credits(bench_user))
+    return set_credits
+
+@pytest.mark.parametrize("path", ["/v1/templates", "/metrics"])
+@pytest.mark.parametrize("headers", [{}, {"X-API-Key": "wrong-key"}, {"X-API-Key": ""}])
+def bench_missing_or_invalid_key_is_rejected(client, path, headers):
+    response = client.get(path, headers=headers)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid or missing API key"}
+
+def bench_metrics_are_served_with_a_key(client):
+    response = client.get("/metrics", headers={"X-API-Key": API_KEY})
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+
+def bench_healthz_needs_no_key(client):
+    assert client.get("/healthz").json() == {"status": "ok"}
+
+@pytest.mark.parametrize("stream", [False, True])
+def bench_zero_credits_is_rejected_without_calling_the_model(client, charged, monkeypatch, bench_database,
+                                                             bench_user, stream):
+    def generate(*args, **kwargs):
+        raise AssertionError("the model must not be called without credits")
+    monkeypatch.setattr(api, "generate_cover_letter", generate)
+    monkeypatch.setattr(api, "stream_generate_text", generate)
+    charged(0)
+
+    response = client.post(f"/v1/cover-letter?stream={str(stream).lower()}", json=DOCUMENT,
+                           headers={"X-API-Key": API_KEY})
+
+    assert response.status_code == 402 and response.json() == {"detail": "Insufficient credits"}
+    assert bench_database.get_user_credits(bench_user) == 0
+
+def bench_credit_is_charged_on_success(client, charged, monkeypatch, bench_database, bench_user):
+    monkeypatch.setattr(api, "generate_cover_letter", lambda resume_text, job_description: "Dear hiring manager")
+    charged(1)
+
+    response = client.post("/v1/cover-letter", json=DOCUMENT, headers={"X-API-Key": API_KEY})
+
+    assert response.json() == {"cover_letter": "Dear hiring manager"}
+    assert bench_database.get_user_credits(bench_user) == 0
+
+def bench_credit_is_refunded_on_failure(client, charged, monkeypatch, bench_database, bench_user):
+    def generate(resume_text, job_description):
+        raise Exception("Failed to generate cover letter: quota exceeded")
+    monkeypatch.setattr(api, "generate_cover_letter", generate)
+    charged(1)
+
+    response = client.post("/v1/cover-letter", json=DOCUMENT, headers={"X-API-Key": API_KEY})
+
+    assert response.status_code == 502
+    assert response.json() == {"detail": "Failed to generate cover letter: quota exceeded"}
+    assert bench_database.get_user_credits(bench_user) == 1
+
+def bench_credit_is_refunded_when_a_stream_fails(client, charged, monkeypatch, bench_database, bench_user):
+    def stream(prompt, call):
+        yield "Dear hiring "
+        raise Exception("quota exceeded")
+    monkeypatch.setattr(api, "stream_generate_text", stream)
+    charged(1)
+
+    with pytest.raises(Exception, match="quota exceeded"):
+        client.post("/v1/cover-letter?stream=true", json=DOCUMENT, headers={"X-API-Key": API_KEY})
+
+    assert bench_database.get_user_credits(bench_user) == 1
@@ -0,0 +1,65 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import batch
+import corpus
+from batch import plan_batch, run_batch
+
+@pytest.fixture
+def inputs(tmp_path):
+    """jane.pdf and jane.docx with different resumes, and one JD"""
+    resumes = tmp_path / "resumes"
+    resumes.mkdir()
+    (resumes / "jane.pdf").write_bytes(corpus.make_resume_pdf("small"))
+    (resumes / "jane.docx").write_bytes(corpus.make_resume_docx("medium"))
+    jd = tmp_path / "data_engineer.txt"
+    jd.write_text(corpus.make_job_description("small"))
+    return str(resumes), str(jd), str(tmp_path / "out")
+
+@pytest.fixture
+def generations(monkeypatch):
+    """Stub generate_item, failing the first call; extraction and rendering run in threads of this process"""
+    calls = []
+    def generate_item(resume_text, jd_text, template, target_match, generation_mode, retries):
+        calls.append(resume_text)
+        if len(calls) == 1:
+            raise Exception("Failed to generate CV: quota exceeded")
+        return f"JANE DOE\n\nPROFESSIONAL SUMMARY\nGenerated from {len(resume_text)} characters", None, 0.01, 1
+    monkeypatch.setattr(batch, "generate_item", generate_item)
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+    return calls
+
+def bench_same_named_inputs_get_distinct_items():
+    items = plan_batch(["a/jane.pdf", "a/jane.docx", "b/jane.pdf"], ["jd.txt"])
+    names = [item["item"] for item in items]
+    assert len(set(names)) == 3
+    assert names[1] == "jane_docx" and all(name.startswith("jane_pdf_") for name in names[::2])
+
+    items = plan_batch(["jane.pdf"], ["jds/backend.txt", "jds/backend.md"])
+    assert [item["item"] for item in items] == ["jane_pdf__backend_txt", "jane_pdf__backend_md"]
+
+def bench_run_batch_resumes_from_checkpoint(inputs, generations):
+    resumes, jd, out_dir = inputs
+    counts = run_batch(resumes, jd, out_dir, llm_concurrency=1, render_workers=1, retries=0, progress=lambda message: None)
+    assert (counts["ok"], counts["failed"]) == (1, 1)
+
+    # The rerun only regenerates the pair that failed; the pair that succeeded is not overwritten
+    counts = run_batch(resumes, jd, out_dir, llm_concurrency=1, render_workers=1, retries=0, progress=lambda message: None)
+    assert (counts["ok"], counts["failed"]) == (2, 0)
+    assert len(generations) == 3 and generations[2] == generations[0]
+
+    outputs = {
+        name: open(os.path.join(out_dir, f"{name}.txt")).read() for name in ("jane_docx", "jane_pdf")
+    }
+    assert outputs["jane_docx"] != outputs["jane_pdf"]
+    for name in outputs:
+        assert os.path.getsize(os.path.join(out_dir, f"{name}.pdf")) and os.path.getsize(os.path.join(out_dir, f"{name}.docx"))
+
+    with open(os.path.join(out_dir, batch.STATE_FILE)) as f:
+        records = [json.loads(line) for line in f]
+    assert [(record["item"], record["status"]) for record in records] == [
+        ("jane_docx", "failed"), ("jane_pdf", "ok"), ("jane_docx", "ok")
+    ]
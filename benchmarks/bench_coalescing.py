@@ -0,0 +1,125 @@
+import os
+import time
+import threading
+
+import pytest
+
+import cv_generator
+from cv_generator import single_flight, file_single_flight, coalesce, sweep_single_flight_results, StructuredCV
+
+STRUCTURED_CV = StructuredCV(
+    name="Jane Doe", contact="jane@example.com", summary="Data engineer.", skills=["Python", "SQL"], roles=[],
+    education=[], certifications=[], projects=[]
+)
+
+class SlowCall:
+    """fn stand-in that blocks until released, counting how often it runs"""
+    def __init__(self, result="CV text", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return self.result
+
+def run_concurrently(call, fn, callers=4):
+    """Start callers threads of call(fn) while the first one is still running; return their outcomes"""
+    outcomes = []
+    def caller():
+        try:
+            outcomes.append(call(fn))
+        except Exception as e:
+            outcomes.append(e)
+    threads = [threading.Thread(target=caller)]
+    threads[0].start()
+    assert fn.started.wait(5)
+    threads += [threading.Thread(target=caller) for _ in range(callers - 1)]
+    for thread in threads[1:]:
+        thread.start()
+    # Let the followers reach the in-flight call (or the file lock) before the leader finishes
+    time.sleep(0.2)
+    fn.release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+@pytest.fixture
+def lock_dir(tmp_path, monkeypatch):
+    if cv_generator.fcntl is None:
+        pytest.skip("Cross-process coalescing needs fcntl")
+    path = str(tmp_path / "single_flight")
+    monkeypatch.setenv("CV_SINGLE_FLIGHT_DIR", path)
+    return path
+
+def bench_single_flight_shares_one_call():
+    fn = SlowCall()
+    outcomes = run_concurrently(lambda fn: single_flight("key", fn), fn)
+    assert outcomes == ["CV text"] * 4
+    assert fn.calls == 1
+    assert not cv_generator._in_flight
+
+def bench_single_flight_propagates_errors():
+    fn = SlowCall(error=ValueError("Gemini is down"))
+    outcomes = run_concurrently(lambda fn: single_flight("key", fn), fn)
+    assert len(outcomes) == 4 and all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert fn.calls == 1
+
+def bench_single_flight_runs_again_after_completion():
+    fn = SlowCall()
+    fn.release.set()
+    assert single_flight("key", fn) == single_flight("key", fn) == "CV text"
+    assert fn.calls == 2
+
+def bench_file_single_flight_shares_one_call(lock_dir):
+    fn = SlowCall(result=STRUCTURED_CV)
+    outcomes = run_concurrently(lambda fn: file_single_flight("key", fn, lock_dir), fn)
+    assert outcomes == [STRUCTURED_CV] * 4
+    assert fn.calls == 1
+    # Results are stored as JSON, never as pickles that would be executed on load
+    with open(os.path.join(lock_dir, "key.result"), encoding="utf-8") as f:
+        assert f.read().startswith('{"structured": {"name": "Jane Doe"')
+
+def bench_file_single_flight_propagates_errors(lock_dir):
+    fn = SlowCall(error=ValueError("Gemini is down"))
+    outcomes = run_concurrently(lambda fn: file_single_flight("key", fn, lock_dir), fn, callers=2)
+    # The waiter finds no fresh result, so it makes its own attempt, which fails the same way
+    assert len(outcomes) == 2 and all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert fn.calls == 2
+    assert not os.path.exists(os.path.join(lock_dir, "key.result"))
+
+def bench_file_single_flight_runs_again_after_completion(lock_dir):
+    fn = SlowCall()
+    fn.release.set()
+    assert file_single_flight("key", fn, lock_dir) == "CV text"
+    fn.result = "Regenerated CV text"
+    assert file_single_flight("key", fn, lock_dir) == "Regenerated CV text"
+    assert fn.calls == 2
+
+def bench_sweep_removes_stale_results_and_idle_locks(lock_dir):
+    fn = SlowCall()
+    fn.release.set()
+    file_single_flight("idle", fn, lock_dir)
+    held = open(os.path.join(lock_dir, "held.lock"), "a")
+    cv_generator.fcntl.flock(held, cv_generator.fcntl.LOCK_EX)
+    try:
+        sweep_single_flight_results(lock_dir, result_ttl=0)
+        assert os.listdir(lock_dir) == ["held.lock"]
+    finally:
+        held.close()
+
+def bench_coalesce_across_processes_and_threads(lock_dir):
+    fn = SlowCall()
+    outcomes = run_concurrently(lambda fn: coalesce("key", fn), fn)
+    assert outcomes == ["CV text"] * 4
+    assert fn.calls == 1
+
+    fn.result = "Regenerated CV text"
+    assert coalesce("key", fn) == "Regenerated CV text"
+    assert fn.calls == 2
@@ -0,0 +1,255 @@
+import time
+import itertools
+import threading
+
+import pytest
+
+pytestmark = pytest.mark.database
+
+def bench_save_cv_generation(benchmark, bench_database, bench_user, cv_text, resume_text, job_description):
+    # The resume and JD deduplicate across rounds, as they do for regenerations; each CV is new
+    counter = itertools.count()
+    benchmark(lambda: bench_database.save_cv_generation(
+        bench_user, job_description, resume_text, f"{cv_text}\n{next(counter)}", "professional", 85, 90, 12.5,
+        {"llm": 11.0, "cleanup": 0.1}
+    ))
+
+def bench_get_user_daily_stats(benchmark, bench_database, bench_user):
+    bench_database.save_cv_generation(bench_user, "jd", "resume", "cv", "professional", 85, 90, 12.5)
+    assert benchmark(bench_database.get_user_daily_stats, bench_user, 90)
+
+def bench_reserve_and_commit_credit(benchmark, bench_database, bench_user):
+    def reserve_and_commit():
+        reservation_id = bench_database.reserve_credit(bench_user, 1, "cv")
+        assert bench_database.commit_reservation(reservation_id)
+    benchmark(reserve_and_commit)
+
+def bench_save_user_session(benchmark, bench_database, bench_user, job_description):
+    counter = itertools.count()
+    benchmark(lambda: bench_database.save_user_session(
+        bench_user, {"job_description": job_description, "sections": {"Projects": next(counter) % 2 == 0}}
+    ))
+
+def bench_auto_save_session_unchanged(benchmark, bench_database, bench_user, job_description):
+    session_data = {"job_description": job_description, "sections": {"Projects": True}}
+    bench_database.auto_save_session(bench_user, session_data, min_interval=0)
+    assert not benchmark(bench_database.auto_save_session, bench_user, session_data)
+
+@pytest.fixture
+def auto_save_state(monkeypatch, bench_database):
+    """Empty per-process auto-save state, so earlier saves of bench_user don't open a debounce window"""
+    monkeypatch.setattr(bench_database, "_auto_save_state", {})
+    monkeypatch.setattr(bench_database, "_auto_save_pending", {})
+    yield
+    for session_data, session_hash, timer in bench_database._auto_save_pending.values():
+        timer.cancel()
+
+def bench_auto_save_change_inside_window_is_flushed(bench_database, bench_user, auto_save_state):
+    assert bench_database.auto_save_session(bench_user, {"job_description": "first"}, min_interval=0.3)
+    session_data = {"job_description": "second"}
+    assert not bench_database.auto_save_session(bench_user, session_data, min_interval=0.3)
+    # The snapshot is a copy: edits after the call belong to the next rerun
+    session_data["job_description"] = "third"
+    assert bench_database.get_user_session(bench_user) == {"job_description": "first"}
+
+    # No further rerun: the deferred write lands once the window has passed
+    deadline = time.monotonic() + 5
+    while bench_database.get_user_session(bench_user) != {"job_description": "second"}:
+        assert time.monotonic() < deadline, "deferred auto-save never ran"
+        time.sleep(0.05)
+    assert not bench_database._auto_save_pending
+
+def bench_auto_save_pending_change_is_flushed_on_logout(bench_database, bench_user, auto_save_state):
+    bench_database.auto_save_session(bench_user, {"job_description": "first"}, min_interval=60)
+    bench_database.auto_save_session(bench_user, {"job_description": "second"}, min_interval=60)
+    assert bench_database.flush_auto_save(bench_user)
+    assert bench_database.get_user_session(bench_user) == {"job_description": "second"}
+    assert not bench_database.flush_auto_save(bench_user)
+    # The flush counts as the latest write
+    assert not bench_database.auto_save_session(bench_user, {"job_description": "second"}, min_interval=60)
+
+def bench_auto_save_change_reverted_inside_window_is_dropped(bench_database, bench_user, auto_save_state):
+    bench_database.auto_save_session(bench_user, {"job_description": "first"}, min_interval=60)
+    bench_database.auto_save_session(bench_user, {"job_description": "second"}, min_interval=60)
+    assert not bench_database.auto_save_session(bench_user, {"job_description": "first"}, min_interval=60)
+    assert not bench_database.flush_auto_save(bench_user)
+    assert bench_database.get_user_session(bench_user) == {"job_description": "first"}
+
+CONCURRENT_CREDITS = 200
+CONCURRENT_THREADS = 16
+
+def bench_reserve_credit_concurrent(benchmark, bench_database, bench_user):
+    """Threads race to reserve credits; exactly the available balance must be reserved, never more"""
+    def set_credits():
+        conn = bench_database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE users SET credits = %s WHERE email = %s
+        """, (CONCURRENT_CREDITS, bench_user))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    def race():
+        reserved = []
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                reservation_id = bench_database.reserve_credit(bench_user, 1, "cv")
+                if reservation_id is None:
+                    return
+                with lock:
+                    reserved.append(reservation_id)
+
+        threads = [threading.Thread(target=worker) for _ in range(CONCURRENT_THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return reserved
+
+    reserved = benchmark.pedantic(race, setup=set_credits, rounds=5)
+    assert len(reserved) == CONCURRENT_CREDITS
+    assert bench_database.get_user_credits(bench_user) == 0
+
+def bench_export_cv_generations(benchmark, bench_database, bench_user, tmp_path, cv_text, resume_text, job_description):
+    from exports import export_table
+    for i in range(50):
+        bench_database.save_cv_generation(bench_user, job_description, resume_text, f"{cv_text}\n{i}", "professional", 85, 90, 12.5)
+    path = str(tmp_path / "cv_generations.jsonl")
+    assert benchmark(export_table, "cv_generations", path, "jsonl", chunk_size=20) >= 50
+
+def bench_save_cv_generations_bulk(benchmark, bench_database, bench_user, cv_text, resume_text, job_description):
+    counter = itertools.count()
+    def records():
+        return [{
+            "user_email": bench_user, "job_description": job_description, "original_resume": resume_text,
+            "generated_cv": f"{cv_text}\n{next(counter)}", "template_used": "professional", "ats_score": 85,
+            "target_match": 90, "processing_time": 12.5
+        } for _ in range(100)]
+    report = benchmark.pedantic(bench_database.save_cv_generations, setup=lambda: ((records(),), {}), rounds=5)
+    assert report["rows"] == 100
+
+def bench_async_get_user_snapshot(benchmark, bench_database, bench_user):
+    pytest.importorskip("psycopg_pool")
+    import asyncio
+    import async_database
+
+    async def snapshots():
+        try:
+            # Concurrent readers share the async pool without blocking the loop
+            return await asyncio.gather(*(async_database.get_user_snapshot(bench_user) for _ in range(50)))
+        finally:
+            await async_database.close_async_pool()
+    results = benchmark(lambda: asyncio.run(snapshots()))
+    assert results[0] == bench_database.get_user_snapshot(bench_user)
+
+def bench_async_pool_per_event_loop(bench_database, bench_user):
+    pytest.importorskip("psycopg_pool")
+    import asyncio
+    import async_database
+
+    async def snapshots():
+        try:
+            # Concurrent first use contends for the pool lock, which must belong to this loop
+            results = await asyncio.gather(*(async_database.get_user_snapshot(bench_user) for _ in range(10)))
+            return id(await async_database.get_async_pool()), results
+        finally:
+            await async_database.close_async_pool()
+
+    # Loops one after another (asyncio.run per call) and side by side in threads
+    runs = [asyncio.run(snapshots()) for _ in range(2)]
+    threads = [threading.Thread(target=lambda: runs.append(asyncio.run(snapshots()))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(runs) == 4
+    assert all(len(results) == 10 for pool, results in runs)
+
+def bench_reserve_credit_no_double_spend(bench_database, bench_user):
+    # Twice as many threads as credits (one pooled connection each), all released at once
+    balance = bench_database.DB_POOL_MAX_CONNECTIONS // 2
+    thread_count = bench_database.DB_POOL_MAX_CONNECTIONS
+    bench_database.update_user_credits(bench_user, balance - bench_database.get_user_credits(bench_user))
+    barrier = threading.Barrier(thread_count)
+    reserved = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        barrier.wait()
+        try:
+            reservation_id = bench_database.reserve_credit(bench_user, 1, "cv")
+        except Exception as e:
+            with lock:
+                errors.append(e)
+            return
+        if reservation_id is not None:
+            with lock:
+                reserved.append(reservation_id)
+
+    threads = [threading.Thread(target=worker) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(reserved) == balance
+    assert bench_database.get_user_credits(bench_user) == 0
+    with bench_database.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) FROM credit_reservations WHERE user_email = %s AND id = ANY(%s)
+        """, (bench_user, reserved))
+        assert cursor.fetchone()[0] == balance
+
+def bench_release_stale_reservations(bench_database, bench_user):
+    bench_database.update_user_credits(bench_user, 2 - bench_database.get_user_credits(bench_user))
+    stale = bench_database.reserve_credit(bench_user, 1, "cv")
+    kept = bench_database.reserve_credit(bench_user, 1, "cv")
+    with bench_database.pooled_connection() as conn:
+        conn.cursor().execute("""
+            UPDATE credit_reservations SET created_at = created_at - INTERVAL '1 hour' WHERE id = ANY(%s)
+        """, ([stale, kept],))
+
+    assert bench_database.release_stale_reservations(30, keep_ids=[kept]) == 1
+    assert bench_database.get_user_credits(bench_user) == 1
+    # Settling a released reservation is a no-op, so a late commit can't charge twice
+    assert not bench_database.commit_reservation(stale)
+    assert bench_database.commit_reservation(kept)
+
+def bench_iter_job_descriptions_distinct(bench_database, bench_user):
+    migrated = "Migrated JD: Python and SQL"
+    bench_database.save_cv_generation(bench_user, migrated, "Resume", "CV", "professional", 80, 90, 1.0)
+    # Rows from before the documents table keep the raw text: one repeated, one also stored as a document
+    with bench_database.pooled_connection() as conn:
+        conn.cursor().executemany(
+            "INSERT INTO cv_generations (user_email, job_description) VALUES (%s, %s)",
+            [(bench_user, "Legacy JD: Go"), (bench_user, "Legacy JD: Go"), (bench_user, migrated)]
+        )
+
+    texts = list(bench_database.iter_job_descriptions())
+    assert texts.count(migrated) == 1
+    assert texts.count("Legacy JD: Go") == 1
+
+def bench_reservation_sweeper_refunds_stale_reservations(bench_database, bench_user):
+    bench_database.update_user_credits(bench_user, 1 - bench_database.get_user_credits(bench_user))
+    stale = bench_database.reserve_credit(bench_user, 1, "ats")
+    with bench_database.pooled_connection() as conn:
+        conn.cursor().execute("""
+            UPDATE credit_reservations SET created_at = created_at - INTERVAL '1 hour' WHERE id = %s
+        """, (stale,))
+
+    bench_database.start_reservation_sweeper(interval=0.05)
+    try:
+        deadline = time.monotonic() + 5
+        while bench_database.get_user_credits(bench_user) == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        bench_database.stop_reservation_sweeper()
+    assert bench_database.get_user_credits(bench_user) == 1
+    assert not bench_database.commit_reservation(stale)
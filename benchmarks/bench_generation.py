@@ -0,0 +1,211 @@
+import json
+
+import pytest
+
+import cv_generator
+from cv_generator import (
+    generate_cv_document, generate_cover_letter, analyze_cv_ats_score, generate_interview_qa,
+    split_at_last_complete_line, stitch_continuation, generate_with_continuation, regenerate_section, list_cv_roles
+)
+
+SECTIONS = {"Professional Summary": True, "Key Skills": True, "Work Experience": True, "Education": True}
+
+def _clear_llm_cache():
+    cv_generator._llm_cache.clear()
+
+@pytest.mark.parametrize("generation_mode", ["standard", "structured", "parallel"])
+def bench_generate_cv_document(benchmark, gemini_stub, resume_text, job_description, generation_mode):
+    cv_text, _ = benchmark.pedantic(
+        generate_cv_document,
+        args=(resume_text, job_description, 90, "professional", SECTIONS),
+        kwargs={"generation_mode": generation_mode},
+        setup=_clear_llm_cache,
+        rounds=20
+    )
+    assert "WORK EXPERIENCE" in cv_text
+
+def bench_generate_cover_letter(benchmark, gemini_stub, resume_text, job_description):
+    assert benchmark(generate_cover_letter, resume_text, job_description)
+
+def bench_analyze_cv_ats_score(benchmark, gemini_stub, cv_text, job_description):
+    assert benchmark(analyze_cv_ats_score, cv_text, job_description)['score'] == 86
+
+def bench_generate_interview_qa(benchmark, gemini_stub, resume_text, job_description):
+    assert benchmark(generate_interview_qa, resume_text, job_description).startswith("Q1:")
+
+FULL_CV = """JANE DOE
+jane@example.com | London
+
+PROFESSIONAL SUMMARY:
+Data engineer with eight years of pipeline experience.
+
+WORK EXPERIENCE:
+Acme Ltd | Senior Engineer | 2021 - 2024
+• Built streaming pipelines on Spark for 40M daily events.
+• Cut warehouse costs by 30% with partitioning.
+Beta plc | Senior Engineer | 2019 - 2021
+• Built streaming pipelines on Spark for 40M daily events.
+• Migrated 200 Airflow DAGs to Kubernetes.
+
+EDUCATION:
+BSc Computer Science | University of Leeds | 2016"""
+
+class TruncatingModel:
+    """Fake timed_generate_content that stops each answer mid-line at the given offsets of FULL_CV
+
+    A continuation restarts at the line that was cut off, after restating the resumed section's header and
+    the last repeat_lines complete lines, as the real model tends to.
+    """
+    def __init__(self, cuts, repeat_lines=1, text=FULL_CV):
+        self.cuts = list(cuts)
+        self.repeat_lines = repeat_lines
+        self.text = text
+        self.prompts = []
+
+    def __call__(self, prompt, generation_config=None, call="cv"):
+        from gemini_stub import RecordedResponse
+        self.prompts.append(prompt)
+        start = 0
+        if len(self.prompts) > 1:
+            start = self.text.rfind("\n", 0, self.previous_cut) + 1
+            written = self.text[:start].rstrip("\n").splitlines()
+            headers = [line for line in written if cv_generator.SECTION_HEADER_PATTERN.match(line)]
+            repeated = "\n".join(([headers[-1]] if headers else []) + written[-self.repeat_lines:])
+        end = self.cuts.pop(0) if self.cuts else len(self.text)
+        self.previous_cut = end
+        chunk = self.text[start:end]
+        if start:
+            chunk = f"{repeated}\n{chunk}"
+        return RecordedResponse(chunk, "MAX_TOKENS" if end < len(self.text) else "STOP")
+
+def cut_inside(line, text=FULL_CV):
+    """Offset of the middle of the first occurrence of line"""
+    return text.index(line) + len(line) // 2
+
+def bench_split_at_last_complete_line():
+    partial = FULL_CV[:cut_inside("• Cut warehouse costs")]
+    completed, header = split_at_last_complete_line(partial)
+    assert completed == FULL_CV[:FULL_CV.index("\n• Cut warehouse costs")]
+    assert header == "WORK EXPERIENCE:"
+    assert split_at_last_complete_line("JANE DOE\njane@exa") == ("JANE DOE", None)
+
+def bench_stitch_continuation_keeps_repeated_lines_that_are_new():
+    completed = "WORK EXPERIENCE:\nSenior Engineer\nAcme Ltd | 2021 - 2024\n• Built pipelines.\n• Cut costs by 30%."
+    # The second role has the same title line as the first, but it doesn't overlap the end of the text
+    continuation = "Senior Engineer\nBeta plc | 2019 - 2021\n• Migrated 200 DAGs."
+    assert stitch_continuation(completed, continuation, "WORK EXPERIENCE:") == f"{completed}\n{continuation}"
+
+def bench_stitch_continuation_drops_restated_header_and_overlap():
+    completed = FULL_CV[:FULL_CV.index("\nBeta plc")]
+    continuation = "WORK EXPERIENCE:\n• Built streaming pipelines on Spark for 40M daily events.\n" \
+                   "• Cut warehouse costs by 30% with partitioning.\n" + FULL_CV[FULL_CV.index("Beta plc"):]
+    assert stitch_continuation(completed, continuation, "WORK EXPERIENCE:") == FULL_CV
+
+@pytest.mark.parametrize("cuts", [
+    [cut_inside("• Cut warehouse costs")],
+    [cut_inside("Data engineer with"), cut_inside("Beta plc"), cut_inside("• Migrated 200")],
+    [cut_inside("• Migrated 200"), cut_inside("BSc Computer Science")],
+], ids=["mid-bullet", "every-section", "across-sections"])
+def bench_generate_with_continuation_resumes_truncated_cv(monkeypatch, cuts):
+    fake = TruncatingModel(cuts)
+    monkeypatch.setattr(cv_generator, "timed_generate_content", fake)
+    assert generate_with_continuation("Write the CV", None) == FULL_CV
+    assert len(fake.prompts) == len(cuts) + 1
+    # Continuation prompts resend the tail, not the whole CV
+    assert "Last lines written" in fake.prompts[-1]
+
+def bench_generate_with_continuation_gives_up_after_max_rounds(monkeypatch):
+    cuts = [cut_inside(line) for line in ("Data engineer with", "Acme Ltd", "• Cut warehouse", "Beta plc")]
+    monkeypatch.setattr(cv_generator, "timed_generate_content", TruncatingModel(cuts))
+    with pytest.raises(Exception, match="still truncated by MAX_TOKENS after 3 continuation rounds"):
+        generate_with_continuation("Write the CV", None, max_rounds=3)
+
+def bench_generate_with_continuation_rejects_empty_continuation(monkeypatch):
+    from gemini_stub import RecordedResponse
+    responses = iter([RecordedResponse(FULL_CV[:cut_inside("Beta plc")], "MAX_TOKENS"), RecordedResponse("", "STOP")])
+    monkeypatch.setattr(cv_generator, "timed_generate_content", lambda *args, **kwargs: next(responses))
+    with pytest.raises(Exception, match="continuation of a truncated CV came back empty"):
+        generate_with_continuation("Write the CV", None)
+
+GRADUATE_CV = """JOHN SMITH
+john@example.com
+
+PROFESSIONAL SUMMARY:
+Computer science graduate.
+
+EDUCATION:
+BSc Computer Science | University of Leeds | 2024"""
+
+REGENERATED = {
+    "CVSummaryResult": {"summary": "Applying for Data Engineer: rewritten summary."},
+    "CVSkillsResult": {"skills": ["Python", "Spark", "Airflow"]},
+    "CVBulletsResult": {"bullets": ["Rewrote the first bullet.", "Rewrote the second bullet."]},
+}
+
+@pytest.fixture
+def section_model(monkeypatch):
+    """Stub of the schema-constrained sub-request: one canned answer per result type; returns the prompts sent"""
+    prompts = []
+    def cached_generate(prompt, response_schema=None, temperature=0.2, use_cache=True):
+        prompts.append(prompt)
+        return json.dumps(REGENERATED[response_schema.__name__])
+    monkeypatch.setattr(cv_generator, "cached_generate", cached_generate)
+    return prompts
+
+def assert_only_lines_replaced(before, after, first, last, new_lines):
+    """after is before with lines first..last (inclusive) swapped for new_lines, every other byte unchanged"""
+    old = before.split("\n")
+    assert after.split("\n") == old[:first] + new_lines + old[last + 1:]
+
+def bench_regenerate_summary(section_model):
+    lines = FULL_CV.split("\n")
+    summary = lines.index("Data engineer with eight years of pipeline experience.")
+    result = regenerate_section(FULL_CV, "Professional Summary", "Data Engineer JD", "resume")
+    assert_only_lines_replaced(FULL_CV, result, summary, summary, [REGENERATED["CVSummaryResult"]["summary"]])
+    assert "Acme Ltd | Senior Engineer | 2021 - 2024" in section_model[0]
+
+def bench_regenerate_summary_without_work_experience(section_model):
+    assert list_cv_roles(GRADUATE_CV) == []
+    result = regenerate_section(GRADUATE_CV, "PROFESSIONAL SUMMARY", "Data Engineer JD", "resume")
+    summary = GRADUATE_CV.split("\n").index("Computer science graduate.")
+    assert_only_lines_replaced(GRADUATE_CV, result, summary, summary, [REGENERATED["CVSummaryResult"]["summary"]])
+
+def bench_regenerate_skills(section_model):
+    cv = FULL_CV.replace("\n\nWORK EXPERIENCE:", "\n\nKEY SKILLS:\nSQL, Excel\n\nWORK EXPERIENCE:")
+    skills = cv.split("\n").index("SQL, Excel")
+    result = regenerate_section(cv, "KEY SKILLS", "Data Engineer JD", "resume")
+    assert_only_lines_replaced(cv, result, skills, skills, ["Python, Spark, Airflow"])
+
+def bench_regenerate_one_role(section_model):
+    lines = FULL_CV.split("\n")
+    first = lines.index("• Built streaming pipelines on Spark for 40M daily events.", lines.index(
+        "Beta plc | Senior Engineer | 2019 - 2021"
+    ))
+    result = regenerate_section(FULL_CV, "WORK EXPERIENCE", "Data Engineer JD", "resume", role_index=1)
+    new_lines = result.split("\n")[first:first + 2]
+    assert [line.replace("**", "") for line in new_lines] == [
+        f"• {bullet}" for bullet in REGENERATED["CVBulletsResult"]["bullets"]
+    ]
+    assert_only_lines_replaced(FULL_CV, result, first, first + 1, new_lines)
+    assert "Original responsibilities" in section_model[0] and "Migrated 200 Airflow DAGs" in section_model[0]
+
+def bench_regenerate_structured_role(section_model):
+    cv = cv_generator.StructuredCV(
+        name="Jane Doe", contact="jane@example.com", summary="Data engineer.", skills=["SQL"], education=[],
+        projects=[], certifications=[], roles=[
+            cv_generator.CVRole(company="Acme Ltd", title="Engineer", dates="2021 - 2024", bullets=["Built it."]),
+            cv_generator.CVRole(company="Beta plc", title="Engineer", dates="2019 - 2021", bullets=["Ran it."]),
+        ]
+    )
+    result = regenerate_section(cv, "WORK EXPERIENCE", "Data Engineer JD", "resume", role_index=0)
+    assert result.roles[0].bullets == REGENERATED["CVBulletsResult"]["bullets"]
+    assert result.model_copy(update={"roles": cv.roles}) == cv and result.roles[1] == cv.roles[1]
+
+def bench_analyze_cv_ats_score_raises_on_failure(monkeypatch):
+    # A zero-score fallback would be charged as a successful analysis
+    class FailingModel:
+        def generate_content(self, *args, **kwargs):
+            raise RuntimeError("quota exceeded")
+    monkeypatch.setattr(cv_generator, "model", FailingModel())
+    with pytest.raises(Exception, match="Failed to analyze ATS score: quota exceeded"):
+        analyze_cv_ats_score("cv", "jd")
@@ -0,0 +1,175 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import jd_fetcher
+from jd_fetcher import check_url, extract_posting_text, fetch_job_description
+
+POSTING_PAGE = """<html><head><title>Data Engineer - Acme</title></head><body>
+<nav><a href="/">Home</a><a href="/jobs">Jobs</a></nav>
+<div class="cookie-banner">We use cookies to improve your experience</div>
+<main>
+<h1>Data Engineer</h1>
+<p>Build <b>batch</b> and streaming pipelines on Apache Spark.</p>
+<ul><li>5+ years of Python</li><li>SQL and Airflow</li></ul>
+<p>Acme is an equal opportunity employer.</p>
+</main>
+<footer>Copyright Acme, all rights reserved</footer>
+</body></html>"""
+
+JSON_LD_PAGE = """<html><head><title>Careers</title>
+<script type="application/ld+json">{}</script>
+</head><body><div>Other openings</div></body></html>""".format(json.dumps({
+    "@context": "https://schema.org", "@type": "JobPosting", "title": "Platform Engineer",
+    "description": "<p>Run Kubernetes clusters.</p><ul><li>Terraform</li><li>Go</li></ul>"
+}))
+
+class PostingHandler(BaseHTTPRequestHandler):
+    """Job board stand-in: each path exercises one fetcher behaviour"""
+    requests_seen = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, dict(self.headers)))
+        if self.path == "/posting":
+            self.send(200, POSTING_PAGE.encode())
+        elif self.path == "/json-ld":
+            self.send(200, JSON_LD_PAGE.encode())
+        elif self.path == "/moved":
+            self.send(301, headers={"Location": "/posting"})
+        elif self.path == "/loop":
+            self.send(302, headers={"Location": "/loop"})
+        elif self.path == "/posting.pdf":
+            self.send(200, b"%PDF-1.4", content_type="application/pdf")
+        elif self.path == "/huge":
+            self.send(200, b"<html><body><p>" + b"x" * 200_000 + b"</p></body></html>")
+        elif self.path == "/slow":
+            time.sleep(1)
+            self.send(200, POSTING_PAGE.encode())
+        elif self.path == "/private":
+            self.send(403, b"Forbidden")
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send(304, headers={"ETag": '"v1"'})
+            else:
+                self.send(200, POSTING_PAGE.encode(), headers={"ETag": '"v1"'})
+        else:
+            self.send(404, b"Not found")
+
+@pytest.fixture(scope="module")
+def jd_server():
+    """Base URL of a local job board serving the PostingHandler routes"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PostingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def fetcher(monkeypatch, jd_server):
+    """Fetcher allowed to reach the loopback server, with an empty cache"""
+    monkeypatch.setattr(jd_fetcher, "ALLOW_PRIVATE_HOSTS", True)
+    jd_fetcher._cache.clear()
+    PostingHandler.requests_seen.clear()
+    yield jd_server
+    jd_fetcher._cache.clear()
+
+def bench_extract_posting_text(benchmark, job_description):
+    paragraphs = "".join(f"<p>{line}</p>" for line in job_description.splitlines() if line.strip())
+    page = f"<html><body><nav><a href='/'>Home</a></nav><main>{paragraphs}</main><footer>Footer</footer></body></html>"
+    title, text = benchmark(extract_posting_text, page.encode())
+    assert text and "Home" not in text
+
+def bench_main_content_is_extracted_without_chrome_or_boilerplate(fetcher):
+    result = fetch_job_description(f"{fetcher}/posting")
+    assert result.ok and not result.from_cache
+    assert result.title == "Data Engineer - Acme"
+    assert result.text.splitlines() == [
+        "Data Engineer", "Build batch and streaming pipelines on Apache Spark.", "• 5+ years of Python", "• SQL and Airflow"
+    ]
+
+def bench_json_ld_posting_is_preferred(fetcher):
+    result = fetch_job_description(f"{fetcher}/json-ld")
+    assert result.title == "Platform Engineer"
+    assert result.text.splitlines() == ["Platform Engineer", "Run Kubernetes clusters.", "• Terraform", "• Go"]
+
+def bench_redirect_is_followed(fetcher):
+    result = fetch_job_description(f"{fetcher}/moved")
+    assert result.ok and "Apache Spark" in result.text
+    assert [path for path, headers in PostingHandler.requests_seen] == ["/moved", "/posting"]
+
+def bench_redirect_loop_is_cut_off(fetcher):
+    result = fetch_job_description(f"{fetcher}/loop")
+    assert result.error == "Too many redirects"
+    assert len(PostingHandler.requests_seen) == jd_fetcher.MAX_REDIRECTS + 1
+
+def bench_non_html_content_type_is_rejected(fetcher):
+    result = fetch_job_description(f"{fetcher}/posting.pdf")
+    assert result.error == "Unsupported content type application/pdf"
+
+def bench_oversized_page_is_rejected(fetcher, monkeypatch):
+    monkeypatch.setattr(jd_fetcher, "MAX_PAGE_BYTES", 100_000)
+    assert fetch_job_description(f"{fetcher}/huge").error == "Page is too large"
+    monkeypatch.setattr(jd_fetcher, "MAX_PAGE_BYTES", 1_000_000)
+    assert fetch_job_description(f"{fetcher}/huge").ok
+
+def bench_slow_page_times_out(fetcher, monkeypatch):
+    monkeypatch.setattr(jd_fetcher, "JD_READ_TIMEOUT", 0.2)
+    started = time.perf_counter()
+    result = fetch_job_description(f"{fetcher}/slow")
+    assert not result.ok and "timed out" in result.error.lower()
+    assert time.perf_counter() - started < 1
+
+@pytest.mark.parametrize("path, error", [("/private", "HTTP 403"), ("/missing", "HTTP 404")])
+def bench_error_status_is_reported(fetcher, path, error):
+    result = fetch_job_description(f"{fetcher}{path}")
+    assert result.error == error and not result.text
+    assert f"{fetcher}{path}" not in jd_fetcher._cache
+
+def bench_cached_page_is_revalidated_with_etag(fetcher, monkeypatch):
+    assert fetch_job_description(f"{fetcher}/etag").ok
+    assert fetch_job_description(f"{fetcher}/etag").from_cache
+    assert len(PostingHandler.requests_seen) == 1
+
+    monkeypatch.setattr(jd_fetcher, "JD_CACHE_TTL", 0)
+    result = fetch_job_description(f"{fetcher}/etag")
+    assert result.from_cache and "Apache Spark" in result.text
+    assert PostingHandler.requests_seen[-1][1].get("If-None-Match") == '"v1"'
+
+def bench_internal_addresses_are_refused(jd_server):
+    result = fetch_job_description(f"{jd_server}/posting", use_cache=False)
+    assert result.error.startswith("Refusing to fetch internal address 127.0.0.1")
+
+@pytest.mark.parametrize("url, port", [
+    ("http://jobs.example.com/1", 80), ("https://jobs.example.com/1", 443), ("http://jobs.example.com:8080/1", 8080)
+])
+def bench_check_url_resolves_the_scheme_port(monkeypatch, url, port):
+    ports = []
+    def getaddrinfo(host, port, *args, **kwargs):
+        ports.append(port)
+        return [(None, None, None, "", ("93.184.216.34", port))]
+    monkeypatch.setattr(jd_fetcher.socket, "getaddrinfo", getaddrinfo)
+    check_url(url)
+    assert ports == [port]
+
+def bench_check_url_rejects_other_schemes():
+    with pytest.raises(ValueError, match="Not an http"):
+        check_url("file:///etc/passwd")
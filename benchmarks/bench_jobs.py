@@ -0,0 +1,163 @@
+import time
+import types
+import threading
+
+import pytest
+
+import jobs
+
+class FakeClock:
+    """Stand-in for the time module inside jobs.py whose time() only moves when advanced"""
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.perf_counter = time.perf_counter
+        self.sleep = time.sleep
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    """An empty job queue in a tmp SQLite file, on a fake clock"""
+    clock = FakeClock()
+    monkeypatch.setattr(jobs, "JOB_QUEUE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(jobs, "time", types.SimpleNamespace(
+        time=clock.time, perf_counter=clock.perf_counter, sleep=clock.sleep
+    ))
+    jobs.init_job_queue()
+    return clock
+
+def submit(max_attempts=jobs.DEFAULT_MAX_ATTEMPTS, reservation_id=None):
+    return jobs.submit_job("ats", {"resume_text": "cv", "job_description": "jd"}, "bench@example.com",
+                           max_attempts=max_attempts, reservation_id=reservation_id)
+
+def bench_claim_is_exclusive(clock):
+    submitted = {submit() for _ in range(40)}
+    claimed = {"worker-a": [], "worker-b": []}
+    start = threading.Barrier(2)
+
+    def claim_all(worker_id):
+        start.wait()
+        while (job := jobs.claim_next_job(worker_id)) is not None:
+            claimed[worker_id].append(job["id"])
+
+    threads = [threading.Thread(target=claim_all, args=(worker_id,)) for worker_id in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    everything = claimed["worker-a"] + claimed["worker-b"]
+    assert sorted(everything) == sorted(submitted)
+    assert all(jobs.get_job(job_id)["attempts"] == 1 for job_id in everything)
+
+def bench_expired_lease_is_reclaimed_and_stale_worker_loses_the_result(clock):
+    job_id = submit()
+    assert jobs.claim_next_job("worker-a")["id"] == job_id
+    assert jobs.claim_next_job("worker-b") is None
+
+    clock.advance(jobs.JOB_LEASE_SECONDS + 1)
+    job = jobs.claim_next_job("worker-b")
+    assert job["id"] == job_id and job["attempts"] == 2 and job["worker_id"] == "worker-b"
+
+    assert not jobs.complete_job(job_id, "worker-a", {"analysis": "stale"})
+    assert jobs.fail_job(job_id, "worker-a", "stale") is None
+    assert jobs.complete_job(job_id, "worker-b", {"analysis": "fresh"})
+    assert jobs.get_job(job_id)["result"] == {"analysis": "fresh"}
+
+def bench_renewed_lease_is_not_reclaimed(clock):
+    job_id = submit()
+    jobs.claim_next_job("worker-a")
+    clock.advance(jobs.JOB_LEASE_SECONDS - 10)
+    assert jobs.renew_lease(job_id, "worker-a")
+    assert not jobs.renew_lease(job_id, "worker-b")
+
+    clock.advance(20)
+    assert jobs.claim_next_job("worker-b") is None
+    clock.advance(jobs.JOB_LEASE_SECONDS)
+    assert jobs.claim_next_job("worker-b")["id"] == job_id
+    assert not jobs.renew_lease(job_id, "worker-a")
+
+def bench_reclaims_stop_at_max_attempts_and_abandoned_job_fails(clock):
+    job_id = submit(max_attempts=2, reservation_id=7)
+    jobs.claim_next_job("worker-a")
+    clock.advance(jobs.JOB_LEASE_SECONDS + 1)
+    assert jobs.claim_next_job("worker-b")["attempts"] == 2
+    assert jobs.fail_abandoned_jobs() == []
+
+    clock.advance(jobs.JOB_LEASE_SECONDS + 1)
+    assert jobs.claim_next_job("worker-c") is None
+    assert jobs.fail_abandoned_jobs() == [{"id": job_id, "reservation_id": 7}]
+    job = jobs.get_job(job_id)
+    assert job["status"] == "failed" and job["error"] == "Worker stopped while running the job"
+    assert jobs.active_reservation_ids() == []
+
+def bench_failed_job_backs_off_then_fails_and_retry_resets_it(clock):
+    job_id = submit(max_attempts=2, reservation_id=7)
+    jobs.claim_next_job("worker-a")
+    assert jobs.fail_job(job_id, "worker-a", "Gemini is down") == "queued"
+    # Backoff: not runnable until attempts * RETRY_BACKOFF_SECONDS have passed
+    assert jobs.claim_next_job("worker-a") is None
+    clock.advance(jobs.RETRY_BACKOFF_SECONDS)
+    jobs.claim_next_job("worker-a")
+    assert jobs.fail_job(job_id, "worker-a", "Gemini is down") == "failed"
+    assert jobs.active_reservation_ids() == []
+
+    jobs.retry_job(job_id, reservation_id=8)
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["attempts"], job["error"], job["reservation_id"]) == ("queued", 0, None, 8)
+    assert jobs.active_reservation_ids() == [8]
+    assert jobs.claim_next_job("worker-a")["attempts"] == 1
+
+def bench_purge_keeps_unfinished_jobs(clock):
+    finished, queued = submit(), submit()
+    jobs.claim_next_job("worker-a")
+    jobs.complete_job(finished, "worker-a", {})
+    clock.advance(jobs.JOB_RETENTION_SECONDS + 1)
+    assert jobs.purge_finished_jobs() == 1
+    assert jobs.get_job(finished) is None and jobs.get_job(queued)["status"] == "queued"
+
+@pytest.mark.parametrize("success", [True, False])
+def bench_settle_job_reservation(bench_database, bench_user, success):
+    bench_database.update_user_credits(bench_user, 1 - bench_database.get_user_credits(bench_user))
+    reservation_id = bench_database.reserve_credit(bench_user, 1, "ats")
+    jobs.settle_job_reservation({"id": "job", "reservation_id": reservation_id}, success=success)
+
+    assert bench_database.get_user_credits(bench_user) == (0 if success else 1)
+    # Settled either way: a second settlement changes nothing
+    assert not bench_database.commit_reservation(reservation_id)
+    assert not bench_database.release_reservation(reservation_id)
+
+@pytest.mark.parametrize("fails", [False, True])
+def bench_worker_settles_the_reservation(clock, monkeypatch, bench_database, bench_user, fails):
+    def handler(payload):
+        if fails:
+            raise RuntimeError("Gemini is down")
+        return {"analysis": {"score": 80}}
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "ats", handler)
+    bench_database.update_user_credits(bench_user, 1 - bench_database.get_user_credits(bench_user))
+    job_id = submit(max_attempts=1, reservation_id=bench_database.reserve_credit(bench_user, 1, "ats"))
+
+    jobs.run_worker(once=True)
+
+    assert jobs.get_job(job_id)["status"] == ("failed" if fails else "succeeded")
+    assert bench_database.get_user_credits(bench_user) == (1 if fails else 0)
+
+def bench_failed_ats_analysis_is_refunded(clock, monkeypatch, bench_database, bench_user):
+    import cv_generator
+
+    class FailingModel:
+        def generate_content(self, *args, **kwargs):
+            raise RuntimeError("quota exceeded")
+    monkeypatch.setattr(cv_generator, "model", FailingModel())
+    bench_database.update_user_credits(bench_user, 1 - bench_database.get_user_credits(bench_user))
+    job_id = submit(max_attempts=1, reservation_id=bench_database.reserve_credit(bench_user, 1, "ats"))
+
+    jobs.run_worker(once=True)
+
+    job = jobs.get_job(job_id)
+    assert job["status"] == "failed" and job["error"].startswith("Failed to analyze ATS score: quota exceeded")
+    assert bench_database.get_user_credits(bench_user) == 1
@@ -0,0 +1,24 @@
+from corpus import UploadedFile
+from cv_generator import extract_resume_text
+from templates import parse_cv_sections, trim_sections_to_fit
+from utils import enforce_page_limit
+
+def bench_parse_cv_sections(benchmark, cv_text):
+    sections = benchmark(parse_cv_sections, cv_text)
+    assert "WORK EXPERIENCE:" in sections
+
+def bench_trim_sections_to_fit(benchmark, cv_text):
+    parsed = parse_cv_sections(cv_text)
+    # trim_sections_to_fit mutates its input, so every round gets a fresh copy
+    benchmark(lambda: trim_sections_to_fit({key: list(value) for key, value in parsed.items()}))
+
+def bench_enforce_page_limit(benchmark, cv_text):
+    assert benchmark(enforce_page_limit, cv_text)
+
+def bench_extract_resume_text_pdf(benchmark, resume_pdf):
+    text = benchmark(lambda: extract_resume_text(UploadedFile(resume_pdf, "resume.pdf")))
+    assert "JANE DOE" in text
+
+def bench_extract_resume_text_docx(benchmark, resume_docx):
+    text = benchmark(lambda: extract_resume_text(UploadedFile(resume_docx, "resume.docx")))
+    assert "JANE DOE" in text
@@ -0,0 +1,106 @@
+import uuid
+
+import pytest
+
+import rate_limiter
+from rate_limiter import TokenBucket, MemoryBucketStore, PostgresBucketStore, RateLimiter
+
+class FakeClock:
+    """Monotonic clock that only moves when advanced"""
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+def bench_token_bucket_refills_at_its_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=2, refill_per_second=0.5, clock=clock)
+    assert bucket.try_acquire() == (True, 0.0)
+    assert bucket.try_acquire() == (True, 0.0)
+    assert bucket.try_acquire() == (False, 2.0)
+
+    clock.advance(1)
+    assert bucket.try_acquire() == (False, 1.0)
+    clock.advance(1)
+    assert bucket.try_acquire() == (True, 0.0)
+
+    # Refill stops at capacity however long the bucket sits idle
+    clock.advance(3600)
+    assert bucket.is_full(clock())
+    assert [bucket.try_acquire()[0] for _ in range(3)] == [True, True, False]
+
+def bench_token_bucket_refund_is_capped_at_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=1, refill_per_second=0.1, clock=clock)
+    assert bucket.try_acquire()[0] and not bucket.try_acquire()[0]
+    bucket.refund()
+    bucket.refund()
+    assert bucket.tokens == 1
+    assert bucket.try_acquire()[0] and not bucket.try_acquire()[0]
+
+def bench_memory_store_sweeps_full_buckets():
+    clock = FakeClock()
+    store = MemoryBucketStore(clock=clock)
+    store.try_acquire("user:idle", 2, 1.0)
+    store.try_acquire("user:busy", 2, 0.001)
+    store.try_acquire("user:busy", 2, 0.001)
+    assert store.bucket_count() == 2
+
+    # Nothing is swept before the interval; then only the bucket that refilled completely is dropped
+    clock.advance(rate_limiter.MEMORY_SWEEP_INTERVAL - 1)
+    store.try_acquire("user:other", 2, 1.0)
+    assert store.bucket_count() == 3
+    clock.advance(1)
+    store.refund("user:busy", 2, 0.001)
+    assert set(store.buckets) == {"user:busy"}
+    # The refund landed on the surviving bucket, not a fresh one
+    assert store.buckets["user:busy"].tokens < 2
+
+def bench_limiter_refunds_the_user_when_the_global_bucket_rejects():
+    limiter = RateLimiter(MemoryBucketStore(clock=FakeClock()), user_capacity=2, user_refill_per_minute=0.01,
+                          global_capacity=1, global_refill_per_minute=0.01)
+    assert limiter.acquire("a@example.com").allowed
+    result = limiter.acquire("b@example.com")
+    assert not result.allowed and result.scope == "global"
+    assert limiter.store.buckets["user:b@example.com"].tokens == 2
+
+def bench_limiter_refund_after_credit_rejection():
+    # app.reject_for_credits: the request was allowed by the limiter but never ran for lack of credits
+    limiter = RateLimiter(MemoryBucketStore(clock=FakeClock()), user_capacity=1, user_refill_per_minute=0.01,
+                          global_capacity=1, global_refill_per_minute=0.01)
+    assert limiter.acquire("a@example.com").allowed
+    assert limiter.acquire("a@example.com").scope == "user"
+    limiter.refund("a@example.com")
+    assert limiter.acquire("a@example.com").allowed
+    assert limiter.get_stats()["actions"]["generate"] == {"allowed": 2, "rejected_user": 1, "rejected_global": 0}
+
+def bench_postgres_store_upsert(bench_database):
+    store = PostgresBucketStore()
+    key = f"user:{uuid.uuid4().hex}"
+    # A rate this slow doesn't refill measurably during the test, so the outcomes are deterministic
+    rate = 1e-6
+    assert store.try_acquire(key, 2, rate) == (True, 0.0)
+    assert store.try_acquire(key, 2, rate) == (True, 0.0)
+    allowed, retry_after = store.try_acquire(key, 2, rate)
+    assert not allowed and retry_after == pytest.approx(1 / rate, rel=0.01)
+
+    store.refund(key, 2, rate)
+    store.refund(key, 2, rate)
+    store.refund(key, 2, rate)
+    with bench_database.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT tokens FROM rate_limit_buckets WHERE bucket_key = %s", (key,))
+        assert cursor.fetchone()[0] == 2
+        # Ten seconds of refill at one token a second tops the bucket up again
+        store.try_acquire(key, 2, rate)
+        store.try_acquire(key, 2, rate)
+        cursor.execute("""
+            UPDATE rate_limit_buckets SET updated_at = updated_at - INTERVAL '10 seconds' WHERE bucket_key = %s
+        """, (key,))
+    assert store.try_acquire(key, 2, 1.0) == (True, 0.0)
+    assert store.try_acquire(key, 2, 1.0) == (True, 0.0)
+    assert not store.try_acquire(key, 2, 1.0)[0]
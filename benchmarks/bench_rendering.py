@@ -0,0 +1,16 @@
+import pytest
+
+from cv_generator import export_interview_qa
+from templates import apply_template, create_word_document, get_available_templates
+
+@pytest.mark.parametrize("template_name", list(get_available_templates()))
+def bench_apply_template(benchmark, cv_text, template_name):
+    buffer = benchmark(apply_template, cv_text.replace("**", ""), template_name)
+    assert buffer.getvalue().startswith(b"%PDF")
+
+def bench_create_word_document(benchmark, cv_text):
+    assert benchmark(create_word_document, cv_text).getvalue()
+
+def bench_export_interview_qa(benchmark, interview_qa):
+    pdf_buffer, docx_buffer = benchmark(export_interview_qa, interview_qa)
+    assert pdf_buffer.getvalue() and docx_buffer.getvalue()
@@ -0,0 +1,52 @@
+from utils import optimize_keywords, calculate_ats_score, extract_keywords_from_text
+
+def bench_optimize_keywords(benchmark, cv_text, job_description):
+    analysis = benchmark(optimize_keywords, cv_text, job_description)
+    assert 0 <= analysis['score'] <= 100
+
+def bench_calculate_ats_score(benchmark, cv_text, job_description):
+    assert 0 <= benchmark(calculate_ats_score, cv_text, job_description) <= 100
+
+def bench_extract_keywords_from_text(benchmark, job_description):
+    assert benchmark(extract_keywords_from_text, job_description)
+
+def bench_taxonomy_classify(benchmark, job_description):
+    from taxonomy import get_taxonomy
+    assert benchmark(get_taxonomy().classify, job_description)
+
+def bench_taxonomy_load(benchmark):
+    from taxonomy import compile_taxonomy, Taxonomy
+    data = compile_taxonomy().to_bytes()
+    assert benchmark(Taxonomy.from_bytes, data).skills
+
+def bench_compact_job_description(benchmark, job_description):
+    from keywords import compact_text
+    assert benchmark(compact_text, job_description, len(job_description) // 2)
+
+def bench_idf_file_load(benchmark, tmp_path, job_description):
+    from keywords import build_background_file, MappedFrequencies
+    path = str(tmp_path / "keyword_idf.bin")
+    build_background_file([job_description] * 3, path)
+    assert len(benchmark(MappedFrequencies, path))
+
+BOILERPLATE_JD = """Senior Data Engineer
+We are looking for a senior engineer to run our data programs. You will build pipelines with Spark and Kafka on AWS.
+Requirements: 5+ years Python, SQL, Airflow. Experience with Apache Spark and data modeling.
+Experienced engineers with 3 years of experience in Kafka; experience with user experience research helps.
+Benefits: health insurance, 401k, paid time off, flexible schedule.
+Acme is an equal opportunity employer. We offer competitive salary and benefits.
+"""
+
+def bench_keywords_skip_job_ad_filler():
+    from keywords import extract_keywords
+    keywords = extract_keywords(BOILERPLATE_JD, top_k=30)
+    assert {"spark", "kafka", "python", "airflow"} <= set(keywords)
+    assert not {"run", "programs", "senior", "equal", "employer", "paid", "salary", "401k"} & set(keywords)
+    # "Experience" in any form is what every posting asks for, not a skill; user experience is one
+    assert not {"experience", "experienced", "years of experience", "experience with"} & set(keywords)
+    assert "user experience" in keywords
+
+def bench_optimize_keywords_matches_synonyms():
+    cv = "Data engineer. Built pipelines in spark and kafka on aws with python, sql and airflow; data modeling."
+    analysis = optimize_keywords(cv, BOILERPLATE_JD)
+    assert "spark" not in analysis["missing_keywords"] and "apache spark" not in analysis["missing_keywords"]
@@ -0,0 +1,101 @@
+"""Benchmark fixtures: synthetic corpus, recorded Gemini responses and a throwaway Postgres database
+
+Run from the repository root with:  pytest benchmarks
+"""
+import os
+import sys
+from urllib.parse import urlparse, urlunparse
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus
+from gemini_stub import RecordedModel
+
+# Server used to create the throwaway benchmark database (the database in the URL is only used to connect)
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@localhost:5432/postgres")
+BENCH_DATABASE_NAME = f"cvolve_bench_{os.getpid()}"
+BENCH_DATABASE_DSN = urlunparse(urlparse(BENCH_DATABASE_URL)._replace(path=f"/{BENCH_DATABASE_NAME}"))
+
+# The app modules read their configuration from st.secrets at import time; keep benchmarks offline and isolated
+import streamlit as st
+st.secrets = {"DATABASE_URL": BENCH_DATABASE_DSN, "GEMINI_API_KEY": "offline-benchmark"}
+
+@pytest.fixture(scope="session", params=corpus.SIZES)
+def size(request):
+    return request.param
+
+@pytest.fixture(scope="session")
+def cv_text(size):
+    return corpus.make_cv_text(size)
+
+@pytest.fixture(scope="session")
+def resume_text(size):
+    return corpus.make_resume_text(size)
+
+@pytest.fixture(scope="session")
+def job_description(size):
+    return corpus.make_job_description(size)
+
+@pytest.fixture(scope="session")
+def interview_qa(size):
+    return corpus.make_interview_qa(size)
+
+@pytest.fixture(scope="session")
+def resume_pdf(size):
+    return corpus.make_resume_pdf(size)
+
+@pytest.fixture(scope="session")
+def resume_docx(size):
+    return corpus.make_resume_docx(size)
+
+@pytest.fixture
+def gemini_stub(monkeypatch):
+    """Replace the Gemini model with recorded responses and start from an empty LLM cache"""
+    import cv_generator
+    stub = RecordedModel()
+    monkeypatch.setattr(cv_generator, "model", stub)
+    cv_generator._llm_cache.clear()
+    return stub
+
+@pytest.fixture(scope="session")
+def bench_database():
+    """Create a throwaway database on the local server, initialize the schema, and drop it afterwards"""
+    try:
+        admin = psycopg2.connect(BENCH_DATABASE_URL, connect_timeout=3)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"No local PostgreSQL server at {BENCH_DATABASE_URL}: {e}")
+    admin.autocommit = True
+    cursor = admin.cursor()
+    cursor.execute(f"CREATE DATABASE {BENCH_DATABASE_NAME}")
+
+    os.environ["DATABASE_URL"] = BENCH_DATABASE_DSN
+    import database
+    database.init_db()
+    try:
+        yield database
+    finally:
+        if database._db_pool is not None:
+            database._db_pool.closeall()
+            database._db_pool = None
+        cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE_NAME} WITH (FORCE)")
+        cursor.close()
+        admin.close()
+
+@pytest.fixture
+def bench_user(bench_database):
+    """A user with plenty of credits, recreated for each benchmark"""
+    email = "bench@example.com"
+    database = bench_database
+    database.create_user(email, "Bench User", "email")
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE users SET credits = 1000000 WHERE email = %s
+    """, (email,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return email
@@ -0,0 +1,128 @@
+"""Deterministic synthetic resumes, CVs and job descriptions in several sizes"""
+import random
+from io import BytesIO
+
+from docx import Document
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+SIZES = ("small", "medium", "large")
+
+# Roles per CV, bullets per role, and job description length (words) for each size
+SIZE_SPECS = {
+    "small": {"roles": 3, "bullets": 3, "jd_words": 150, "projects": 1},
+    "medium": {"roles": 6, "bullets": 5, "jd_words": 500, "projects": 3},
+    "large": {"roles": 12, "bullets": 8, "jd_words": 1500, "projects": 6}
+}
+
+SKILLS = [
+    "Python", "SQL", "PostgreSQL", "Airflow", "Spark", "Kafka", "AWS", "GCP", "Docker", "Kubernetes",
+    "Terraform", "dbt", "Snowflake", "Tableau", "Power BI", "ETL", "data modeling", "machine learning",
+    "stakeholder management", "agile delivery", "CI/CD", "REST APIs", "pandas", "scikit-learn",
+    "data governance", "A/B testing", "forecasting", "data quality", "BigQuery", "Looker"
+]
+
+VERBS = [
+    "Led", "Designed", "Built", "Automated", "Optimized", "Delivered", "Migrated", "Scaled",
+    "Implemented", "Streamlined", "Owned", "Launched"
+]
+
+FILLER = [
+    "the", "team", "platform", "pipelines", "customers", "reporting", "across", "regions", "with",
+    "daily", "production", "workloads", "analytics", "business", "partners", "for", "and", "reliable"
+]
+
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises", "Soylent"]
+TITLES = ["Data Engineer", "Senior Data Engineer", "Analytics Engineer", "Data Analyst", "Lead Data Engineer"]
+
+def _rng(size, kind):
+    return random.Random(f"{kind}-{size}")
+
+def _bullet(rng):
+    words = [rng.choice(VERBS)] + rng.sample(FILLER, 6) + rng.sample(SKILLS, 2)
+    return " ".join(words) + f", improving throughput by {rng.randint(5, 60)}%."
+
+def make_cv_text(size):
+    """CV text in the format produced by the CV prompt (headers, pipes and bullets)"""
+    spec = SIZE_SPECS[size]
+    rng = _rng(size, "cv")
+    lines = [
+        "JANE DOE",
+        "+44 20 7946 0000 | jane.doe@example.com | London, UK",
+        "",
+        "PROFESSIONAL SUMMARY:",
+        "Applying for Senior Data Engineer with " + " ".join(rng.sample(SKILLS, 12)) + " experience.",
+        "",
+        "KEY SKILLS:",
+        ", ".join(rng.sample(SKILLS, 20)),
+        "",
+        "WORK EXPERIENCE:"
+    ]
+    for i in range(spec["roles"]):
+        lines.append(f"{COMPANIES[i % len(COMPANIES)]} | {rng.choice(TITLES)} | 20{10 + i} - 20{11 + i}")
+        lines.extend(f"• {_bullet(rng)}" for _ in range(spec["bullets"]))
+        lines.append("")
+    lines.append("EDUCATION:")
+    lines.append("• MSc Computer Science | University of Manchester | 2012")
+    lines.append("")
+    lines.append("PROJECTS:")
+    for i in range(spec["projects"]):
+        lines.append(f"Project {i + 1}")
+        lines.extend(f"• {_bullet(rng)}" for _ in range(2))
+    lines.append("")
+    lines.append("CERTIFICATIONS:")
+    lines.append("• AWS Certified Data Engineer")
+    return "\n".join(lines)
+
+def make_resume_text(size):
+    """Original resume text (plain, without the CV formatting conventions)"""
+    return make_cv_text(size).replace("**", "").replace(":", "")
+
+def make_job_description(size):
+    """Job description with the given size's word count"""
+    rng = _rng(size, "jd")
+    words = ["Job title: Senior Data Engineer.", "Responsibilities include"]
+    while len(words) < SIZE_SPECS[size]["jd_words"]:
+        words.append(rng.choice(SKILLS) if rng.random() < 0.3 else rng.choice(FILLER))
+    return " ".join(words)
+
+def make_interview_qa(size):
+    """Interview Q&A markdown in the generate_interview_qa output format"""
+    rng = _rng(size, "qa")
+    count = {"small": 5, "medium": 10, "large": 20}[size]
+    blocks = []
+    for i in range(1, count + 1):
+        blocks.append(f"Q{i}: How did you use {rng.choice(SKILLS)} to deliver {rng.choice(FILLER)} outcomes?")
+        blocks.append(f"A{i}:")
+        blocks.extend(f"- {_bullet(rng)}" for _ in range(6))
+        blocks.append("")
+    return "\n".join(blocks)
+
+class UploadedFile(BytesIO):
+    """In-memory file with the .name attribute of Streamlit's UploadedFile"""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+def make_resume_pdf(size):
+    """Resume as PDF bytes (one line per text line, paginated)"""
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    y = 750
+    for line in make_resume_text(size).split("\n"):
+        pdf.drawString(40, y, line[:110])
+        y -= 14
+        if y < 40:
+            pdf.showPage()
+            y = 750
+    pdf.save()
+    return buffer.getvalue()
+
+def make_resume_docx(size):
+    """Resume as DOCX bytes (one paragraph per text line)"""
+    doc = Document()
+    for line in make_resume_text(size).split("\n"):
+        doc.add_paragraph(line)
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
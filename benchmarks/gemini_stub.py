@@ -0,0 +1,62 @@
+"""Offline stand-in for google.generativeai.GenerativeModel that replays recorded responses"""
+import json
+import os
+
+RESPONSES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "gemini_responses.json")
+
+class _FinishReason:
+    def __init__(self, name):
+        self.name = name
+
+class _Part:
+    def __init__(self, text):
+        self.text = text
+
+class _Content:
+    def __init__(self, text):
+        self.parts = [_Part(text)]
+
+class _Candidate:
+    def __init__(self, text, finish_reason):
+        self.content = _Content(text)
+        self.finish_reason = _FinishReason(finish_reason)
+
+class RecordedResponse:
+    """The parts of GenerateContentResponse the app reads, for both streaming and non-streaming calls"""
+    def __init__(self, text, finish_reason="STOP"):
+        self.text = text
+        self.candidates = [_Candidate(text, finish_reason)]
+
+    def __iter__(self):
+        yield self
+
+    def resolve(self):
+        pass
+
+class RecordedModel:
+    """Replays a recorded response chosen by response schema, JSON mode or prompt markers"""
+    model_name = "models/recorded-stub"
+
+    def __init__(self, responses_path=RESPONSES_PATH):
+        with open(responses_path) as f:
+            self.responses = json.load(f)
+        self.calls = []
+
+    def _key(self, prompt, generation_config):
+        schema = getattr(generation_config, "response_schema", None) if generation_config else None
+        if schema is not None:
+            return getattr(schema, "__name__", str(schema))
+        if generation_config is not None and getattr(generation_config, "response_mime_type", None) == "application/json":
+            return "ats"
+        if "interview questions" in prompt:
+            return "interview_qa"
+        if "cover letter" in prompt:
+            return "cover_letter"
+        return "cv_text"
+
+    def generate_content(self, prompt=None, generation_config=None, stream=False, contents=None, **kwargs):
+        prompt = prompt if prompt is not None else contents
+        key = self._key(prompt, generation_config)
+        self.calls.append(key)
+        response = self.responses[key]
+        return RecordedResponse(json.dumps(response) if not isinstance(response, str) else response)
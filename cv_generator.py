@@ -1,21 +1,117 @@
 import os
 import re
 import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from datetime import datetime
 import PyPDF2 as pdf
 from docx import Document
 import google.generativeai as genai
 from google.generativeai import types
-from pydantic import BaseModel
-from utils import optimize_keywords, enforce_page_limit
+from typing import List
+from pydantic import BaseModel, ValidationError
+from utils import optimize_keywords, enforce_page_limit, configure_gemini
+from keywords import compact_text
+from tracing import stage, record_stage, record_first, propagate
+from metrics import (
+    timed, LLM_REQUESTS, LLM_REQUEST_SECONDS, LLM_TTFB_SECONDS, LLM_CACHE_REQUESTS, RESUME_EXTRACT_SECONDS
+)
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; cross-process coalescing is disabled there
+    fcntl = None
 
 os.environ["GEMINI_API_KEY"] = st.secrets["GEMINI_API_KEY"]
 
 # Initialize Gemini client
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+configure_gemini()
 model = genai.GenerativeModel("gemini-2.5-flash")
 
+# Maximum number of follow-up calls used to finish a CV truncated by MAX_TOKENS
+MAX_CONTINUATION_ROUNDS = 3
+
+# Characters of the truncated CV resent with each continuation prompt
+CONTINUATION_TAIL_CHARS = 1500
+
+# Most lines at the end of a truncated CV that a continuation may repeat before it carries on
+STITCH_OVERLAP_LINES = 5
+
+# Worker threads used by the section-parallel generation mode
+PARALLEL_SECTION_WORKERS = 8
+
+# Number of LLM responses kept in the in-process response cache
+LLM_CACHE_SIZE = 256
+
+_llm_cache = OrderedDict()
+_llm_cache_lock = threading.Lock()
+
+# Seconds a cross-process single-flight result or lock file is kept before it is swept
+SINGLE_FLIGHT_RESULT_TTL = 60
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+# Stream CV calls so the time to the first chunk can be recorded (changes how calls are made, so off by default)
+TRACE_LLM_TTFB = os.getenv("TRACE_LLM_TTFB", "").lower() in ("1", "true", "yes")
+
+# JDs longer than this go into prompts cut down to their most keyword-dense sentences
+PROMPT_JD_MAX_CHARS = int(os.getenv("PROMPT_JD_MAX_CHARS", "6000"))
+
+# Sections that regenerate_section can rewrite in place
+REGENERATABLE_SECTIONS = ("PROFESSIONAL SUMMARY", "KEY SKILLS", "WORK EXPERIENCE")
+
+# Section header lines such as "WORK EXPERIENCE:" (optionally wrapped in markdown bold)
+SECTION_HEADER_PATTERN = re.compile(r'^\s*\**([A-Z][A-Z &/]+):\**\s*$', re.MULTILINE)
+
+# Output format section of the plain text CV prompt
+CV_TEXT_FORMAT = """Generate the resume in this exact plain text format with these headers (Headers in Bold), make sure name and details are in centre:
+
+    NAME
+    Phone No | Email | Address
+    # Make sure NAME and contact details are at the top, centered, and not under any section
+
+    PROFESSIONAL SUMMARY:
+    
+
+    KEY SKILLS:
+    Skill 1, Skill 2.....
+
+    WORK EXPERIENCE:(keep the dates in the same format as given in resume)
+    Company | Role | Dates
+    • Bullet 1
+    • Bullet 2
+
+    EDUCATION:
+    • Degree | Institution | Year(keep the dates in the same format as given in resume)
+
+    PROJECTS:(if any)
+    Project Name 1
+    • Bullet 1
+    • Bullet 2
+    
+    Project Name 2
+    • Bullet 1
+    • Bullet 2
+
+    CERTIFICATIONS:(If any)
+"""
+
+# Output format section of the structured CV prompt (the JSON shape is enforced by response_schema)
+CV_JSON_FORMAT = """Return the resume as a single JSON object matching the provided schema:
+    - name and contact: candidate name and "Phone No | Email | Address" exactly as in the resume
+    - summary: the professional summary
+    - skills: the list of ATS skills
+    - roles: one entry per company with company, title, dates (same format as the resume) and bullets
+    - education: one entry per qualification with degree, institution and year
+    - projects and certifications: only if present in the resume, otherwise empty lists
+    Do not use markdown inside any value.
+"""
+
 class CVOptimization(BaseModel):
     """CV optimization response model"""
     ats_score: int
@@ -23,22 +119,258 @@ class CVOptimization(BaseModel):
     optimized_content: str
     suggestions: list
 
+class CVRole(BaseModel):
+    """Work experience entry of a structured CV"""
+    company: str
+    title: str
+    dates: str
+    bullets: List[str]
+
+class CVEducation(BaseModel):
+    """Education entry of a structured CV"""
+    degree: str
+    institution: str
+    year: str
+
+class CVProject(BaseModel):
+    """Project entry of a structured CV"""
+    name: str
+    bullets: List[str]
+
+class StructuredCV(BaseModel):
+    """Structured CV returned by the JSON generation mode"""
+    name: str
+    contact: str
+    summary: str
+    skills: List[str]
+    roles: List[CVRole]
+    education: List[CVEducation]
+    projects: List[CVProject]
+    certifications: List[str]
+
+    def to_sections(self, keywords=None):
+        """Return sections in the same shape as templates.parse_cv_sections, without re-parsing text"""
+        sections = {}
+        if self.summary:
+            sections["PROFESSIONAL SUMMARY:"] = [self.summary]
+        if self.skills:
+            sections["KEY SKILLS:"] = [", ".join(self.skills)]
+        if self.roles:
+            lines = []
+            for role in self.roles:
+                lines.append(f"{role.company} | {role.title} | {role.dates}")
+                lines.extend(f"• {bullet}" for bullet in role.bullets)
+            if keywords:
+                pattern = keyword_pattern(keywords)
+                lines = [bold_keywords(line, pattern) for line in lines]
+            sections["WORK EXPERIENCE:"] = lines
+        if self.education:
+            sections["EDUCATION:"] = [
+                f"• {edu.degree} | {edu.institution} | {edu.year}" for edu in self.education
+            ]
+        if self.projects:
+            lines = []
+            for project in self.projects:
+                lines.append(project.name)
+                lines.extend(f"• {bullet}" for bullet in project.bullets)
+            sections["PROJECTS:"] = lines
+        if self.certifications:
+            sections["CERTIFICATIONS:"] = [f"• {cert}" for cert in self.certifications]
+        sections["HEADER"] = [line for line in (self.name, self.contact) if line]
+        return sections
+
+    def to_text(self, keywords=None):
+        """Render the CV in the plain text format used for preview, DOCX export and scoring"""
+        sections = self.to_sections(keywords)
+        blocks = ['\n'.join(sections.pop("HEADER"))]
+        for section_name, lines in sections.items():
+            blocks.append('\n'.join([section_name] + lines))
+        return '\n\n'.join(blocks)
+
+class CVPlanRole(BaseModel):
+    """Role from the resume with the JD keywords allocated to it"""
+    company: str
+    title: str
+    dates: str
+    source_text: str
+    bullet_count: int
+    keywords: List[str]
+
+class CVPlan(BaseModel):
+    """Output of the planning call used by section-parallel generation"""
+    name: str
+    contact: str
+    job_title: str
+    years_experience: str
+    summary_keywords: List[str]
+    roles: List[CVPlanRole]
+    education: List[CVEducation]
+    projects: List[CVProject]
+    certifications: List[str]
+
+class CVSummaryResult(BaseModel):
+    """Professional summary sub-request result"""
+    summary: str
+
+class CVSkillsResult(BaseModel):
+    """Key skills sub-request result"""
+    skills: List[str]
+
+class CVBulletsResult(BaseModel):
+    """Role bullets sub-request result"""
+    bullets: List[str]
+
+class _InFlightCall:
+    """Upstream call shared by every concurrent request with the same key"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def generation_key(*parts):
+    """Build the coalescing key of a generation request from its inputs"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def single_flight(key, fn):
+    """Run fn once per key at a time; concurrent callers with the same key wait for and share its result"""
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _InFlightCall()
+            _in_flight[key] = call
+
+    if not is_leader:
+        call.done.wait()
+        if call.error:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        call.done.set()
+
+def _dump_result(result):
+    """JSON form of a coalesced generation result (plain text CV or StructuredCV)"""
+    if isinstance(result, StructuredCV):
+        return json.dumps({"structured": result.model_dump()})
+    return json.dumps({"text": result})
+
+def _load_result(data):
+    payload = json.loads(data)
+    if "structured" in payload:
+        return StructuredCV.model_validate(payload["structured"])
+    return payload["text"]
+
+def _open_lock(lock_path):
+    """Open and exclusively lock lock_path, retrying if a sweep removed the file while we waited on it"""
+    while True:
+        lock_file = open(lock_path, "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                return lock_file
+        except FileNotFoundError:
+            pass
+        lock_file.close()
+
+def file_single_flight(key, fn, lock_dir):
+    """Cross-process single flight on one host: the lock holder generates, processes that waited read its result
+
+    Only a result written while this caller waited is served, so a later identical request generates afresh.
+    """
+    os.makedirs(lock_dir, exist_ok=True)
+    lock_path = os.path.join(lock_dir, f"{key}.lock")
+    result_path = os.path.join(lock_dir, f"{key}.result")
+
+    waiting_since = time.time()
+    lock_file = _open_lock(lock_path)
+    try:
+        # A process that held the lock while we waited may have just produced the result
+        try:
+            if os.path.getmtime(result_path) >= waiting_since:
+                with open(result_path, encoding="utf-8") as f:
+                    return _load_result(f.read())
+        except (OSError, ValueError, ValidationError):
+            pass
+
+        result = fn()
+
+        tmp_path = f"{result_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(_dump_result(result))
+        os.replace(tmp_path, result_path)
+        return result
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+def sweep_single_flight_results(lock_dir, result_ttl=SINGLE_FLIGHT_RESULT_TTL):
+    """Delete persisted single-flight results (they contain CV data) and idle lock files once they are stale"""
+    now = time.time()
+    for filename in os.listdir(lock_dir):
+        path = os.path.join(lock_dir, filename)
+        try:
+            if now - os.path.getmtime(path) < result_ttl:
+                continue
+            if filename.endswith(".result"):
+                os.remove(path)
+            elif filename.endswith(".lock"):
+                # Only a lock nobody holds; a waiter that locked the removed file notices and reopens it
+                with open(path, "a") as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    os.remove(path)
+        except OSError:
+            pass
+
+def coalesce(key, fn):
+    """Deduplicate identical in-flight generations within the process (and across processes if configured)"""
+    lock_dir = os.getenv("CV_SINGLE_FLIGHT_DIR")
+    if lock_dir and fcntl:
+        if os.path.isdir(lock_dir):
+            sweep_single_flight_results(lock_dir)
+        return single_flight(key, lambda: file_single_flight(key, fn, lock_dir))
+    return single_flight(key, fn)
+
 def extract_resume_text(uploaded_file):
     """Extract text from uploaded resume file"""
-    if uploaded_file.name.endswith(".pdf"):
-        reader = pdf.PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
-    elif uploaded_file.name.endswith(".docx"):
-        doc = Document(uploaded_file)
-        return '\n'.join([para.text for para in doc.paragraphs if para.text.strip()])
-    else:
-        return ""
+    file_type = os.path.splitext(uploaded_file.name)[1].lstrip(".").lower() or "unknown"
+    with timed(RESUME_EXTRACT_SECONDS, file_type=file_type):
+        if uploaded_file.name.endswith(".pdf"):
+            reader = pdf.PdfReader(uploaded_file)
+            text = ""
+            for page in reader.pages:
+                text += page.extract_text()
+            return text
+        elif uploaded_file.name.endswith(".docx"):
+            doc = Document(uploaded_file)
+            return '\n'.join([para.text for para in doc.paragraphs if para.text.strip()])
+        else:
+            return ""
+
+def generate_cv(resume_text, job_description, target_match, template, sections, quantitative_focus, action_verb_intensity, keyword_matching, structured=False):
+    """Generate optimized CV using Gemini AI (a StructuredCV when structured=True)"""
+    key = generation_key(
+        "cv", resume_text, job_description, target_match, template, sections,
+        quantitative_focus, action_verb_intensity, keyword_matching, structured
+    )
+    return coalesce(key, lambda: _generate_cv(
+        resume_text, job_description, target_match, template, sections,
+        quantitative_focus, action_verb_intensity, keyword_matching, structured
+    ))
 
-def generate_cv(resume_text, job_description, target_match, template, sections, quantitative_focus, action_verb_intensity, keyword_matching):
-    """Generate optimized CV using Gemini AI"""
+def _generate_cv(resume_text, job_description, target_match, template, sections, quantitative_focus, action_verb_intensity, keyword_matching, structured=False):
+    """Run a single CV generation (callers go through generate_cv for request coalescing)"""
     
     # Build sections string
     sections_list = [section for section, include in sections.items() if include]
@@ -57,8 +389,72 @@ def generate_cv(resume_text, job_description, target_match, template, sections,
         "Aggressive": "maximize keyword density and exact phrase matching"
     }
     
-    # Direct prompt for CV output only
-    prompt = f"""
+    with stage("prompt_build"):
+        prompt = build_cv_prompt(resume_text, job_description, target_match, structured=structured)
+
+    try:
+        if not model:
+            raise Exception("Gemini AI client not initialized")
+
+        if structured:
+            return generate_structured_cv(prompt)
+
+        optimized_cv = generate_with_continuation(
+            prompt,
+            generation_config=types.GenerationConfig(
+                temperature=0.2  # optional
+            )
+        )
+
+        # Clean up the response
+        with stage("cleanup"):
+            optimized_cv = clean_cv_content(optimized_cv)
+        with stage("page_fit"):
+            optimized_cv = enforce_page_limit(optimized_cv)
+
+        from utils import extract_keywords_from_text
+
+        with stage("cleanup"):
+            jd_keywords = extract_keywords_from_text(job_description)
+            optimized_cv = bold_keywords_in_work_exp(optimized_cv, jd_keywords)
+
+        return optimized_cv.strip()
+        
+    except Exception as e:
+        raise Exception(f"Failed to generate CV: {str(e)}")
+
+def generate_cv_document(resume_text, job_description, target_match, template, sections, generation_mode="standard"):
+    """Generate a CV in the selected mode and return (cv_text, structured_cv or None)"""
+    from utils import extract_keywords_from_text
+
+    if generation_mode == "parallel":
+        structured_cv = generate_cv_parallel(resume_text, job_description, target_match)
+    else:
+        cv_result = generate_cv(
+            resume_text=resume_text,
+            job_description=job_description,
+            target_match=target_match,
+            template=template,
+            sections=sections,
+            quantitative_focus=60,
+            action_verb_intensity="High",
+            keyword_matching="Balanced",
+            structured=generation_mode == "structured"
+        )
+        if generation_mode != "structured":
+            # Enforce 2-page limit
+            with stage("page_fit"):
+                return enforce_page_limit(cv_result), None
+        structured_cv = cv_result
+
+    # Templates render the structured CV directly; text is only built for preview/DOCX
+    with stage("cleanup"):
+        return structured_cv.to_text(extract_keywords_from_text(job_description)), structured_cv
+
+def build_cv_prompt(resume_text, job_description, target_match, structured=False):
+    """Build the CV generation prompt in plain text or structured (JSON) form"""
+    output_format = CV_JSON_FORMAT if structured else CV_TEXT_FORMAT
+    return f"""
     You are a professional resume writer and an expert in ATS optimization and role alignment.
 
     Your job is to:
@@ -82,122 +478,512 @@ def generate_cv(resume_text, job_description, target_match, template, sections,
 
     Your goal is to improve this resume to achieve a **{target_match}% ATS match** with the JD.
 
-    Generate the resume in this exact plain text format with these headers (Headers in Bold), make sure name and details are in centre:
+    {output_format}
+    Resume Content:
+    {resume_text}
+
+    Job Description:
+    {compact_job_description(job_description)}
+    """
 
-    NAME
-    Phone No | Email | Address
-    # Make sure NAME and contact details are at the top, centered, and not under any section
+def timed_generate_content(prompt, generation_config, call="cv"):
+    """Make a Gemini call, recording its latency on the active trace
 
-    PROFESSIONAL SUMMARY:
-    
+    With TRACE_LLM_TTFB the call is streamed to completion so the time to its first chunk is recorded too.
+    """
+    started = time.perf_counter()
+    with timed(LLM_REQUEST_SECONDS, LLM_REQUESTS, call=call):
+        if not TRACE_LLM_TTFB:
+            response = model.generate_content(prompt, generation_config=generation_config)
+        else:
+            response = model.generate_content(prompt, generation_config=generation_config, stream=True)
+            for _ in response:
+                ttfb = time.perf_counter() - started
+                LLM_TTFB_SECONDS.observe(ttfb, call=call)
+                record_first("llm_ttfb", ttfb)
+                break
+            response.resolve()
+    record_stage("llm", time.perf_counter() - started)
+    return response
 
-    KEY SKILLS:
-    Skill 1, Skill 2.....
+def stream_generate_text(prompt, temperature=0.2, call="stream"):
+    """Yield a plain text Gemini response chunk by chunk as it streams in"""
+    if not model:
+        raise Exception("Gemini AI client not initialized")
 
-    WORK EXPERIENCE:(keep the dates in the same format as given in resume)
-    Company | Role | Dates
-    • Bullet 1
-    • Bullet 2
+    started = time.perf_counter()
+    first = True
+    with timed(LLM_REQUEST_SECONDS, LLM_REQUESTS, call=call):
+        response = model.generate_content(
+            prompt, generation_config=types.GenerationConfig(temperature=temperature), stream=True
+        )
+        for chunk in response:
+            if first:
+                LLM_TTFB_SECONDS.observe(time.perf_counter() - started, call=call)
+                first = False
+            if chunk.candidates and chunk.candidates[0].content.parts:
+                yield chunk.text
 
-    EDUCATION:
-    • Degree | Institution | Year(keep the dates in the same format as given in resume)
+def generate_structured_cv(prompt):
+    """Generate a CV as schema-constrained JSON and validate it into a StructuredCV"""
+    response = timed_generate_content(
+        prompt,
+        generation_config=types.GenerationConfig(
+            temperature=0.2,
+            response_mime_type="application/json",
+            response_schema=StructuredCV
+        ),
+        call="cv_structured"
+    )
 
-    PROJECTS:(if any)
-    Project Name 1
-    • Bullet 1
-    • Bullet 2
-    
-    Project Name 2
-    • Bullet 1
-    • Bullet 2
+    if not response or not response.candidates:
+        raise Exception("No response received from AI")
+    if response.candidates[0].finish_reason.name == 'MAX_TOKENS':
+        raise Exception("MAX_TOKENS reached before the structured CV was complete")
+    if not response.text:
+        raise Exception("AI response was empty")
 
-    CERTIFICATIONS:(If any)
+    try:
+        return StructuredCV.model_validate_json(response.text)
+    except ValidationError as e:
+        raise Exception(f"Invalid structured CV from Gemini: {e}")
+
+def keyword_pattern(keywords):
+    """One regex matching any keyword as a whole phrase, longest first so phrases win over their words"""
+    alternatives = "|".join(re.escape(kw) for kw in sorted(set(keywords), key=len, reverse=True))
+    return re.compile(r'(?<![\w*])(' + alternatives + r')(?![\w*])', re.IGNORECASE)
+
+def bold_keywords(line, keywords):
+    """Wrap whole-phrase keyword matches in markdown bold, in one pass over the line"""
+    if not keywords:
+        return line
+    pattern = keywords if isinstance(keywords, re.Pattern) else keyword_pattern(keywords)
+    return pattern.sub(r'**\1**', line)
+
+def compact_job_description(job_description):
+    """The JD as it goes into prompts: unchanged unless it is longer than PROMPT_JD_MAX_CHARS"""
+    return compact_text(job_description, PROMPT_JD_MAX_CHARS)
+
+def bold_keywords_in_work_exp(cv_text, keywords):
+    """Bold JD keywords on the company and bullet lines of the work experience section"""
+    if "WORK EXPERIENCE:" not in cv_text:
+        return cv_text
+
+    parts = cv_text.split("WORK EXPERIENCE:")
+    before = parts[0]
+    after = parts[1]
+
+    lines = after.split('\n')
+    pattern = keyword_pattern(keywords) if keywords else None
+    bolded_lines = []
+    for line in lines:
+        if pattern and (line.startswith("•") or "|" in line):
+            line = bold_keywords(line, pattern)
+        bolded_lines.append(line)
+
+    return before + "WORK EXPERIENCE:\n" + '\n'.join(bolded_lines)
+
+def _candidate_text(candidate):
+    """Join the text parts of a response candidate"""
+    text = ""
+    if candidate.content and candidate.content.parts:
+        for part in candidate.content.parts:
+            if hasattr(part, 'text') and part.text:
+                text += part.text
+    return text
+
+def split_at_last_complete_line(partial_text):
+    """Split truncated CV text into (completed text, header of the section it stopped in)
+
+    Only the line that was cut mid-way is dropped, so a long WORK EXPERIENCE section resumes at its last
+    complete role or bullet instead of being regenerated.
+    """
+    last_newline = partial_text.rfind('\n')
+    completed = partial_text[:last_newline].rstrip() if last_newline != -1 else ""
+    headers = list(SECTION_HEADER_PATTERN.finditer(completed))
+    return completed, headers[-1].group(1).strip() + ":" if headers else None
+
+def stitch_continuation(completed_text, continuation, current_header=None):
+    """Append a continuation to the completed text, dropping the lines it repeats from the end of that text
+
+    Only an overlap with the last STITCH_OVERLAP_LINES lines counts as a repeat, so a line that legitimately
+    recurs (a second role with the same title or dates) is kept.
+    """
+    continuation = continuation.strip()
+    if not completed_text:
+        return continuation
+
+    lines = continuation.splitlines()
+    # The model often restates the header of the section it resumes
+    header = SECTION_HEADER_PATTERN.match(lines[0]) if lines else None
+    if current_header and header and header.group(1).strip() + ":" == current_header:
+        lines.pop(0)
+
+    tail = [line.strip() for line in completed_text.splitlines() if line.strip()][-STITCH_OVERLAP_LINES:]
+    leading = [(i, line.strip()) for i, line in enumerate(lines) if line.strip()][:len(tail)]
+    for overlap in range(len(leading), 0, -1):
+        if [line for i, line in leading[:overlap]] == tail[-overlap:]:
+            lines = lines[leading[overlap - 1][0] + 1:]
+            break
+
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    if not lines:
+        return completed_text
+    return f"{completed_text}\n" + "\n".join(lines)
+
+def build_continuation_prompt(prompt, completed_text, current_header):
+    """Build the prompt asking the model to resume a truncated CV
+
+    Only the headers of finished sections and the tail of the current one are resent, so every round costs
+    about the same however much has been written.
+    """
+    done_headers = [match.group(1).strip() for match in SECTION_HEADER_PATTERN.finditer(completed_text)]
+    tail = completed_text[-CONTINUATION_TAIL_CHARS:]
+    section_note = f' You are in the middle of the "{current_header}" section.' if current_header else ""
+    return f"""{prompt}
+
+    IMPORTANT: A previous answer to this request was cut off. Sections already written: {", ".join(done_headers) or "none"}.{section_note}
+    The last lines written are shown below. Do NOT repeat them or any earlier section. Continue the CV in exactly
+    the same plain text format, starting with the next line, and write every remaining section until the CV is complete.
+
+    Last lines written:
+    {tail}
+    """
+
+def generate_with_continuation(prompt, generation_config, max_rounds=MAX_CONTINUATION_ROUNDS):
+    """Generate text, resuming from the last complete line whenever the model hits MAX_TOKENS
+
+    Raises if the text is still cut off after max_rounds follow-up calls, rather than returning a partial CV.
+    """
+    text = ""
+    current_header = None
+    current_prompt = prompt
+
+    for round_number in range(max_rounds + 1):
+        response = timed_generate_content(current_prompt, generation_config=generation_config)
+
+        if not response:
+            raise Exception("No response received from AI")
+        if not response.candidates:
+            raise Exception("No candidates in response")
+
+        candidate = response.candidates[0]
+        chunk = _candidate_text(candidate)
+        truncated = candidate.finish_reason.name == 'MAX_TOKENS'
+        if chunk.strip():
+            text = stitch_continuation(text, chunk, current_header) if round_number else chunk
+        elif round_number and not truncated:
+            raise Exception("The continuation of a truncated CV came back empty; the CV is incomplete")
+
+        if not truncated:
+            if not text:
+                raise Exception("AI response was empty")
+            return text
+
+        if not text:
+            raise Exception("MAX_TOKENS reached and no content available")
+
+        if round_number == max_rounds:
+            break
+
+        # Drop only the line that was cut mid-way and ask the model to carry on from there
+        text, current_header = split_at_last_complete_line(text)
+        current_prompt = build_continuation_prompt(prompt, text, current_header)
+
+    raise Exception(f"The CV was still truncated by MAX_TOKENS after {max_rounds} continuation rounds")
+
+def cached_generate(prompt, response_schema=None, temperature=0.2, use_cache=True):
+    """Generate text for a prompt, reusing the in-process cache for identical requests"""
+    schema_name = response_schema.__name__ if response_schema else ""
+    cache_key = hashlib.sha256(
+        f"{model.model_name}|{temperature}|{schema_name}|{prompt}".encode("utf-8")
+    ).hexdigest()
+
+    with _llm_cache_lock:
+        if use_cache and cache_key in _llm_cache:
+            _llm_cache.move_to_end(cache_key)
+            LLM_CACHE_REQUESTS.inc(result="hit")
+            return _llm_cache[cache_key]
+    LLM_CACHE_REQUESTS.inc(result="miss" if use_cache else "bypass")
+
+    if response_schema:
+        generation_config = types.GenerationConfig(
+            temperature=temperature,
+            response_mime_type="application/json",
+            response_schema=response_schema
+        )
+    else:
+        generation_config = types.GenerationConfig(temperature=temperature)
+
+    response = timed_generate_content(prompt, generation_config=generation_config, call="cv_section")
+    if not response or not response.text:
+        raise Exception("AI response was empty")
+
+    with _llm_cache_lock:
+        _llm_cache[cache_key] = response.text
+        while len(_llm_cache) > LLM_CACHE_SIZE:
+            _llm_cache.popitem(last=False)
+    return response.text
+
+def _generate_model(prompt, response_schema, temperature=0, use_cache=True):
+    """Run a cached schema-constrained sub-request and validate it"""
+    text = cached_generate(prompt, response_schema=response_schema, temperature=temperature, use_cache=use_cache)
+    try:
+        return response_schema.model_validate_json(text)
+    except ValidationError as e:
+        raise Exception(f"Invalid {response_schema.__name__} from Gemini: {e}")
+
+def build_plan_prompt(resume_text, job_description):
+    """Build the planning prompt: JD analysis, resume facts and keyword allocation per section"""
+    return f"""
+    You are a professional resume writer and an expert in ATS optimization.
+
+    Analyze the job description and the resume, then return a plan as JSON:
+    - name and contact: candidate name and "Phone No | Email | Address" exactly as in the resume
+    - job_title: the exact job title from the JD; years_experience: total years of experience from the resume
+    - summary_keywords: the 15 most important ATS keywords from the JD, using exact JD wording
+    - roles: every company in the resume (most recent first) with company, title and dates exactly as in the resume,
+      source_text with that role's original responsibilities, bullet_count so that all roles together have 22 bullets
+      (more for recent roles), and keywords with 2-4 JD keywords allocated to that role. Do not reuse keywords across roles.
+    - education, projects and certifications exactly as in the resume (empty lists if absent)
 
     Resume Content:
     {resume_text}
 
     Job Description:
-    {job_description}
+    {compact_job_description(job_description)}
     """
 
-    
+def build_summary_prompt(plan, target_match):
+    """Build the professional summary sub-request"""
+    experience = "; ".join(f"{role.title} at {role.company} ({role.dates})" for role in plan.roles)
+    return f"""
+    You are a professional resume writer and an expert in ATS optimization.
+    Write a 100-word professional summary starting with “Applying for {plan.job_title}”.
+    Include {plan.years_experience}+ years experience, quantifiable outcomes, global exposure and action verbs.
+    Use these ATS keywords with exact wording, no synonyms: {", ".join(plan.summary_keywords)}.
+    Target a {target_match}% ATS match. Do not use markdown.
+
+    Candidate experience: {experience}
+    """
+
+def build_skills_prompt(job_description):
+    """Build the key skills sub-request"""
+    return f"""
+    You are an expert in ATS optimization.
+    Extract 45 unique ATS-compliant skills from the job description using exact wording. Limit each skill to 1-2 words.
+    Order them as 15 Technical Skills, 15 Soft Skills, 15 Job-Specific Competencies. Do not use markdown.
+
+    Job Description:
+    {compact_job_description(job_description)}
+    """
+
+def build_role_prompt(role, job_title, target_match):
+    """Build the bullets sub-request for a single role"""
+    return f"""
+    You are a professional resume writer and an expert in ATS optimization.
+    Rewrite the responsibilities of this role for a candidate applying for {job_title}, targeting a {target_match}% ATS match.
+    Write exactly {role.bullet_count} bullets. Each bullet must be 10-14 words, use 1-2 of these ATS keywords with exact
+    wording: {", ".join(role.keywords)}, and end with a full stop. At least half must have quantifiable metrics.
+    Do not change the job title and do not use markdown or bullet symbols.
+
+    Role: {role.title} at {role.company} ({role.dates})
+    Original responsibilities:
+    {role.source_text}
+    """
+
+def generate_cv_parallel(resume_text, job_description, target_match):
+    """Generate a StructuredCV with one planning call and parallel per-section sub-requests"""
+    key = generation_key("cv_parallel", resume_text, job_description, target_match)
+    return coalesce(key, lambda: _generate_cv_parallel(resume_text, job_description, target_match))
+
+def _generate_cv_parallel(resume_text, job_description, target_match):
+    """Run a single section-parallel generation (callers go through generate_cv_parallel)"""
     try:
         if not model:
             raise Exception("Gemini AI client not initialized")
-        
-        response = model.generate_content(
-        prompt,  # or contents=prompt
-        generation_config=types.GenerationConfig(
-            temperature=0.2  # optional
-        )
-        )
-        
-        # Handle different response conditions
-        if not response:
-            raise Exception("No response received from AI")
-        
-        if response.candidates and len(response.candidates) > 0:
-            candidate = response.candidates[0]
-            if candidate.finish_reason.name == 'MAX_TOKENS':
-                # Try to get partial content
-                if candidate.content and candidate.content.parts:
-                    partial_text = ""
-                    for part in candidate.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            partial_text += part.text
-                    if partial_text:
-                        optimized_cv = partial_text
-                    else:
-                        raise Exception("MAX_TOKENS reached and no partial content available")
-                else:
-                    raise Exception("MAX_TOKENS reached and no content available")
-            elif not response.text:
-                raise Exception("AI response was empty")
-            else:
-                optimized_cv = response.text
-        else:
-            raise Exception("No candidates in response")
-        
 
-        
-        # Clean up the response
-        optimized_cv = clean_cv_content(optimized_cv)
-        optimized_cv = enforce_page_limit(optimized_cv)
+        with stage("prompt_build"):
+            plan_prompt = build_plan_prompt(resume_text, job_description)
+        plan = _generate_model(plan_prompt, CVPlan)
 
-        from utils import extract_keywords_from_text
+        # Sub-requests run with the caller's trace so their LLM time is recorded too
+        with ThreadPoolExecutor(max_workers=PARALLEL_SECTION_WORKERS) as executor:
+            summary_future = executor.submit(
+                propagate(_generate_model), build_summary_prompt(plan, target_match), CVSummaryResult
+            )
+            skills_future = executor.submit(
+                propagate(_generate_model), build_skills_prompt(job_description), CVSkillsResult
+            )
+            role_futures = [
+                executor.submit(
+                    propagate(_generate_model), build_role_prompt(role, plan.job_title, target_match), CVBulletsResult
+                )
+                for role in plan.roles
+            ]
+
+            roles = [
+                CVRole(company=role.company, title=role.title, dates=role.dates, bullets=future.result().bullets)
+                for role, future in zip(plan.roles, role_futures)
+            ]
+            return StructuredCV(
+                name=plan.name,
+                contact=plan.contact,
+                summary=summary_future.result().summary,
+                skills=skills_future.result().skills,
+                roles=roles,
+                education=plan.education,
+                projects=plan.projects,
+                certifications=plan.certifications
+            )
+
+    except Exception as e:
+        raise Exception(f"Failed to generate CV: {str(e)}")
+
+def _section_body_span(lines, header):
+    """Return the (start, end) line indexes of a section body in CV text lines"""
+    start = None
+    for i, line in enumerate(lines):
+        match = SECTION_HEADER_PATTERN.match(line)
+        if start is None:
+            if match and match.group(1).strip() == header:
+                start = i + 1
+        elif match:
+            return start, i
+    if start is None:
+        raise ValueError(f"Section not found in CV: {header}")
+    return start, len(lines)
+
+def _role_spans(lines, start, end):
+    """Return the (start, end) line indexes of each role inside the work experience body"""
+    role_starts = [
+        i for i in range(start, end)
+        if "|" in lines[i] and not lines[i].lstrip().startswith("•")
+    ]
+    return [
+        (role_start, role_starts[k + 1] if k + 1 < len(role_starts) else end)
+        for k, role_start in enumerate(role_starts)
+    ]
+
+def _replace_lines(lines, indexes, new_lines):
+    """Replace the lines from the first to the last of the given indexes, keeping the rest intact"""
+    if not indexes:
+        raise ValueError("Section has no content to replace")
+    return lines[:indexes[0]] + new_lines + lines[indexes[-1] + 1:]
+
+def list_cv_roles(cv):
+    """List the role header lines ("Company | Role | Dates") of a CV"""
+    if isinstance(cv, StructuredCV):
+        return [f"{role.company} | {role.title} | {role.dates}" for role in cv.roles]
+
+    lines = cv.split('\n')
+    try:
+        start, end = _section_body_span(lines, "WORK EXPERIENCE")
+    except ValueError:
+        # A CV without the section (a graduate CV, or one with the section unticked) has no roles
+        return []
+    return [lines[role_start].replace("**", "").strip() for role_start, _ in _role_spans(lines, start, end)]
+
+def build_section_summary_prompt(role_lines, current_summary, job_description, target_match):
+    """Build the prompt that rewrites only the professional summary"""
+    return f"""
+    You are a professional resume writer and an expert in ATS optimization.
+    Rewrite this professional summary as a new 100-word summary starting with “Applying for [exact job title from the JD]”.
+    Include years of experience, 15+ ATS keywords with exact JD wording, quantifiable outcomes, global exposure and action verbs.
+    Target a {target_match}% ATS match. Do not use markdown.
+
+    Current summary:
+    {current_summary}
+
+    Candidate roles:
+    {chr(10).join(role_lines)}
+
+    Job Description:
+    {compact_job_description(job_description)}
+    """
+
+def regenerate_section(cv, section_name, job_description, resume_text, target_match=90, role_index=None):
+    """Regenerate one CV section (summary, skills or a single role) and return the CV with only it replaced"""
+    from utils import extract_keywords_from_text
+
+    section_name = section_name.upper().rstrip(':').strip()
+    if section_name not in REGENERATABLE_SECTIONS:
+        raise ValueError(f"Section cannot be regenerated: {section_name}")
+    if section_name == "WORK EXPERIENCE" and role_index is None:
+        raise ValueError("role_index is required to regenerate a work experience role")
+
+    try:
+        if not model:
+            raise Exception("Gemini AI client not initialized")
 
         jd_keywords = extract_keywords_from_text(job_description)
+        is_structured = isinstance(cv, StructuredCV)
+        lines = [] if is_structured else cv.split('\n')
 
-        def bold_keywords_in_work_exp(cv_text, keywords):
-            if "WORK EXPERIENCE:" not in cv_text:
-                return cv_text
+        if section_name == "PROFESSIONAL SUMMARY":
+            if is_structured:
+                current_summary = cv.summary
+            else:
+                start, end = _section_body_span(lines, section_name)
+                current_summary = '\n'.join(lines[start:end]).strip()
+            prompt = build_section_summary_prompt(list_cv_roles(cv), current_summary, job_description, target_match)
+            summary = _generate_model(prompt, CVSummaryResult, temperature=0.7, use_cache=False).summary
+            if is_structured:
+                return cv.model_copy(update={"summary": summary})
+            body = [i for i in range(start, end) if lines[i].strip()]
+            return '\n'.join(_replace_lines(lines, body, [summary]))
 
-            parts = cv_text.split("WORK EXPERIENCE:")
-            before = parts[0]
-            after = parts[1]
+        if section_name == "KEY SKILLS":
+            prompt = build_skills_prompt(job_description)
+            skills = _generate_model(prompt, CVSkillsResult, temperature=0.7, use_cache=False).skills
+            if is_structured:
+                return cv.model_copy(update={"skills": skills})
+            start, end = _section_body_span(lines, section_name)
+            body = [i for i in range(start, end) if lines[i].strip()]
+            return '\n'.join(_replace_lines(lines, body, [", ".join(skills)]))
 
-            lines = after.split('\n')
-            bolded_lines = []
-            for line in lines:
-                if line.startswith("•") or "|" in line:
-                    for kw in keywords:
-                        pattern = r'\b(' + re.escape(kw) + r')\b'
-                        line = re.sub(pattern, r'**\1**', line, flags=re.IGNORECASE)
-                bolded_lines.append(line)
+        # A single work experience role: only that role's bullets are sent and replaced
+        if is_structured:
+            role = cv.roles[role_index]
+            company, title, dates, bullets = role.company, role.title, role.dates, role.bullets
+        else:
+            start, end = _section_body_span(lines, section_name)
+            role_start, role_end = _role_spans(lines, start, end)[role_index]
+            company, title, dates = (
+                part.strip() for part in (lines[role_start].replace("**", "").split("|") + ["", ""])[:3]
+            )
+            bullet_indexes = [i for i in range(role_start + 1, role_end) if lines[i].lstrip().startswith("•")]
+            bullets = [lines[i].replace("**", "").lstrip("• ").strip() for i in bullet_indexes]
 
-            return before + "WORK EXPERIENCE:\n" + '\n'.join(bolded_lines)
+        plan_role = CVPlanRole(
+            company=company,
+            title=title,
+            dates=dates,
+            source_text='\n'.join(bullets) or resume_text,
+            bullet_count=max(len(bullets), 2),
+            keywords=jd_keywords
+        )
+        prompt = build_role_prompt(plan_role, title, target_match)
+        new_bullets = _generate_model(prompt, CVBulletsResult, temperature=0.7, use_cache=False).bullets
 
-        optimized_cv = bold_keywords_in_work_exp(optimized_cv, jd_keywords)
+        if is_structured:
+            roles = list(cv.roles)
+            roles[role_index] = role.model_copy(update={"bullets": new_bullets})
+            return cv.model_copy(update={"roles": roles})
+        new_lines = [bold_keywords(f"• {bullet}", jd_keywords) for bullet in new_bullets]
+        if not bullet_indexes:
+            return '\n'.join(lines[:role_start + 1] + new_lines + lines[role_start + 1:])
+        return '\n'.join(_replace_lines(lines, bullet_indexes, new_lines))
 
-        return optimized_cv.strip()
-        
+    except ValueError:
+        raise
     except Exception as e:
-        raise Exception(f"Failed to generate CV: {str(e)}")
+        raise Exception(f"Failed to regenerate {section_name.lower()}: {str(e)}")
 
-def generate_cover_letter(resume_text, job_description):
-    """Generate cover letter using Gemini AI"""
-    
-    prompt = f"""
+def build_cover_letter_prompt(resume_text, job_description):
+    """Build the cover letter prompt"""
+    return f"""
     You are an expert ATS-optimized cover letter writer.
     
     Objective:
@@ -225,22 +1011,27 @@ def generate_cover_letter(resume_text, job_description):
     {resume_text}
     
     Job Description:
-    {job_description}
+    {compact_job_description(job_description)}
     
     Output:
     Generate the final cover letter in **plain text** format without extra commentary.
     """
 
+def generate_cover_letter(resume_text, job_description):
+    """Generate cover letter using Gemini AI"""
+    prompt = build_cover_letter_prompt(resume_text, job_description)
+
     try:
         if not model:
             raise Exception("Gemini AI client not initialized")
         
-        response = model.generate_content(
-        prompt,  # or contents=prompt
-        generation_config=types.GenerationConfig(
-            temperature=0.2  # optional
-        )
-        )
+        with timed(LLM_REQUEST_SECONDS, LLM_REQUESTS, call="cover_letter"):
+            response = model.generate_content(
+            prompt,  # or contents=prompt
+            generation_config=types.GenerationConfig(
+                temperature=0.2  # optional
+            )
+            )
         
         if not response or not response.text:
             raise Exception("AI response was empty or None")
@@ -299,19 +1090,20 @@ def analyze_cv_ats_score(cv_content, job_description):
     {cv_content}
     
     Job Description:
-    {job_description}
+    {compact_job_description(job_description)}
     """
     
     try:
         if not model:
             raise Exception("Gemini AI client not initialized")
         
-        response = model.generate_content(
-            contents=prompt,
-            generation_config=types.GenerationConfig(
-                response_mime_type="application/json"
+        with timed(LLM_REQUEST_SECONDS, LLM_REQUESTS, call="ats"):
+            response = model.generate_content(
+                contents=prompt,
+                generation_config=types.GenerationConfig(
+                    response_mime_type="application/json"
+                )
             )
-        )
 
         if not response or not response.text:
             raise Exception("AI response was empty or None")
@@ -329,13 +1121,8 @@ def analyze_cv_ats_score(cv_content, job_description):
         }
 
     except Exception as e:
-        # Final fallback if AI fails entirely
-        return {
-            "score": 0,
-            "keyword_match": 0,
-            "missing_keywords": [],
-            "suggestions": [f"Error analyzing CV: {str(e)}"]
-        }
+        # Raised rather than returned as a zero score, so callers refund the credit reserved for the analysis
+        raise Exception(f"Failed to analyze ATS score: {str(e)}")
 
 def extract_key_metrics(cv_content):
     """Extract quantifiable metrics from CV"""
@@ -372,9 +1159,9 @@ def enhance_action_verbs(content, intensity="High"):
     # For now, return the content as-is
     return content
 
-def generate_interview_qa(resume_text, job_description):
-    """Generate interview Q&A using Gemini AI"""
-    prompt = f"""
+def build_interview_qa_prompt(resume_text, job_description):
+    """Build the interview Q&A prompt"""
+    return f"""
     You are an expert career coach and interviewer.
 
     TASK:
@@ -409,17 +1196,22 @@ def generate_interview_qa(resume_text, job_description):
     {resume_text}
 
     Job Description:
-    {job_description}
+    {compact_job_description(job_description)}
     """
+
+def generate_interview_qa(resume_text, job_description):
+    """Generate interview Q&A using Gemini AI"""
+    prompt = build_interview_qa_prompt(resume_text, job_description)
     if not model:
         raise Exception("Gemini AI client not initialized")
 
-    response = model.generate_content(
-        prompt,  # or contents=prompt
-        generation_config=types.GenerationConfig(
-            temperature=0.2  # optional
+    with timed(LLM_REQUEST_SECONDS, LLM_REQUESTS, call="interview_qa"):
+        response = model.generate_content(
+            prompt,  # or contents=prompt
+            generation_config=types.GenerationConfig(
+                temperature=0.2  # optional
+            )
         )
-    )
     if not response or not response.text:
         raise Exception("AI response was empty")
 
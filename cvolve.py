@@ -0,0 +1,259 @@
+"""Command line entry point: python -m cvolve <command>"""
+import argparse
+import sys
+from datetime import datetime
+
+def cmd_worker(args):
+    """Run a background job worker"""
+    from jobs import run_worker
+    from metrics import start_metrics_server
+    start_metrics_server(args.metrics_port, args.metrics_host)
+    run_worker(poll_interval=args.poll_interval, once=args.once)
+
+def cmd_migrate_documents(args):
+    """Move cv_generations texts into the compressed documents table"""
+    from database import init_db, migrate_cv_generation_documents
+    init_db()
+    report = migrate_cv_generation_documents(batch_size=args.batch_size)
+    print(f"Migrated {report['rows']} generations ({report['texts']} texts) into {report['documents_written']} new documents")
+    print(f"Raw text: {report['raw_bytes']:,} bytes, stored: {report['stored_bytes']:,} bytes, saved: {report['bytes_saved']:,} bytes")
+    print("Run VACUUM FULL cv_generations to return the freed space to the operating system")
+
+def cmd_rollups(args):
+    """Rebuild the per-user daily stats rollups"""
+    from database import init_db, rebuild_user_daily_stats
+    init_db()
+    print(f"Rebuilt {rebuild_user_daily_stats()} daily stats rows")
+
+def cmd_release_reservations(args):
+    """Refund credit reservations left pending by crashed processes"""
+    import os
+    from database import init_db, release_stale_reservations, STALE_RESERVATION_MINUTES
+    from jobs import JOB_QUEUE_PATH, active_reservation_ids
+    init_db()
+    older_than = args.older_than if args.older_than is not None else STALE_RESERVATION_MINUTES
+    # Reservations of queued or running jobs are still in use, however old
+    keep_ids = active_reservation_ids() if os.path.exists(JOB_QUEUE_PATH) else []
+    print(f"Refunded stale reservations of {release_stale_reservations(older_than, keep_ids)} users")
+
+def cmd_mock_llm(args):
+    """Serve the mock Gemini API"""
+    from mock_llm import MockLLMConfig, serve
+    config = MockLLMConfig(
+        latency_median=args.latency, latency_sigma=args.latency_sigma, ttfb_fraction=args.ttfb_fraction,
+        rate_429=args.rate_429, rate_503=args.rate_503, rate_max_tokens=args.rate_max_tokens, seed=args.seed
+    )
+    serve(host=args.host, port=args.port, config=config)
+
+def cmd_loadtest(args):
+    """Drive the generation flows concurrently and print throughput and tail latency"""
+    import asyncio
+    from loadtest import run_load, parse_mix, format_report, DEFAULT_MIX, SAMPLE_RESUME
+
+    resume_text = SAMPLE_RESUME
+    if args.resume:
+        from cv_generator import extract_resume_text
+        with open(args.resume, "rb") as f:
+            resume_text = extract_resume_text(f)
+
+    results, elapsed = asyncio.run(run_load(
+        requests=args.requests,
+        concurrency=args.concurrency,
+        mix=parse_mix(args.mix) if args.mix else DEFAULT_MIX,
+        resume_text=resume_text,
+        generation_mode=args.generation_mode,
+        record_user=args.record_user
+    ))
+    print(format_report(results, elapsed))
+
+def cmd_api(args):
+    """Serve the headless HTTP API"""
+    import uvicorn
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+def cmd_batch(args):
+    """Generate CVs for every resume/JD pair and write a summary CSV"""
+    from batch import run_batch
+    counts = run_batch(
+        args.resumes, args.jd, args.out, template=args.template, target_match=args.target_match,
+        generation_mode=args.generation_mode, llm_concurrency=args.llm_concurrency,
+        render_workers=args.render_workers, retries=args.retries, record_user=args.record_user
+    )
+    unrecorded = f", {counts['rendered']} rendered but not yet recorded" if counts["rendered"] else ""
+    print(f"{counts['ok']} of {counts['planned']} CVs done, {counts['failed']} failed{unrecorded}. Summary: {counts['summary']}")
+    return 1 if counts["failed"] or counts["rendered"] else 0
+
+def cmd_fetch_jd(args):
+    """Fetch job descriptions from posting URLs into text files"""
+    import os
+    import re
+    from jd_fetcher import fetch_job_descriptions, parse_urls
+
+    urls = list(args.urls)
+    if args.url_file:
+        with open(args.url_file) as f:
+            urls += parse_urls(f.read())
+    os.makedirs(args.out, exist_ok=True)
+
+    failed = 0
+    for number, result in enumerate(fetch_job_descriptions(urls), 1):
+        if not result.ok:
+            failed += 1
+            print(f"Failed: {result.url}: {result.error}")
+            continue
+        name = re.sub(r"[^A-Za-z0-9]+", "_", result.title or "job").strip("_")[:60] or "job"
+        path = os.path.join(args.out, f"{number:03d}_{name}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(result.text)
+        print(f"Saved {result.url} -> {path}")
+    return 1 if failed else 0
+
+def cmd_compile_taxonomy(args):
+    """Compile the skills taxonomy source into its binary form"""
+    from taxonomy import compile_taxonomy, save_taxonomy, TAXONOMY_SOURCE, TAXONOMY_BINARY
+    out = args.out or TAXONOMY_BINARY
+    taxonomy = compile_taxonomy(args.source or TAXONOMY_SOURCE)
+    size = save_taxonomy(taxonomy, out)
+    print(f"Compiled {len(taxonomy.domains)} domains, {len(taxonomy.skills)} skills and {len(taxonomy.index)} terms "
+          f"into {out} ({size:,} bytes)")
+
+def cmd_build_idf(args):
+    """Build keyword document frequencies from the stored job descriptions"""
+    import os
+    import time
+    from database import init_db, iter_job_descriptions
+    from keywords import build_background_file, KEYWORD_IDF_FILE
+
+    init_db()
+    out = args.out or KEYWORD_IDF_FILE
+    # Built next to the destination first, so a too-small corpus never replaces a good file
+    temp_out = f"{out}.building"
+    started = time.perf_counter()
+    report = build_background_file(iter_job_descriptions(args.chunk_size), temp_out, args.min_document_frequency)
+    if report["documents"] < args.min_documents:
+        os.remove(temp_out)
+        print(f"Only {report['documents']} job descriptions stored (need {args.min_documents}); {out} not written")
+        return 1
+    os.replace(temp_out, out)
+    print(f"Indexed {report['documents']} job descriptions, {report['terms']} terms into {out} "
+          f"({report['bytes']:,} bytes) in {time.perf_counter() - started:.1f}s")
+
+def cmd_export(args):
+    """Export generation history or payments for admins"""
+    import os
+    import time
+    from database import init_db
+    from exports import export_table
+
+    init_db()
+    export_format = args.format or os.path.splitext(args.out)[1].lstrip(".").lower() or "csv"
+    columns = [column.strip() for column in args.columns.split(",") if column.strip()] if args.columns else None
+    started = time.perf_counter()
+    rows = export_table(args.table, args.out, export_format, columns, args.since, args.until, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    print(f"Exported {rows} {args.table} rows to {args.out} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+def build_parser():
+    """Build the CLI argument parser"""
+    parser = argparse.ArgumentParser(prog="cvolve", description="CVOLVE PRO command line tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    worker = subparsers.add_parser("worker", help="Process queued CV, cover letter, Q&A and ATS jobs")
+    worker.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between queue polls when idle")
+    worker.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    worker.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port (default: METRICS_PORT)")
+    worker.add_argument("--metrics-host", help="Interface for the metrics endpoint (default: METRICS_HOST, 127.0.0.1)")
+    worker.set_defaults(func=cmd_worker)
+
+    migrate_documents = subparsers.add_parser("migrate-documents", help="Deduplicate and compress stored CV generation texts")
+    migrate_documents.add_argument("--batch-size", type=int, default=500, help="Generations migrated per transaction")
+    migrate_documents.set_defaults(func=cmd_migrate_documents)
+
+    rollups = subparsers.add_parser("rollups", help="Rebuild per-user daily analytics rollups from the raw tables")
+    rollups.set_defaults(func=cmd_rollups)
+
+    release_reservations = subparsers.add_parser(
+        "release-reservations",
+        help="Refund credits reserved by crashed processes (the worker does this every minute; "
+             "without a worker, run it from cron every few minutes)"
+    )
+    release_reservations.add_argument("--older-than", type=int, default=None,
+                                      help="Minutes a reservation must have been pending (default: STALE_RESERVATION_MINUTES)")
+    release_reservations.set_defaults(func=cmd_release_reservations)
+
+    mock_llm = subparsers.add_parser("mock-llm", help="Serve a local mock of the Gemini API for load testing")
+    mock_llm.add_argument("--host", default="127.0.0.1")
+    mock_llm.add_argument("--port", type=int, default=8090)
+    mock_llm.add_argument("--latency", type=float, default=2.0, help="Median response time in seconds")
+    mock_llm.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of the response time")
+    mock_llm.add_argument("--ttfb-fraction", type=float, default=0.2, help="Share of the response time before the first streamed chunk")
+    mock_llm.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests rejected with 429")
+    mock_llm.add_argument("--rate-503", type=float, default=0.0, help="Fraction of requests rejected with 503")
+    mock_llm.add_argument("--rate-max-tokens", type=float, default=0.0, help="Fraction of responses truncated with MAX_TOKENS")
+    mock_llm.add_argument("--seed", type=int, help="Random seed for reproducible latency and errors")
+    mock_llm.set_defaults(func=cmd_mock_llm)
+
+    loadtest = subparsers.add_parser("loadtest", help="Load test the generation flows (set GEMINI_API_ENDPOINT to the mock)")
+    loadtest.add_argument("--requests", type=int, default=100, help="Total requests to send")
+    loadtest.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once")
+    loadtest.add_argument("--mix", help="Flow weights, e.g. cv=4,cover_letter=2,interview_qa=1,ats=2")
+    loadtest.add_argument("--generation-mode", choices=["standard", "structured", "parallel"], default="standard")
+    loadtest.add_argument("--resume", help="PDF or DOCX resume to use instead of the built-in sample")
+    loadtest.add_argument("--record-user", help="Save generated CVs to the database under this user's email")
+    loadtest.set_defaults(func=cmd_loadtest)
+
+    api = subparsers.add_parser("api", help="Serve the HTTP API (keys and their users are set in CVOLVE_API_KEYS)")
+    api.add_argument("--host", default="127.0.0.1")
+    api.add_argument("--port", type=int, default=8000)
+    api.add_argument("--workers", type=int, default=1, help="Worker processes (each has its own caches and pools)")
+    api.set_defaults(func=cmd_api)
+
+    batch = subparsers.add_parser("batch", help="Generate tailored CVs for a directory of resumes and/or job descriptions")
+    batch.add_argument("--resumes", required=True, help="PDF/DOCX resume, or a directory of them")
+    batch.add_argument("--jd", required=True, help="Job description file (.txt, .md, .pdf, .docx), or a directory of them")
+    batch.add_argument("--out", required=True, help="Output directory; rerunning with the same one resumes the batch")
+    batch.add_argument("--template", choices=["professional", "modern", "creative", "technical", "executive"], default="professional")
+    batch.add_argument("--target-match", type=int, default=90, help="Target ATS match percentage")
+    batch.add_argument("--generation-mode", choices=["standard", "structured", "parallel"], default="standard")
+    batch.add_argument("--llm-concurrency", type=int, default=4, help="CV generations in flight at once")
+    batch.add_argument("--render-workers", type=int, help="Extraction and render processes (default: CPU count)")
+    batch.add_argument("--retries", type=int, default=2, help="Retries of a failed generation before giving up on a pair")
+    batch.add_argument("--record-user", help="Save generated CVs to the database under this user's email")
+    batch.set_defaults(func=cmd_batch)
+
+    fetch_jd = subparsers.add_parser("fetch-jd", help="Fetch job descriptions from posting URLs (output usable as batch --jd)")
+    fetch_jd.add_argument("urls", nargs="*", help="Job posting URLs")
+    fetch_jd.add_argument("--url-file", help="File with one URL per line")
+    fetch_jd.add_argument("--out", default="job_descriptions", help="Directory the .txt files are written to")
+    fetch_jd.set_defaults(func=cmd_fetch_jd)
+
+    compile_taxonomy = subparsers.add_parser("compile-taxonomy", help="Compile the skills taxonomy for fast loading")
+    compile_taxonomy.add_argument("--source", default=None, help="Taxonomy source file (default: TAXONOMY_SOURCE)")
+    compile_taxonomy.add_argument("--out", default=None, help="Binary output path (default: TAXONOMY_BINARY)")
+    compile_taxonomy.set_defaults(func=cmd_compile_taxonomy)
+
+    build_idf = subparsers.add_parser("build-idf", help="Build keyword IDF statistics from stored job descriptions")
+    build_idf.add_argument("--chunk-size", type=int, default=1000, help="Rows fetched from the server per round trip")
+    build_idf.add_argument("--min-documents", type=int, default=100, help="Refuse to write from fewer job descriptions")
+    build_idf.add_argument("--min-document-frequency", type=int, default=2, help="Leave out terms in fewer documents")
+    build_idf.add_argument("--out", default=None, help="Output path (default: KEYWORD_IDF_FILE)")
+    build_idf.set_defaults(func=cmd_build_idf)
+
+    export = subparsers.add_parser("export", help="Export generation history or payments to CSV, JSONL or Parquet")
+    export.add_argument("table", choices=["cv_generations", "payments"])
+    export.add_argument("--out", required=True, help="Output file")
+    export.add_argument("--format", choices=["csv", "jsonl", "parquet"], help="Output format (default: from --out's extension)")
+    export.add_argument("--columns", help="Comma-separated columns to export (default: all)")
+    export.add_argument("--since", type=datetime.fromisoformat, help="Only rows created at or after this date/time")
+    export.add_argument("--until", type=datetime.fromisoformat, help="Only rows created before this date/time")
+    export.add_argument("--chunk-size", type=int, default=1000, help="Rows fetched from the server per round trip")
+    export.set_defaults(func=cmd_export)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,75 @@
 import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extras import RealDictCursor, execute_values
 import json
 from datetime import datetime, timedelta
 import hashlib
 import secrets
+import time
+import zlib
 from urllib.parse import urlparse
+from metrics import timed, DB_CONNECTIONS, DB_CONNECT_SECONDS, DB_POOL_CHECKOUTS, DB_POOL_HOLD_SECONDS
 
-def get_db_connection():
+try:
+    import zstandard
+except ImportError:  # Optional: documents fall back to zlib
+    zstandard = None
+
+# Connections kept open by the shared pool (per process)
+DB_POOL_MIN_CONNECTIONS = int(os.getenv("DB_POOL_MIN_CONNECTIONS", "1"))
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "20"))
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+# Text columns of cv_generations stored as content-addressed documents
+DOCUMENT_COLUMNS = ("job_description", "original_resume", "generated_cv")
+
+# Columns admin exports can select, per table (cv_generations texts are read back from their documents)
+EXPORT_COLUMNS = {
+    "cv_generations": (
+        "id", "user_email", "template_used", "ats_score", "target_match", "processing_time", "stage_timings",
+        "created_at", "job_description", "original_resume", "generated_cv"
+    ),
+    "payments": ("id", "user_email", "amount", "type", "status", "stripe_payment_id", "credits_purchased", "created_at"),
+}
+
+# Decoded documents an export keeps for reuse by later rows
+EXPORT_DOCUMENT_CACHE_SIZE = 256
+
+# Records written per transaction by the bulk writers
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "500"))
+
+# Pending credit reservations older than this are assumed abandoned by a crashed process and refunded
+STALE_RESERVATION_MINUTES = int(os.getenv("STALE_RESERVATION_MINUTES", "30"))
+
+# Seconds between the app's passes refunding stale reservations (the job worker does this when the queue is on)
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "300"))
+
+_reservation_sweeper = None
+_reservation_sweeper_stop = threading.Event()
+_reservation_sweeper_lock = threading.Lock()
+
+# Session fields longer than this are stored zlib-compressed in session_blob instead of the JSONB column
+SESSION_BLOB_THRESHOLD = 1024
+
+# Minimum seconds between auto-save writes for the same user
+AUTO_SAVE_MIN_INTERVAL = float(os.getenv("AUTO_SAVE_MIN_INTERVAL", "10"))
+
+# Last saved hash and write time per user, shared by every session in this process
+_auto_save_state = {}
+# Latest snapshot held back by the debounce window per user, as (session_data, session_hash, flush timer)
+_auto_save_pending = {}
+_auto_save_lock = threading.Lock()
+
+def get_connection_params():
+    """Connection parameters parsed from DATABASE_URL"""
     url = urlparse(os.environ.get("DATABASE_URL"))
-    return psycopg2.connect(
+    return dict(
         database=url.path[1:],
         user=url.username,
         password=url.password,
@@ -17,6 +77,40 @@ def get_db_connection():
         port=url.port
     )
 
+def get_db_connection():
+    DB_CONNECTIONS.inc()
+    with timed(DB_CONNECT_SECONDS):
+        return psycopg2.connect(**get_connection_params())
+
+def get_db_pool():
+    """Process-wide thread-safe connection pool"""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = ThreadedConnectionPool(
+                DB_POOL_MIN_CONNECTIONS, DB_POOL_MAX_CONNECTIONS, **get_connection_params()
+            )
+        return _db_pool
+
+@contextmanager
+def pooled_connection():
+    """Borrow a pooled connection for one unit of work, committing on success and rolling back on error"""
+    pool = get_db_pool()
+    conn = pool.getconn()
+    checked_out = time.perf_counter()
+    try:
+        yield conn
+        conn.commit()
+        DB_POOL_CHECKOUTS.inc(outcome="commit")
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        DB_POOL_CHECKOUTS.inc(outcome="rollback")
+        raise
+    finally:
+        DB_POOL_HOLD_SECONDS.observe(time.perf_counter() - checked_out)
+        pool.putconn(conn, close=bool(conn.closed))
+
 def init_db():
     """Initialize database tables"""
     conn = get_db_connection()
@@ -67,6 +161,47 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+
+    # Documents table (compressed text bodies keyed by the SHA-256 of the text)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS documents (
+            hash CHAR(64) PRIMARY KEY,
+            codec VARCHAR(10) NOT NULL,
+            body BYTEA NOT NULL,
+            raw_size INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # New generations reference documents; the TEXT columns only hold rows not yet migrated
+    cursor.execute("""
+        ALTER TABLE cv_generations
+        ADD COLUMN IF NOT EXISTS job_description_hash CHAR(64) REFERENCES documents(hash),
+        ADD COLUMN IF NOT EXISTS original_resume_hash CHAR(64) REFERENCES documents(hash),
+        ADD COLUMN IF NOT EXISTS generated_cv_hash CHAR(64) REFERENCES documents(hash)
+    """)
+
+    # Per-stage durations in seconds (see tracing.STAGES)
+    cursor.execute("""
+        ALTER TABLE cv_generations ADD COLUMN IF NOT EXISTS stage_timings JSONB
+    """)
+    
+    # Per-user daily rollups (sums and counts so they can be maintained incrementally)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_daily_stats (
+            user_email VARCHAR(255) REFERENCES users(email),
+            day DATE NOT NULL,
+            cv_count INTEGER NOT NULL DEFAULT 0,
+            ats_count INTEGER NOT NULL DEFAULT 0,
+            ats_sum BIGINT NOT NULL DEFAULT 0,
+            ats_min INTEGER,
+            ats_max INTEGER,
+            processing_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            credits_used INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_email, day)
+        )
+    """)
     
     # User sessions table
     cursor.execute("""
@@ -78,6 +213,25 @@ def init_db():
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+
+    cursor.execute("""
+        ALTER TABLE user_sessions
+        ADD COLUMN IF NOT EXISTS session_hash VARCHAR(64),
+        ADD COLUMN IF NOT EXISTS session_blob BYTEA
+    """)
+
+    # save_user_session upserts on user_email, which needs a unique index; keep each user's latest row first
+    cursor.execute("""
+        SELECT to_regclass('user_sessions_user_email_key')
+    """)
+    if cursor.fetchone()[0] is None:
+        cursor.execute("""
+            DELETE FROM user_sessions older USING user_sessions newer
+            WHERE older.user_email = newer.user_email AND older.id < newer.id
+        """)
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS user_sessions_user_email_key ON user_sessions (user_email)
+        """)
     
     # Payments table
     cursor.execute("""
@@ -93,6 +247,24 @@ def init_db():
         )
     """)
     
+    # Credit reservations table (credits held while a generation runs)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS credit_reservations (
+            id SERIAL PRIMARY KEY,
+            user_email VARCHAR(255) REFERENCES users(email),
+            amount INTEGER NOT NULL,
+            action VARCHAR(50),
+            status VARCHAR(20) DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            resolved_at TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS credit_reservations_pending_idx
+        ON credit_reservations (created_at) WHERE status = 'pending'
+    """)
+    
     # Discount codes table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS discount_codes (
@@ -110,14 +282,17 @@ def init_db():
     cursor.close()
     conn.close()
 
+# Statements used by both this module and async_database.py are module constants, so the two can't drift
+USER_DATA_SQL = """
+    SELECT * FROM users WHERE email = %s
+"""
+
 def get_user_data(email):
     """Get user data by email"""
     conn = get_db_connection()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
-    cursor.execute("""
-        SELECT * FROM users WHERE email = %s
-    """, (email,))
+    cursor.execute(USER_DATA_SQL, (email,))
     
     user = cursor.fetchone()
     cursor.close()
@@ -145,27 +320,31 @@ def create_user(email, name, auth_provider, password_hash=None):
     
     return user
 
+UPDATE_USER_CREDITS_SQL = """
+    UPDATE users SET credits = credits + %s WHERE email = %s
+"""
+
 def update_user_credits(email, credits):
     """Update user credits"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute("""
-        UPDATE users SET credits = credits + %s WHERE email = %s
-    """, (credits, email))
+    cursor.execute(UPDATE_USER_CREDITS_SQL, (credits, email))
     
     conn.commit()
     cursor.close()
     conn.close()
 
+USER_CREDITS_SQL = """
+    SELECT credits FROM users WHERE email = %s
+"""
+
 def get_user_credits(email):
     """Get user's current credits"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT credits FROM users WHERE email = %s
-    """, (email,))
+    cursor.execute(USER_CREDITS_SQL, (email,))
     
     result = cursor.fetchone()
     cursor.close()
@@ -173,46 +352,757 @@ def get_user_credits(email):
     
     return result[0] if result else 0
 
-def save_cv_generation(user_email, job_description, original_resume, generated_cv, template_used, ats_score, target_match, processing_time):
-    """Save CV generation record"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO cv_generations (user_email, job_description, original_resume, generated_cv, template_used, ats_score, target_match, processing_time)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-    """, (user_email, job_description, original_resume, generated_cv, template_used, ats_score, target_match, processing_time))
-    
-    # Update user stats
-    cursor.execute("""
-        UPDATE users SET 
+# The user row plus today's usage and credits held by pending reservations, in one round trip
+USER_SNAPSHOT_SQL = """
+    SELECT u.*,
+    COALESCE(d.cv_count, 0) AS cvs_today,
+    COALESCE(d.credits_used, 0) AS credits_used_today,
+    (SELECT COALESCE(SUM(r.amount), 0) FROM credit_reservations r
+     WHERE r.user_email = u.email AND r.status = 'pending') AS credits_reserved
+    FROM users u
+    LEFT JOIN user_daily_stats d ON d.user_email = u.email AND d.day = CURRENT_DATE
+    WHERE u.email = %s
+"""
+
+def get_user_snapshot(email):
+    """User data with today's generation count, credits used today and credits reserved; None if no such user"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        cursor.execute(USER_SNAPSHOT_SQL, (email,))
+
+        user = cursor.fetchone()
+        cursor.close()
+
+    return dict(user) if user else None
+
+RESERVE_CREDIT_SQL = """
+    WITH debit AS (
+        UPDATE users SET credits = credits - %(amount)s
+        WHERE email = %(email)s AND credits >= %(amount)s
+        RETURNING email
+    )
+    INSERT INTO credit_reservations (user_email, amount, action)
+    SELECT email, %(amount)s, %(action)s FROM debit
+    RETURNING id
+"""
+
+def reserve_credit(email, amount=1, action=None):
+    """Atomically deduct credits if the user has enough; return the reservation ID or None"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(RESERVE_CREDIT_SQL, {'email': email, 'amount': amount, 'action': action})
+
+        result = cursor.fetchone()
+        cursor.close()
+
+    return result[0] if result else None
+
+COMMIT_RESERVATION_SQL = """
+    WITH committed AS (
+        UPDATE credit_reservations SET status = 'committed', resolved_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND status = 'pending'
+        RETURNING user_email, amount
+    )
+    INSERT INTO user_daily_stats (user_email, day, credits_used)
+    SELECT user_email, CURRENT_DATE, amount FROM committed
+    ON CONFLICT (user_email, day) DO UPDATE SET
+    credits_used = user_daily_stats.credits_used + EXCLUDED.credits_used
+"""
+
+def commit_reservation(reservation_id):
+    """Keep the credits of a reservation after a successful generation"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        # Counts the credits towards today's rollup in the same statement
+        cursor.execute(COMMIT_RESERVATION_SQL, (reservation_id,))
+
+        committed = cursor.rowcount == 1
+        cursor.close()
+
+    return committed
+
+RELEASE_RESERVATION_SQL = """
+    WITH released AS (
+        UPDATE credit_reservations SET status = 'released', resolved_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND status = 'pending'
+        RETURNING user_email, amount
+    )
+    UPDATE users SET credits = credits + released.amount
+    FROM released
+    WHERE users.email = released.user_email
+"""
+
+def release_reservation(reservation_id):
+    """Return the credits of a reservation to the user after a failed generation"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(RELEASE_RESERVATION_SQL, (reservation_id,))
+
+        released = cursor.rowcount == 1
+        cursor.close()
+
+    return released
+
+def release_stale_reservations(older_than_minutes=STALE_RESERVATION_MINUTES, keep_ids=()):
+    """Refund reservations left pending by a process that died mid-generation; return the number of users refunded
+
+    keep_ids are reservations still owned by queued or running jobs, which are left pending however old.
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            WITH released AS (
+                UPDATE credit_reservations SET status = 'released', resolved_at = CURRENT_TIMESTAMP
+                WHERE status = 'pending' AND created_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 minute'
+                AND NOT (id = ANY(%s))
+                RETURNING user_email, amount
+            ), totals AS (
+                SELECT user_email, SUM(amount) AS amount FROM released GROUP BY user_email
+            )
+            UPDATE users SET credits = credits + totals.amount
+            FROM totals
+            WHERE users.email = totals.user_email
+        """, (older_than_minutes, list(keep_ids)))
+
+        released_users = cursor.rowcount
+        cursor.close()
+
+    return released_users
+
+def _sweep_reservations(interval):
+    while not _reservation_sweeper_stop.wait(interval):
+        try:
+            refunded = release_stale_reservations()
+            if refunded:
+                print(f"Refunded stale credit reservations of {refunded} users")
+        except Exception as e:
+            print(f"Could not release stale reservations: {str(e)}")
+
+def start_reservation_sweeper(interval=RESERVATION_SWEEP_INTERVAL):
+    """Refund stale reservations every interval seconds from a daemon thread, started once per process"""
+    global _reservation_sweeper
+    with _reservation_sweeper_lock:
+        if _reservation_sweeper is None or not _reservation_sweeper.is_alive():
+            _reservation_sweeper_stop.clear()
+            _reservation_sweeper = threading.Thread(
+                target=_sweep_reservations, args=(interval,), name="reservation-sweeper", daemon=True
+            )
+            _reservation_sweeper.start()
+        return _reservation_sweeper
+
+def stop_reservation_sweeper():
+    """Stop the sweeper thread (tests, or a process shutting down its database access)"""
+    global _reservation_sweeper
+    with _reservation_sweeper_lock:
+        _reservation_sweeper_stop.set()
+        if _reservation_sweeper is not None:
+            _reservation_sweeper.join()
+            _reservation_sweeper = None
+
+def document_hash(text):
+    """Content address of a text body"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest() if text is not None else None
+
+def compress_document(text):
+    """Hash and compress a text body; return (hash, codec, body, raw_size)"""
+    raw = text.encode("utf-8")
+    document_hash = hashlib.sha256(raw).hexdigest()
+    if zstandard is not None:
+        return document_hash, "zstd", zstandard.ZstdCompressor(level=10).compress(raw), len(raw)
+    return document_hash, "zlib", zlib.compress(raw, 9), len(raw)
+
+def decompress_document(codec, body):
+    """Decode a stored document body back to text"""
+    body = bytes(body)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed documents")
+        return zstandard.ZstdDecompressor().decompress(body).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(body).decode("utf-8")
+    raise ValueError(f"Unknown document codec: {codec}")
+
+def document_rows(texts):
+    """Unique documents rows for the non-empty texts, in the documents column order"""
+    rows = {}
+    for text in texts:
+        if text is None:
+            continue
+        document_hash, codec, body, raw_size = compress_document(text)
+        rows[document_hash] = (document_hash, codec, body, raw_size, len(body))
+    return list(rows.values())
+
+def cv_generation_statement(user_email, job_description, original_resume, generated_cv, template_used, ats_score, target_match, processing_time, stage_timings=None):
+    """(SQL, params) saving a CV generation with its documents and rollups in one statement, shared by the sync and async paths"""
+    texts = (job_description, original_resume, generated_cv)
+    hashes = [document_hash(text) for text in texts]
+    documents = document_rows(texts)
+
+    params = {
+        'user_email': user_email,
+        'job_description_hash': hashes[0],
+        'original_resume_hash': hashes[1],
+        'generated_cv_hash': hashes[2],
+        'template_used': template_used,
+        'ats_score': ats_score,
+        'target_match': target_match,
+        'processing_time': processing_time,
+        'stage_timings': json.dumps(stage_timings) if stage_timings is not None else None
+    }
+    document_values = ", ".join(
+        f"(%(doc{i}_hash)s, %(doc{i}_codec)s, %(doc{i}_body)s, %(doc{i}_raw_size)s, %(doc{i}_stored_size)s)"
+        for i in range(len(documents))
+    )
+    for i, row in enumerate(documents):
+        params.update(zip((f"doc{i}_hash", f"doc{i}_codec", f"doc{i}_body", f"doc{i}_raw_size", f"doc{i}_stored_size"), row))
+    document_cte = f"""
+        stored_documents AS (
+            INSERT INTO documents (hash, codec, body, raw_size, stored_size)
+            VALUES {document_values}
+            ON CONFLICT (hash) DO NOTHING
+        ),""" if documents else ""
+
+    # The new generation isn't visible to the AVG subquery inside the same statement, so it is added explicitly
+    return f"""
+        WITH{document_cte}
+        generation AS (
+            INSERT INTO cv_generations (user_email, job_description_hash, original_resume_hash, generated_cv_hash,
+                                        template_used, ats_score, target_match, processing_time, stage_timings)
+            VALUES (%(user_email)s, %(job_description_hash)s, %(original_resume_hash)s, %(generated_cv_hash)s,
+                    %(template_used)s, %(ats_score)s, %(target_match)s, %(processing_time)s, %(stage_timings)s::JSONB)
+            RETURNING id
+        ),
+        daily AS (
+            INSERT INTO user_daily_stats (user_email, day, cv_count, ats_count, ats_sum, ats_min, ats_max, processing_time_sum)
+            VALUES (%(user_email)s, CURRENT_DATE, 1, CASE WHEN %(ats_score)s::INTEGER IS NULL THEN 0 ELSE 1 END,
+                    COALESCE(%(ats_score)s::INTEGER, 0), %(ats_score)s::INTEGER, %(ats_score)s::INTEGER,
+                    COALESCE(%(processing_time)s::DOUBLE PRECISION, 0))
+            ON CONFLICT (user_email, day) DO UPDATE SET
+            cv_count = user_daily_stats.cv_count + 1,
+            ats_count = user_daily_stats.ats_count + EXCLUDED.ats_count,
+            ats_sum = user_daily_stats.ats_sum + EXCLUDED.ats_sum,
+            ats_min = LEAST(user_daily_stats.ats_min, EXCLUDED.ats_min),
+            ats_max = GREATEST(user_daily_stats.ats_max, EXCLUDED.ats_max),
+            processing_time_sum = user_daily_stats.processing_time_sum + EXCLUDED.processing_time_sum
+        )
+        UPDATE users SET
         total_cvs_generated = total_cvs_generated + 1,
         avg_ats_score = (
-            SELECT AVG(ats_score) FROM cv_generations WHERE user_email = %s
+            SELECT AVG(score) FROM (
+                SELECT ats_score AS score FROM cv_generations WHERE user_email = %(user_email)s
+                UNION ALL SELECT %(ats_score)s::INTEGER
+            ) scores
         )
-        WHERE email = %s
-    """, (user_email, user_email))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+        WHERE email = %(user_email)s
+        RETURNING (SELECT id FROM generation)
+    """, params
+
+def save_cv_generation(user_email, job_description, original_resume, generated_cv, template_used, ats_score, target_match, processing_time, stage_timings=None):
+    """Save CV generation record, storing its texts as deduplicated documents and updating the daily rollup, in a single statement"""
+    sql, params = cv_generation_statement(user_email, job_description, original_resume, generated_cv, template_used,
+                                          ats_score, target_match, processing_time, stage_timings)
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(sql, params)
+
+        result = cursor.fetchone()
+        cursor.close()
+
+    return result[0] if result else None
+
+def _chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def save_cv_generations(records, chunk_size=BULK_INSERT_CHUNK_SIZE):
+    """Save many CV generation records (dicts of save_cv_generation's arguments, plus an optional created_at)
+
+    Each chunk is one transaction: its documents and generations are inserted with multi-row statements,
+    and the daily rollups and user totals are updated once per user rather than once per row.
+    Returns the counts and rows per second for the report.
+    """
+    report = {'rows': 0, 'documents_written': 0, 'users_updated': 0}
+    started = time.perf_counter()
+
+    for chunk in _chunks(records, chunk_size):
+        documents = document_rows(record.get(column) for record in chunk for column in DOCUMENT_COLUMNS)
+        generations = [(
+            record['user_email'], *(document_hash(record.get(column)) for column in DOCUMENT_COLUMNS),
+            record.get('template_used'), record.get('ats_score'), record.get('target_match'),
+            record.get('processing_time'),
+            json.dumps(record['stage_timings']) if record.get('stage_timings') is not None else None,
+            record.get('created_at')
+        ) for record in chunk]
+
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            written = execute_values(cursor, """
+                INSERT INTO documents (hash, codec, body, raw_size, stored_size) VALUES %s
+                ON CONFLICT (hash) DO NOTHING
+                RETURNING hash
+            """, documents, page_size=len(documents), fetch=True) if documents else []
+
+            ids = execute_values(cursor, """
+                INSERT INTO cv_generations (user_email, job_description_hash, original_resume_hash, generated_cv_hash,
+                                            template_used, ats_score, target_match, processing_time, stage_timings,
+                                            created_at)
+                VALUES %s
+                RETURNING id
+            """, generations, template="(%s, %s, %s, %s, %s, %s, %s, %s, %s::JSONB, COALESCE(%s::TIMESTAMP, CURRENT_TIMESTAMP))",
+                page_size=len(generations), fetch=True)
+            ids = [generation_id for (generation_id,) in ids]
+
+            cursor.execute("""
+                INSERT INTO user_daily_stats (user_email, day, cv_count, ats_count, ats_sum, ats_min, ats_max, processing_time_sum)
+                SELECT user_email, created_at::DATE, COUNT(*), COUNT(ats_score), COALESCE(SUM(ats_score), 0),
+                MIN(ats_score), MAX(ats_score), COALESCE(SUM(processing_time), 0)
+                FROM cv_generations
+                WHERE id = ANY(%s) AND user_email IS NOT NULL
+                GROUP BY user_email, created_at::DATE
+                ON CONFLICT (user_email, day) DO UPDATE SET
+                cv_count = user_daily_stats.cv_count + EXCLUDED.cv_count,
+                ats_count = user_daily_stats.ats_count + EXCLUDED.ats_count,
+                ats_sum = user_daily_stats.ats_sum + EXCLUDED.ats_sum,
+                ats_min = LEAST(user_daily_stats.ats_min, EXCLUDED.ats_min),
+                ats_max = GREATEST(user_daily_stats.ats_max, EXCLUDED.ats_max),
+                processing_time_sum = user_daily_stats.processing_time_sum + EXCLUDED.processing_time_sum
+            """, (ids,))
+
+            # The chunk's rows are visible to later statements of the transaction, so AVG already includes them
+            cursor.execute("""
+                UPDATE users SET
+                total_cvs_generated = total_cvs_generated + batch.cv_count,
+                avg_ats_score = (SELECT AVG(ats_score) FROM cv_generations WHERE user_email = users.email)
+                FROM (
+                    SELECT user_email, COUNT(*) AS cv_count FROM cv_generations
+                    WHERE id = ANY(%s)
+                    GROUP BY user_email
+                ) batch
+                WHERE users.email = batch.user_email
+            """, (ids,))
+
+            report['rows'] += len(ids)
+            report['documents_written'] += len(written)
+            report['users_updated'] += cursor.rowcount
+            cursor.close()
+
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['rows_per_second'] = round(report['rows'] / report['seconds'], 1) if report['seconds'] else 0.0
+    return report
+
+def add_generation_stage_timings(generation_id, stage_timings):
+    """Merge stages measured after a generation was saved (e.g. PDF/DOCX rendering) into its timings"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            UPDATE cv_generations SET stage_timings = COALESCE(stage_timings, '{}'::JSONB) || %s::JSONB
+            WHERE id = %s
+        """, (json.dumps(stage_timings), generation_id))
+
+        cursor.close()
+
+def get_stage_timing_percentiles(days=7):
+    """p50/p95/p99 duration per stage (plus total processing time) over the last N days"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        cursor.execute("""
+            WITH samples AS (
+                SELECT timing.key AS stage, timing.value::FLOAT AS seconds
+                FROM cv_generations, jsonb_each_text(stage_timings) AS timing
+                WHERE created_at > CURRENT_TIMESTAMP - %(days)s * INTERVAL '1 day' AND stage_timings IS NOT NULL
+                UNION ALL
+                SELECT 'total', processing_time
+                FROM cv_generations
+                WHERE created_at > CURRENT_TIMESTAMP - %(days)s * INTERVAL '1 day' AND processing_time IS NOT NULL
+            )
+            SELECT stage, COUNT(*) AS samples,
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY seconds) AS p50,
+            percentile_cont(0.95) WITHIN GROUP (ORDER BY seconds) AS p95,
+            percentile_cont(0.99) WITHIN GROUP (ORDER BY seconds) AS p99
+            FROM samples
+            GROUP BY stage
+        """, {'days': days})
+
+        rows = cursor.fetchall()
+        cursor.close()
+
+    return [dict(row) for row in rows]
+
+USER_DAILY_STATS_SQL = """
+    SELECT day, cv_count, credits_used, ats_count, ats_sum, ats_min, ats_max,
+    ats_sum::FLOAT / NULLIF(ats_count, 0) AS avg_ats_score,
+    processing_time_sum / NULLIF(cv_count, 0) AS avg_processing_time,
+    processing_time_sum
+    FROM user_daily_stats
+    WHERE user_email = %s AND day > CURRENT_DATE - %s::INTEGER
+    ORDER BY day
+"""
+
+def get_user_daily_stats(user_email, days=90):
+    """Per-day generation and credit stats for the last N days, oldest first"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        # Served by the (user_email, day) primary key
+        cursor.execute(USER_DAILY_STATS_SQL, (user_email, days))
+
+        rows = cursor.fetchall()
+        cursor.close()
+
+    return [dict(row) for row in rows]
+
+def rebuild_user_daily_stats():
+    """Recompute every daily rollup from cv_generations and credit_reservations; return the number of rows"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            LOCK TABLE user_daily_stats IN EXCLUSIVE MODE
+        """)
+        cursor.execute("""
+            DELETE FROM user_daily_stats
+        """)
+        cursor.execute("""
+            INSERT INTO user_daily_stats (user_email, day, cv_count, ats_count, ats_sum, ats_min, ats_max,
+                                          processing_time_sum, credits_used)
+            SELECT user_email, day,
+            SUM(cv_count), SUM(ats_count), SUM(ats_sum), MIN(ats_min), MAX(ats_max),
+            SUM(processing_time_sum), SUM(credits_used)
+            FROM (
+                SELECT user_email, created_at::DATE AS day, COUNT(*) AS cv_count, COUNT(ats_score) AS ats_count,
+                COALESCE(SUM(ats_score), 0) AS ats_sum, MIN(ats_score) AS ats_min, MAX(ats_score) AS ats_max,
+                COALESCE(SUM(processing_time), 0) AS processing_time_sum, 0 AS credits_used
+                FROM cv_generations
+                WHERE user_email IS NOT NULL
+                GROUP BY user_email, created_at::DATE
+                UNION ALL
+                SELECT user_email, resolved_at::DATE, 0, 0, 0, NULL, NULL, 0, SUM(amount)
+                FROM credit_reservations
+                WHERE status = 'committed' AND user_email IS NOT NULL
+                GROUP BY user_email, resolved_at::DATE
+            ) daily
+            GROUP BY user_email, day
+        """)
+
+        rebuilt = cursor.rowcount
+        cursor.close()
+
+    return rebuilt
+
+def get_document(document_hash):
+    """Get a document's text by hash"""
+    if document_hash is None:
+        return None
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT codec, body FROM documents WHERE hash = %s
+        """, (document_hash,))
+
+        result = cursor.fetchone()
+        cursor.close()
+
+    return decompress_document(*result) if result else None
+
+def get_cv_generation(generation_id):
+    """Get a CV generation record with its job description, resume and CV texts"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        cursor.execute("""
+            SELECT g.*,
+            jd.codec AS jd_codec, jd.body AS jd_body,
+            resume.codec AS resume_codec, resume.body AS resume_body,
+            cv.codec AS cv_codec, cv.body AS cv_body
+            FROM cv_generations g
+            LEFT JOIN documents jd ON jd.hash = g.job_description_hash
+            LEFT JOIN documents resume ON resume.hash = g.original_resume_hash
+            LEFT JOIN documents cv ON cv.hash = g.generated_cv_hash
+            WHERE g.id = %s
+        """, (generation_id,))
+
+        row = cursor.fetchone()
+        cursor.close()
+
+    if row is None:
+        return None
+
+    generation = dict(row)
+    for column, prefix in zip(DOCUMENT_COLUMNS, ("jd", "resume", "cv")):
+        codec, body = generation.pop(f"{prefix}_codec"), generation.pop(f"{prefix}_body")
+        # Rows not yet migrated still carry the raw TEXT column
+        if body is not None:
+            generation[column] = decompress_document(codec, body)
+    return generation
+
+def iter_job_descriptions(chunk_size=1000):
+    """Yield each distinct stored job description, streamed through a server-side cursor chunk_size rows at a time"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor(name="job_description_scan")
+        cursor.itersize = chunk_size
+
+        # Documents are already deduplicated; rows not yet migrated still carry the raw TEXT column, which is
+        # deduplicated here and skipped when the same text is also stored as a document
+        cursor.execute("""
+            WITH migrated AS (
+                SELECT DISTINCT job_description_hash AS hash FROM cv_generations WHERE job_description_hash IS NOT NULL
+            )
+            SELECT d.codec, d.body, NULL FROM documents d JOIN migrated m ON m.hash = d.hash
+            UNION ALL
+            SELECT NULL, NULL, legacy.job_description
+            FROM (SELECT DISTINCT job_description FROM cv_generations WHERE job_description IS NOT NULL) legacy
+            WHERE NOT EXISTS (
+                SELECT 1 FROM migrated m WHERE m.hash = encode(sha256(convert_to(legacy.job_description, 'UTF8')), 'hex')
+            )
+        """)
+        for codec, body, text in cursor:
+            yield decompress_document(codec, body) if body is not None else text
+        cursor.close()
+
+def export_columns(table, columns=None):
+    """The columns to export from table (all of them by default), checked against EXPORT_COLUMNS"""
+    allowed = EXPORT_COLUMNS.get(table)
+    if allowed is None:
+        raise ValueError(f"Unknown export table: {table}")
+    columns = list(columns or allowed)
+    unknown = [column for column in columns if column not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown {table} columns: {', '.join(unknown)}")
+    return columns
+
+def iter_export_rows(table, columns=None, since=None, until=None, chunk_size=1000):
+    """Yield rows of an admin export as tuples in columns order, oldest first, streamed through a server-side cursor
+
+    since and until bound created_at (until is exclusive); only chunk_size rows are held in memory at a time.
+    """
+    columns = export_columns(table, columns)
+    select, joins = [], []
+    for column in columns:
+        if table == "cv_generations" and column in DOCUMENT_COLUMNS:
+            # Migrated rows have the text in documents, older rows still in the TEXT column
+            alias = f"doc_{column}"
+            select += [f"{alias}.hash", f"{alias}.codec", f"{alias}.body", f"t.{column}"]
+            joins.append(f"LEFT JOIN documents {alias} ON {alias}.hash = t.{column}_hash")
+        else:
+            select.append(f"t.{column}")
+
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("t.created_at >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("t.created_at < %s")
+        params.append(until)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor(name=f"{table}_export")
+        cursor.itersize = chunk_size
+        cursor.execute(f"""
+            SELECT {', '.join(select)} FROM {table} t
+            {' '.join(joins)}
+            {where}
+            ORDER BY t.id
+        """, params)
+
+        # Many generations share a JD or resume, so recently decoded documents are reused
+        decoded = OrderedDict()
+        for raw in cursor:
+            row, i = [], 0
+            for column in columns:
+                if table == "cv_generations" and column in DOCUMENT_COLUMNS:
+                    hash_, codec, body, text = raw[i:i + 4]
+                    if body is not None:
+                        if hash_ not in decoded:
+                            decoded[hash_] = decompress_document(codec, body)
+                            if len(decoded) > EXPORT_DOCUMENT_CACHE_SIZE:
+                                decoded.popitem(last=False)
+                        decoded.move_to_end(hash_)
+                        text = decoded[hash_]
+                    row.append(text)
+                    i += 4
+                else:
+                    row.append(raw[i])
+                    i += 1
+            yield tuple(row)
+        cursor.close()
+
+def migrate_cv_generation_documents(batch_size=500):
+    """Move cv_generations TEXT columns into the documents table; return byte counts for the report"""
+    report = {'rows': 0, 'texts': 0, 'documents_written': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+
+    while True:
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT id, job_description, original_resume, generated_cv FROM cv_generations
+                WHERE job_description IS NOT NULL OR original_resume IS NOT NULL OR generated_cv IS NOT NULL
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                cursor.close()
+                break
+
+            documents = document_rows(text for row in rows for text in row[1:])
+            written = execute_values(cursor, """
+                INSERT INTO documents (hash, codec, body, raw_size, stored_size) VALUES %s
+                ON CONFLICT (hash) DO NOTHING
+                RETURNING stored_size
+            """, documents, fetch=True)
+
+            updates = []
+            for row in rows:
+                updates.append((row[0], *(document_hash(text) for text in row[1:])))
+                texts = [text for text in row[1:] if text is not None]
+                report['texts'] += len(texts)
+                report['raw_bytes'] += sum(len(text.encode("utf-8")) for text in texts)
+
+            # COALESCE keeps hashes already set by a generation saved after the table was altered
+            execute_values(cursor, """
+                UPDATE cv_generations SET
+                job_description_hash = COALESCE(data.jd_hash, cv_generations.job_description_hash),
+                original_resume_hash = COALESCE(data.resume_hash, cv_generations.original_resume_hash),
+                generated_cv_hash = COALESCE(data.cv_hash, cv_generations.generated_cv_hash),
+                job_description = NULL,
+                original_resume = NULL,
+                generated_cv = NULL
+                FROM (VALUES %s) AS data (id, jd_hash, resume_hash, cv_hash)
+                WHERE cv_generations.id = data.id
+            """, updates, template="(%s, %s::CHAR(64), %s::CHAR(64), %s::CHAR(64))")
+
+            report['rows'] += len(rows)
+            report['documents_written'] += len(written)
+            report['stored_bytes'] += sum(size for (size,) in written)
+            cursor.close()
+
+    report['bytes_saved'] = report['raw_bytes'] - report['stored_bytes']
+    return report
+
+def pack_session_data(session_data):
+    """Split session data into small JSON fields and a compressed blob of large text fields; return (data, blob, hash)"""
+    session_hash = hashlib.sha256(json.dumps(session_data, sort_keys=True).encode()).hexdigest()
+
+    small_fields, large_fields = {}, {}
+    for key, value in session_data.items():
+        if isinstance(value, str) and len(value) > SESSION_BLOB_THRESHOLD:
+            large_fields[key] = value
+        else:
+            small_fields[key] = value
+
+    session_blob = zlib.compress(json.dumps(large_fields).encode()) if large_fields else None
+    return small_fields, session_blob, session_hash
+
+def unpack_session_data(session_data, session_blob):
+    """Merge the JSONB fields and the compressed blob back into one session dict"""
+    data = dict(session_data or {})
+    if session_blob is not None:
+        data.update(json.loads(zlib.decompress(bytes(session_blob))))
+    return data
 
 def save_user_session(user_email, session_data):
-    """Save user session data for auto-save"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO user_sessions (user_email, session_data)
-        VALUES (%s, %s)
-        ON CONFLICT (user_email) DO UPDATE SET
-        session_data = EXCLUDED.session_data,
-        updated_at = CURRENT_TIMESTAMP
-    """, (user_email, json.dumps(session_data)))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+    """Save user session data for auto-save; return False when the stored copy is already identical"""
+    small_fields, session_blob, session_hash = pack_session_data(session_data)
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        # The WHERE clause turns an unchanged payload into a no-op instead of a new row version
+        cursor.execute("""
+            INSERT INTO user_sessions (user_email, session_data, session_blob, session_hash)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (user_email) DO UPDATE SET
+            session_data = EXCLUDED.session_data,
+            session_blob = EXCLUDED.session_blob,
+            session_hash = EXCLUDED.session_hash,
+            updated_at = CURRENT_TIMESTAMP
+            WHERE user_sessions.session_hash IS DISTINCT FROM EXCLUDED.session_hash
+        """, (user_email, json.dumps(small_fields),
+              psycopg2.Binary(session_blob) if session_blob is not None else None, session_hash))
+
+        saved = cursor.rowcount > 0
+        cursor.close()
+    return saved
+
+def auto_save_session(user_email, session_data, min_interval=AUTO_SAVE_MIN_INTERVAL):
+    """Save session data only if it changed, and at most once per min_interval seconds per user"""
+    payload = json.dumps(session_data, sort_keys=True)
+    session_hash = hashlib.sha256(payload.encode()).hexdigest()
+    now = time.monotonic()
+
+    with _auto_save_lock:
+        last_hash, last_saved_at = _auto_save_state.get(user_email, (None, None))
+        pending = _auto_save_pending.get(user_email)
+        if session_hash == last_hash:
+            # Changed back to the saved copy, so a held-back snapshot must not overwrite it
+            if pending is not None:
+                pending[2].cancel()
+                del _auto_save_pending[user_email]
+            return False
+        if last_saved_at is not None and now - last_saved_at < min_interval:
+            # Hold a copy of the latest change back and write it when the window closes, even without another rerun
+            if pending is None:
+                timer = threading.Timer(min_interval - (now - last_saved_at), _flush_auto_save_later, args=(user_email,))
+                timer.daemon = True
+                timer.start()
+            else:
+                timer = pending[2]
+            _auto_save_pending[user_email] = (json.loads(payload), session_hash, timer)
+            return False
+        _auto_save_state[user_email] = (session_hash, now)
+        pending = _auto_save_pending.pop(user_email, None)
+
+    if pending is not None:
+        pending[2].cancel()
+    return _write_auto_save(user_email, session_data)
+
+def flush_auto_save(user_email):
+    """Write the snapshot auto_save_session is holding back for the user now (e.g. on logout); return True if one was saved"""
+    with _auto_save_lock:
+        pending = _auto_save_pending.pop(user_email, None)
+        if pending is None:
+            return False
+        session_data, session_hash, timer = pending
+        timer.cancel()
+        _auto_save_state[user_email] = (session_hash, time.monotonic())
+
+    return _write_auto_save(user_email, session_data)
+
+def _flush_auto_save_later(user_email):
+    try:
+        flush_auto_save(user_email)
+    except Exception as e:
+        print(f"Could not auto-save the session of {user_email}: {str(e)}")
+
+def _write_auto_save(user_email, session_data):
+    try:
+        return save_user_session(user_email, session_data)
+    except Exception:
+        # Forget the attempt so the next rerun tries again
+        with _auto_save_lock:
+            _auto_save_state.pop(user_email, None)
+        raise
 
 def get_user_session(user_email):
     """Get user session data"""
@@ -220,29 +1110,59 @@ def get_user_session(user_email):
     cursor = conn.cursor()
     
     cursor.execute("""
-        SELECT session_data FROM user_sessions WHERE user_email = %s
+        SELECT session_data, session_blob FROM user_sessions WHERE user_email = %s
     """, (user_email,))
     
     result = cursor.fetchone()
     cursor.close()
     conn.close()
     
-    return json.loads(result[0]) if result else {}
+    # psycopg2 already decodes JSONB columns into dicts
+    return unpack_session_data(result[0], result[1]) if result else {}
+
+SAVE_PAYMENT_SQL = """
+    INSERT INTO payments (user_email, amount, type, stripe_payment_id, credits_purchased)
+    VALUES (%s, %s, %s, %s, %s)
+"""
 
 def save_payment(user_email, amount, payment_type, stripe_payment_id, credits_purchased=0):
     """Save payment record"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute("""
-        INSERT INTO payments (user_email, amount, type, stripe_payment_id, credits_purchased)
-        VALUES (%s, %s, %s, %s, %s)
-    """, (user_email, amount, payment_type, stripe_payment_id, credits_purchased))
+    cursor.execute(SAVE_PAYMENT_SQL, (user_email, amount, payment_type, stripe_payment_id, credits_purchased))
     
     conn.commit()
     cursor.close()
     conn.close()
 
+def save_payments(records, chunk_size=BULK_INSERT_CHUNK_SIZE):
+    """Save many payment records (dicts of save_payment's arguments, plus optional status and created_at); return the counts"""
+    report = {'rows': 0}
+    started = time.perf_counter()
+
+    for chunk in _chunks(records, chunk_size):
+        payments = [(
+            record['user_email'], record['amount'], record['payment_type'], record.get('status'),
+            record.get('stripe_payment_id'), record.get('credits_purchased', 0), record.get('created_at')
+        ) for record in chunk]
+
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            execute_values(cursor, """
+                INSERT INTO payments (user_email, amount, type, status, stripe_payment_id, credits_purchased, created_at)
+                VALUES %s
+            """, payments, template="(%s, %s, %s, COALESCE(%s, 'pending'), %s, %s, COALESCE(%s::TIMESTAMP, CURRENT_TIMESTAMP))",
+                page_size=len(payments))
+
+            report['rows'] += len(payments)
+            cursor.close()
+
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['rows_per_second'] = round(report['rows'] / report['seconds'], 1) if report['seconds'] else 0.0
+    return report
+
 def create_discount_code(code, discount_percent, max_uses=1, expires_at=None):
     """Create discount code"""
     conn = get_db_connection()
@@ -0,0 +1,100 @@
+"""Admin exports of generation history and payments
+
+Rows are streamed from a server-side cursor and written as they arrive (Parquet one row group per chunk), so
+memory use stays flat however large the table is. Run it with `python -m cvolve export`.
+"""
+import csv
+import json
+from decimal import Decimal
+from datetime import date, datetime
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional: only needed for Parquet exports
+    pyarrow = None
+
+from database import export_columns, iter_export_rows
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+
+def parquet_types():
+    """Arrow type of every exportable column"""
+    return {
+        "id": pyarrow.int64(), "user_email": pyarrow.string(), "template_used": pyarrow.string(),
+        "ats_score": pyarrow.int32(), "target_match": pyarrow.int32(), "processing_time": pyarrow.float64(),
+        "stage_timings": pyarrow.string(), "created_at": pyarrow.timestamp("us"), "job_description": pyarrow.string(),
+        "original_resume": pyarrow.string(), "generated_cv": pyarrow.string(), "amount": pyarrow.decimal128(10, 2),
+        "type": pyarrow.string(), "status": pyarrow.string(), "stripe_payment_id": pyarrow.string(),
+        "credits_purchased": pyarrow.int32(),
+    }
+
+def to_text(value):
+    """A value as CSV/JSON text: ISO dates, JSON for JSONB columns, exact decimals"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def write_csv(rows, columns, f):
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([to_text(value) for value in row])
+        count += 1
+    return count
+
+def write_jsonl(rows, columns, f):
+    count = 0
+    for row in rows:
+        record = {column: to_text(value) for column, value in zip(columns, row)}
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+def write_parquet(rows, columns, path, chunk_size):
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is required for Parquet exports")
+    types = parquet_types()
+    schema = pyarrow.schema([(column, types[column]) for column in columns])
+    json_columns = {i for i, column in enumerate(columns) if column == "stage_timings"}
+
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                count += _write_row_group(writer, schema, batch, json_columns)
+                batch = []
+        if batch or count == 0:
+            count += _write_row_group(writer, schema, batch, json_columns)
+    return count
+
+def _write_row_group(writer, schema, batch, json_columns):
+    arrays = []
+    for i, field in enumerate(schema):
+        values = [row[i] for row in batch]
+        if i in json_columns:
+            values = [json.dumps(value) if value is not None else None for value in values]
+        arrays.append(pyarrow.array(values, type=field.type))
+    writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+    return len(batch)
+
+def export_table(table, out_path, export_format="csv", columns=None, since=None, until=None, chunk_size=1000):
+    """Export a table's rows (optionally only some columns and a created_at range) to a file; return the row count"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    columns = export_columns(table, columns)
+    rows = iter_export_rows(table, columns, since, until, chunk_size)
+
+    if export_format == "parquet":
+        return write_parquet(rows, columns, out_path, chunk_size)
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        if export_format == "csv":
+            return write_csv(rows, columns, f)
+        return write_jsonl(rows, columns, f)
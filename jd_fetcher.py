@@ -0,0 +1,262 @@
+"""Fetch job descriptions from posting URLs
+
+Pages are fetched concurrently through one pooled HTTP session and reduced to the posting text: the
+schema.org JobPosting description when the page has one, otherwise the main content block with navigation,
+footers and equal-opportunity boilerplate removed. Results are cached per URL for JD_CACHE_TTL seconds and
+revalidated with ETag/Last-Modified after that.
+"""
+import os
+import re
+import json
+import time
+import socket
+import threading
+import ipaddress
+from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+
+# Seconds a fetched JD is served without asking the site again
+JD_CACHE_TTL = float(os.getenv("JD_CACHE_TTL", "3600"))
+
+# Number of fetched JDs kept in the in-process cache
+JD_CACHE_SIZE = 512
+
+# Connect and read timeouts in seconds
+JD_CONNECT_TIMEOUT = float(os.getenv("JD_CONNECT_TIMEOUT", "5"))
+JD_READ_TIMEOUT = float(os.getenv("JD_READ_TIMEOUT", "15"))
+
+# Concurrent fetches for fetch_job_descriptions
+JD_FETCH_WORKERS = 8
+
+# Pages larger than this are rejected rather than parsed
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+
+MAX_REDIRECTS = 5
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Allow URLs that resolve to loopback/private addresses (off in production: the server would fetch them)
+ALLOW_PRIVATE_HOSTS = os.getenv("JD_FETCH_ALLOW_PRIVATE", "").lower() in ("1", "true", "yes")
+
+USER_AGENT = "Mozilla/5.0 (compatible; CVOLVE-PRO JD fetcher)"
+
+# Elements that never hold the posting itself
+NOISE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "form", "button", "nav", "header", "footer", "aside"]
+NOISE_ROLES = ["navigation", "banner", "contentinfo", "complementary", "search", "dialog"]
+NOISE_ATTRIBUTE = re.compile(r"cookie|consent|banner|navbar|nav-|menu|breadcrumb|footer|sidebar|social|share|related|newsletter|subscribe|modal|popup", re.I)
+
+# Elements whose text starts on a new line
+BLOCK_TAGS = ["p", "div", "section", "article", "main", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "table", "dt", "dd", "pre", "blockquote"]
+
+# Equal-opportunity and legal boilerplate paragraphs appended to most postings
+BOILERPLATE_PATTERNS = re.compile(
+    r"equal (employment )?opportunity|without regard to (race|age|sex)|reasonable accommodation|e-verify|"
+    r"affirmative action|protected veteran|disability status|sexual orientation|gender identity|"
+    r"applicants with disabilities|pay transparency|background check|privacy (notice|policy)|"
+    r"cookies? (policy|settings)|all rights reserved",
+    re.I
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+@dataclass
+class FetchedJD:
+    """Outcome of fetching one job description URL"""
+    url: str
+    text: str = ""
+    title: str = ""
+    error: str = ""
+    from_cache: bool = False
+
+    @property
+    def ok(self):
+        return not self.error and bool(self.text)
+
+def get_session():
+    """Process-wide HTTP session whose connection pool is sized for concurrent fetches"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=JD_FETCH_WORKERS, pool_maxsize=JD_FETCH_WORKERS * 2,
+                                  max_retries=Retry(total=1, read=0, redirect=0))
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers.update({"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"})
+        return _session
+
+def check_url(url):
+    """Reject non-HTTP URLs and, unless allowed, hosts that resolve to internal addresses"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError(f"Not an http(s) URL: {url}")
+    if ALLOW_PRIVATE_HOSTS:
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, parsed.port or DEFAULT_PORTS[parsed.scheme])}
+    except socket.gaierror:
+        raise ValueError(f"Unknown host: {parsed.hostname}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved or ip.is_multicast:
+            raise ValueError(f"Refusing to fetch internal address {address} for {parsed.hostname}")
+
+def _get(url, headers):
+    """GET following redirects manually, so every hop is checked by check_url"""
+    session = get_session()
+    for _ in range(MAX_REDIRECTS + 1):
+        check_url(url)
+        response = session.get(
+            url, headers=headers, timeout=(JD_CONNECT_TIMEOUT, JD_READ_TIMEOUT), allow_redirects=False, stream=True
+        )
+        if response.is_redirect:
+            url = urljoin(url, response.headers["Location"])
+            response.close()
+            continue
+        return response
+    raise ValueError("Too many redirects")
+
+def _read_body(response):
+    body = b""
+    for chunk in response.iter_content(64 * 1024):
+        body += chunk
+        if len(body) > MAX_PAGE_BYTES:
+            response.close()
+            raise ValueError("Page is too large")
+    return body
+
+def _json_ld_postings(soup):
+    """schema.org JobPosting objects embedded as JSON-LD"""
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        candidates = data if isinstance(data, list) else data.get("@graph", [data]) if isinstance(data, dict) else []
+        for candidate in candidates:
+            if isinstance(candidate, dict) and "JobPosting" in str(candidate.get("@type", "")):
+                yield candidate
+
+def _block_text(element):
+    """Text of an element, one line per block element (list items as bullets), with inline markup joined"""
+    for tag in element.find_all(BLOCK_TAGS):
+        tag.insert_before("\n")
+        tag.insert_after("\n")
+        if tag.name == "li":
+            tag.insert(0, "• ")
+    for tag in element.find_all("br"):
+        tag.replace_with("\n")
+    lines = [re.sub(r"\s+", " ", line).strip() for line in element.get_text().splitlines()]
+    return "\n".join(line for line in lines if line and line != "•")
+
+def _drop_boilerplate(text):
+    """Remove equal-opportunity and legal paragraphs"""
+    return "\n".join(line for line in text.splitlines() if not BOILERPLATE_PATTERNS.search(line)).strip()
+
+def extract_posting_text(html):
+    """Return (title, posting text) from a job posting page (bytes are decoded using the page's own charset)"""
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+
+    for posting in _json_ld_postings(soup):
+        description = posting.get("description") or ""
+        if description:
+            text = _block_text(BeautifulSoup(description, "html.parser"))
+            heading = posting.get("title") or title
+            return heading, _drop_boilerplate(f"{heading}\n{text}" if heading else text)
+
+    for element in soup.find_all(NOISE_TAGS):
+        element.decompose()
+    for element in soup.find_all(attrs={"role": NOISE_ROLES}):
+        element.decompose()
+    for element in soup.find_all(True):
+        if element.decomposed or element.name in ("html", "body", "main", "article"):
+            continue
+        marker = " ".join(element.get("class") or []) + " " + (element.get("id") or "")
+        if NOISE_ATTRIBUTE.search(marker):
+            element.decompose()
+
+    main = soup.find("main") or soup.find(attrs={"role": "main"}) or soup.find("article")
+    if main is None:
+        # The block with the most text that isn't mostly links
+        blocks = soup.find_all(["div", "section"]) or [soup.body or soup]
+        main = max(blocks, key=lambda block: len(block.get_text(strip=True)) - 2 * sum(
+            len(link.get_text(strip=True)) for link in block.find_all("a")
+        ))
+    return title, _drop_boilerplate(_block_text(main))
+
+def _cache_get(url):
+    with _cache_lock:
+        entry = _cache.get(url)
+        if entry is not None:
+            _cache.move_to_end(url)
+        return entry
+
+def _cache_put(url, entry):
+    with _cache_lock:
+        _cache[url] = entry
+        _cache.move_to_end(url)
+        while len(_cache) > JD_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def fetch_job_description(url, use_cache=True):
+    """Fetch one posting URL and extract its job description text"""
+    url = url.strip()
+    entry = _cache_get(url) if use_cache else None
+    if entry and time.time() - entry["fetched_at"] < JD_CACHE_TTL:
+        return FetchedJD(url, entry["text"], entry["title"], from_cache=True)
+
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        response = _get(url, headers)
+        if response.status_code == 304 and entry:
+            response.close()
+            _cache_put(url, {**entry, "fetched_at": time.time()})
+            return FetchedJD(url, entry["text"], entry["title"], from_cache=True)
+        if response.status_code != 200:
+            response.close()
+            return FetchedJD(url, error=f"HTTP {response.status_code}")
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            response.close()
+            return FetchedJD(url, error=f"Unsupported content type {response.headers['Content-Type']}")
+
+        body = _read_body(response)
+        title, text = extract_posting_text(body)
+        if not text:
+            return FetchedJD(url, title=title, error="No job description text found on the page")
+
+        _cache_put(url, {
+            "text": text, "title": title, "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"), "fetched_at": time.time()
+        })
+        return FetchedJD(url, text, title)
+    except (requests.RequestException, ValueError) as e:
+        return FetchedJD(url, error=str(e))
+
+def fetch_job_descriptions(urls, max_workers=JD_FETCH_WORKERS, use_cache=True):
+    """Fetch several posting URLs concurrently; results are in the order of urls"""
+    urls = [url for url in urls if url.strip()]
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        return list(executor.map(lambda url: fetch_job_description(url, use_cache), urls))
+
+def parse_urls(text):
+    """http(s) URLs in pasted text (one per line, or separated by spaces or commas)"""
+    return re.findall(r"https?://[^\s,]+", text)
@@ -0,0 +1,380 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import traceback
+
+# Local SQLite file backing the job queue (shared by the Streamlit app and the worker processes)
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.sqlite3")
+
+# Attempts per job before it is marked as failed
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Delay before a failed job is retried (multiplied by the attempt number)
+RETRY_BACKOFF_SECONDS = 10
+
+# A running job whose worker stopped renewing it becomes claimable again after this many seconds
+JOB_LEASE_SECONDS = 300
+
+# Seconds between lease renewals while a job runs (well inside the lease, so one missed beat is harmless)
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 5
+
+# Finished jobs are deleted after this many seconds
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# Seconds between the worker's housekeeping passes (abandoned jobs, purging finished ones)
+JOB_MAINTENANCE_INTERVAL = 60
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+def get_job_connection():
+    """Open a connection to the job queue database"""
+    conn = sqlite3.connect(JOB_QUEUE_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def init_job_queue():
+    """Initialize job queue tables"""
+    conn = get_job_connection()
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            user_email TEXT,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            worker_id TEXT,
+            reservation_id INTEGER,
+            run_after REAL NOT NULL,
+            lease_expires_at REAL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, run_after)
+    """)
+
+    # Credit reservation settled by the worker when the job finishes (added after the table was created)
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+    if "reservation_id" not in columns:
+        conn.execute("""
+            ALTER TABLE jobs ADD COLUMN reservation_id INTEGER
+        """)
+
+    conn.close()
+
+def _job_from_row(row):
+    """Convert a jobs row into a dict with decoded payload and result"""
+    if row is None:
+        return None
+    job = dict(row)
+    job['payload'] = json.loads(job['payload'])
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+def submit_job(kind, payload, user_email=None, max_attempts=DEFAULT_MAX_ATTEMPTS, reservation_id=None):
+    """Queue a generation job and return its ID; the worker settles reservation_id when the job finishes"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = get_job_connection()
+
+    conn.execute("""
+        INSERT INTO jobs (id, kind, user_email, payload, max_attempts, reservation_id, run_after, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (job_id, kind, user_email, json.dumps(payload), max_attempts, reservation_id, now, now, now))
+
+    conn.close()
+    return job_id
+
+def get_job(job_id):
+    """Get job status, result and error by ID"""
+    conn = get_job_connection()
+
+    row = conn.execute("""
+        SELECT * FROM jobs WHERE id = ?
+    """, (job_id,)).fetchone()
+
+    conn.close()
+    return _job_from_row(row)
+
+def claim_next_job(worker_id):
+    """Atomically claim the oldest runnable job (or one whose worker lease expired with attempts left)"""
+    now = time.time()
+    conn = get_job_connection()
+
+    # BEGIN IMMEDIATE takes the write lock up front so two workers can't claim the same job
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("""
+            SELECT id FROM jobs
+            WHERE (status = 'queued' AND run_after <= ?)
+            OR (status = 'running' AND lease_expires_at < ? AND attempts < max_attempts)
+            ORDER BY created_at
+            LIMIT 1
+        """, (now, now)).fetchone()
+
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        conn.execute("""
+            UPDATE jobs SET
+            status = 'running',
+            attempts = attempts + 1,
+            worker_id = ?,
+            lease_expires_at = ?,
+            updated_at = ?
+            WHERE id = ?
+        """, (worker_id, now + JOB_LEASE_SECONDS, now, row['id']))
+
+        job = conn.execute("""
+            SELECT * FROM jobs WHERE id = ?
+        """, (row['id'],)).fetchone()
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return _job_from_row(job)
+
+def renew_lease(job_id, worker_id):
+    """Extend a running job's lease; False if the job is no longer this worker's"""
+    now = time.time()
+    conn = get_job_connection()
+
+    cursor = conn.execute("""
+        UPDATE jobs SET lease_expires_at = ?, updated_at = ?
+        WHERE id = ? AND worker_id = ? AND status = 'running'
+    """, (now + JOB_LEASE_SECONDS, now, job_id, worker_id))
+
+    conn.close()
+    return cursor.rowcount == 1
+
+def complete_job(job_id, worker_id, result):
+    """Persist a job result and mark it as succeeded; False if the job's lease was lost to another worker"""
+    conn = get_job_connection()
+
+    cursor = conn.execute("""
+        UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, lease_expires_at = NULL, updated_at = ?
+        WHERE id = ? AND worker_id = ? AND status = 'running'
+    """, (json.dumps(result), time.time(), job_id, worker_id))
+
+    conn.close()
+    return cursor.rowcount == 1
+
+def fail_job(job_id, worker_id, error):
+    """Record a job failure, re-queueing it with backoff until it runs out of attempts; return the new status
+
+    Returns None if the job's lease was lost to another worker, which then owns the outcome.
+    """
+    now = time.time()
+    conn = get_job_connection()
+
+    row = conn.execute("""
+        UPDATE jobs SET
+        status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+        run_after = ? + attempts * ?,
+        error = ?,
+        lease_expires_at = NULL,
+        updated_at = ?
+        WHERE id = ? AND worker_id = ? AND status = 'running'
+        RETURNING status
+    """, (now, RETRY_BACKOFF_SECONDS, error, now, job_id, worker_id)).fetchone()
+
+    conn.close()
+    return row['status'] if row else None
+
+def fail_abandoned_jobs():
+    """Fail running jobs whose lease expired on their last attempt; return their (id, reservation_id) rows"""
+    now = time.time()
+    conn = get_job_connection()
+
+    rows = conn.execute("""
+        UPDATE jobs SET
+        status = 'failed',
+        error = COALESCE(error, 'Worker stopped while running the job'),
+        lease_expires_at = NULL,
+        updated_at = ?
+        WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts
+        RETURNING id, reservation_id
+    """, (now, now)).fetchall()
+
+    conn.close()
+    return [dict(row) for row in rows]
+
+def retry_job(job_id, reservation_id=None):
+    """Re-queue a failed job with a fresh set of attempts (and the credit reservation for the new run)"""
+    now = time.time()
+    conn = get_job_connection()
+
+    conn.execute("""
+        UPDATE jobs SET status = 'queued', attempts = 0, error = NULL, reservation_id = ?, run_after = ?, updated_at = ?
+        WHERE id = ? AND status = 'failed'
+    """, (reservation_id, now, now, job_id))
+
+    conn.close()
+
+def purge_finished_jobs(older_than_seconds=JOB_RETENTION_SECONDS):
+    """Delete finished jobs older than the given age"""
+    conn = get_job_connection()
+
+    cursor = conn.execute("""
+        DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?
+    """, (time.time() - older_than_seconds,))
+
+    conn.close()
+    return cursor.rowcount
+
+def active_reservation_ids():
+    """Credit reservations of jobs still queued or running, which must stay pending"""
+    conn = get_job_connection()
+
+    rows = conn.execute("""
+        SELECT reservation_id FROM jobs WHERE status IN ('queued', 'running') AND reservation_id IS NOT NULL
+    """).fetchall()
+
+    conn.close()
+    return [row['reservation_id'] for row in rows]
+
+def run_cv_job(payload):
+    """Generate a CV for a queued job"""
+    from cv_generator import generate_cv_document
+    from tracing import trace
+
+    started = time.perf_counter()
+    with trace() as generation_trace:
+        cv_text, structured_cv = generate_cv_document(
+            payload['resume_text'],
+            payload['job_description'],
+            payload['target_match'],
+            payload['template'],
+            payload['sections'],
+            generation_mode=payload.get('generation_mode', "standard")
+        )
+    return {
+        'cv_text': cv_text,
+        'structured_cv': structured_cv.model_dump() if structured_cv else None,
+        'stage_timings': generation_trace.as_dict(),
+        # Generation time only; the job's created_at/updated_at span also includes time spent queued
+        'generation_seconds': time.perf_counter() - started
+    }
+
+def run_cover_letter_job(payload):
+    """Generate a cover letter for a queued job"""
+    from cv_generator import generate_cover_letter
+    return {'cover_letter': generate_cover_letter(payload['resume_text'], payload['job_description'])}
+
+def run_interview_qa_job(payload):
+    """Generate interview Q&A for a queued job"""
+    from cv_generator import generate_interview_qa
+    return {'qa_content': generate_interview_qa(payload['resume_text'], payload['job_description'])}
+
+def run_ats_job(payload):
+    """Analyze ATS score for a queued job"""
+    from cv_generator import analyze_cv_ats_score
+    return {'analysis': analyze_cv_ats_score(payload['resume_text'], payload['job_description'])}
+
+JOB_HANDLERS = {
+    "cv": run_cv_job,
+    "cover_letter": run_cover_letter_job,
+    "interview_qa": run_interview_qa_job,
+    "ats": run_ats_job
+}
+
+def settle_job_reservation(job, success):
+    """Keep a finished job's reserved credit, or refund it if the job failed for good"""
+    if job.get('reservation_id') is None:
+        return
+    from database import commit_reservation, release_reservation
+    try:
+        if success:
+            commit_reservation(job['reservation_id'])
+        else:
+            release_reservation(job['reservation_id'])
+    except Exception as e:
+        # release_stale_reservations refunds anything left pending
+        print(f"Could not settle reservation {job['reservation_id']} of job {job['id']}: {str(e)}")
+
+def run_maintenance():
+    """Fail jobs abandoned on their last attempt, refund stale credit reservations and purge old finished jobs"""
+    for job in fail_abandoned_jobs():
+        settle_job_reservation(job, success=False)
+        print(f"Job {job['id']} failed: its worker stopped on the last attempt")
+
+    from database import release_stale_reservations
+    try:
+        refunded = release_stale_reservations(keep_ids=active_reservation_ids())
+        if refunded:
+            print(f"Refunded stale credit reservations of {refunded} users")
+    except Exception as e:
+        print(f"Could not release stale reservations: {str(e)}")
+
+    purged = purge_finished_jobs()
+    if purged:
+        print(f"Purged {purged} finished jobs")
+
+def _heartbeat(job_id, worker_id, stop):
+    """Renew a job's lease until stop is set, so long generations aren't handed to a second worker"""
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            if not renew_lease(job_id, worker_id):
+                return
+        except sqlite3.Error as e:
+            print(f"Could not renew the lease of job {job_id}: {str(e)}")
+
+def run_worker(poll_interval=1.0, once=False):
+    """Process queued jobs until interrupted (or until the queue is empty when once=True)"""
+    init_job_queue()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Job worker {worker_id} polling {JOB_QUEUE_PATH}")
+    next_maintenance = 0
+
+    while True:
+        if time.time() >= next_maintenance:
+            run_maintenance()
+            next_maintenance = time.time() + JOB_MAINTENANCE_INTERVAL
+
+        job = claim_next_job(worker_id)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        started = time.time()
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(job['id'], worker_id, stop_heartbeat), daemon=True)
+        heartbeat.start()
+        try:
+            result = JOB_HANDLERS[job['kind']](job['payload'])
+            stop_heartbeat.set()
+            if complete_job(job['id'], worker_id, result):
+                settle_job_reservation(job, success=True)
+                print(f"Job {job['id']} ({job['kind']}) succeeded in {time.time() - started:.1f}s")
+            else:
+                print(f"Job {job['id']} ({job['kind']}) finished after its lease was lost; result discarded")
+        except Exception as e:
+            stop_heartbeat.set()
+            status = fail_job(job['id'], worker_id, f"{str(e)}\n{traceback.format_exc()}")
+            if status == "failed":
+                settle_job_reservation(job, success=False)
+            print(f"Job {job['id']} ({job['kind']}) failed on attempt {job['attempts']}: {str(e)}")
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
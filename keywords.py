@@ -0,0 +1,304 @@
+"""Phrase-aware keyword extraction from job descriptions
+
+Unigrams, bigrams and trigrams are scored by frequency, position of first mention and IDF against a background
+corpus, with a boost for skills known to the taxonomy. The background is the document-frequency file built from
+our own job descriptions by `python -m cvolve build-idf` when it exists (memory-mapped, so loading it costs
+next to nothing), otherwise the bundled table of generic job-posting language in data/keyword_background.txt.
+Extraction is a single pass over the text, and ties are broken by first mention, so the ranking is stable.
+The ranked keywords drive bolding, ATS keyword scoring and prompt compaction.
+"""
+import os
+import re
+import math
+import mmap
+import heapq
+import struct
+import threading
+from array import array
+from collections import Counter
+
+from taxonomy import DATA_DIR, TOKEN_PATTERN, get_taxonomy
+
+KEYWORD_BACKGROUND = os.getenv("KEYWORD_BACKGROUND", os.path.join(DATA_DIR, "keyword_background.txt"))
+
+# Document frequencies built from the stored job descriptions; used instead of the bundled table when present
+KEYWORD_IDF_FILE = os.getenv("KEYWORD_IDF_FILE", os.path.join(DATA_DIR, "keyword_idf.bin"))
+
+IDF_MAGIC = b"CVDF"
+IDF_VERSION = 1
+# magic, version, documents, terms, string bytes; then term offsets, frequencies and sorted UTF-8 terms
+IDF_HEADER = struct.Struct("<4sHxxQII")
+
+# Token lookups remembered per IDF file before the memo is reset
+LOOKUP_CACHE_SIZE = 100000
+
+# Terms in fewer documents than this are left out of the built file (they get the rare-term IDF anyway)
+MIN_DOCUMENT_FREQUENCY = 2
+
+# Longest phrase considered, in tokens
+MAX_PHRASE_TOKENS = 3
+
+# Score multipliers: first mention at the very start vs the end, each extra token, and known taxonomy skills
+POSITION_WEIGHT = 0.5
+PHRASE_WEIGHT = 0.3
+KNOWN_SKILL_WEIGHT = 1.5
+
+# Text never crosses these in a phrase: sentence ends, list separators, brackets and line breaks
+SEGMENT_PATTERN = re.compile(r"[,;:!?()\[\]{}|•\"\n\r\t]+|\.(?=\s|$)|\s[-–—]\s")
+
+# Function words and job-ad filler that can't start, end or sit inside a keyword phrase
+STOP_WORDS = {
+    "a", "about", "above", "after", "all", "also", "am", "an", "and", "any", "are", "as", "at", "be", "been",
+    "being", "both", "but", "by", "can", "could", "did", "do", "does", "each", "eg", "e.g", "etc", "every", "few",
+    "for", "from", "had", "has", "have", "he", "her", "here", "his", "how", "i", "ie", "i.e", "if", "in", "into",
+    "is", "it", "its", "may", "me", "more", "most", "must", "my", "no", "not", "of", "on", "one", "only", "or",
+    "other", "our", "ours", "out", "over", "own", "per", "she", "should", "so", "some", "such", "than", "that",
+    "the", "their", "them", "then", "there", "these", "they", "this", "those", "through", "to", "under", "up",
+    "us", "very", "via", "was", "we", "were", "what", "when", "where", "which", "while", "who", "whom", "why",
+    "will", "with", "would", "you", "your", "yours",
+    "able", "achieve", "achieved", "aptitude", "attitude", "capable", "dedicated", "dynamic", "excellent", "good",
+    "great", "hardworking", "ideal", "passion", "passionate", "proficient", "proven", "strong", "success",
+    "successful", "want", "looking", "seeking", "join", "like", "love", "new", "well",
+    "across", "apply", "ensure", "get", "include", "includes", "including", "make", "offer", "offering", "offers",
+    "provide", "using", "within", "bonus", "day", "days", "junior", "position", "positions", "preferred",
+    "qualifications", "required", "requirement", "responsibilities", "responsibility", "role", "roles", "senior",
+    "age", "applicants", "colour", "color", "employers", "equal", "gender", "holidays", "leave", "opportunities",
+    "origin", "parental", "perks", "pto", "race", "regard", "religion", "sex", "vacation", "veteran", "veterans",
+}
+
+# Job-ad and benefits words that are only keywords inside a known skill ("cloud run", "paid search",
+# "program management", "user experience"): on their own, or at either end of any other phrase, they are filler
+FILLER_WORDS = {
+    "applicant", "benefits", "candidate", "candidates", "company", "compensation", "competitive", "disability",
+    "employer", "experience", "experienced", "experiences", "help", "national", "off", "opportunity", "paid",
+    "plus", "program", "programs", "requirements", "run", "salary", "schedule", "status", "take", "team", "use",
+    "work", "working", "year", "years",
+}
+
+_background = None
+_background_lock = threading.Lock()
+
+class Background:
+    """Document frequencies of a background corpus, giving the IDF of each token"""
+    def __init__(self, documents, frequencies):
+        self.documents = documents
+        self.frequencies = frequencies
+        self.rare_idf = math.log(documents + 1) + 1
+
+    def idf(self, token):
+        frequency = self.frequencies.get(token)
+        if frequency is None:
+            return self.rare_idf
+        return math.log((self.documents + 1) / (frequency + 1)) + 1
+
+class MappedFrequencies:
+    """Read-only term -> document frequency lookups straight from a memory-mapped build-idf file"""
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.documents, self._count, string_size = IDF_HEADER.unpack_from(self._map)
+        if magic != IDF_MAGIC or version != IDF_VERSION:
+            raise ValueError(f"{path} is not a keyword IDF file of this version")
+        start = IDF_HEADER.size
+        self._strings_start = start + 4 * (2 * self._count + 1)
+        if len(self._map) != self._strings_start + string_size:
+            raise ValueError(f"{path} is truncated")
+        view = memoryview(self._map)
+        self._offsets = view[start:start + 4 * (self._count + 1)].cast("I")
+        self._frequencies = view[start + 4 * (self._count + 1):self._strings_start].cast("I")
+        # Recent lookups, so repeated tokens skip the binary search
+        self._found = {}
+
+    def __len__(self):
+        return self._count
+
+    def _term(self, i):
+        return self._map[self._strings_start + self._offsets[i]:self._strings_start + self._offsets[i + 1]]
+
+    def get(self, term, default=None):
+        if term in self._found:
+            return self._found[term]
+        key = term.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        frequency = self._frequencies[low] if low < self._count and self._term(low) == key else default
+        if len(self._found) >= LOOKUP_CACHE_SIZE:
+            self._found.clear()
+        self._found[term] = frequency
+        return frequency
+
+def build_background_file(texts, path=KEYWORD_IDF_FILE, min_document_frequency=MIN_DOCUMENT_FREQUENCY):
+    """Count the documents each candidate token appears in and write them as an IDF file; return the counts
+
+    texts can be any iterable (e.g. a database cursor), so the corpus is never held in memory at once.
+    """
+    documents = 0
+    frequencies = Counter()
+    for text in texts:
+        if not text:
+            continue
+        documents += 1
+        frequencies.update({token for token in TOKEN_PATTERN.findall(text.lower()) if is_candidate_token(token)})
+
+    terms = sorted(
+        (term.encode("utf-8"), count) for term, count in frequencies.items() if count >= min_document_frequency
+    )
+    offsets = array("I", [0])
+    for term, count in terms:
+        offsets.append(offsets[-1] + len(term))
+    strings = b"".join(term for term, count in terms)
+    data = (IDF_HEADER.pack(IDF_MAGIC, IDF_VERSION, documents, len(terms), len(strings)) + offsets.tobytes()
+            + array("I", (count for term, count in terms)).tobytes() + strings)
+
+    # Replaced atomically: processes that already mapped the old file keep reading it until they restart
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return {"documents": documents, "terms": len(terms), "bytes": len(data)}
+
+def load_background(path=KEYWORD_BACKGROUND):
+    """Read a "<term> <document count>" file whose "@documents <total>" line gives the corpus size"""
+    documents = 0
+    frequencies = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            term, _, count = line.rpartition(" ")
+            if term == "@documents":
+                documents = int(count)
+            else:
+                frequencies[term] = int(count)
+    if documents <= 0:
+        raise ValueError(f"{path} has no @documents line")
+    return Background(documents, frequencies)
+
+def get_background():
+    """Process-wide background corpus: the built IDF file if there is one, else the bundled table"""
+    global _background
+    with _background_lock:
+        if _background is None:
+            if os.path.exists(KEYWORD_IDF_FILE):
+                try:
+                    frequencies = MappedFrequencies(KEYWORD_IDF_FILE)
+                    _background = Background(frequencies.documents, frequencies)
+                except (OSError, ValueError, struct.error) as e:
+                    print(f"Could not load {KEYWORD_IDF_FILE}, using the bundled background: {e}")
+            if _background is None:
+                _background = load_background()
+        return _background
+
+def segments(text):
+    """Token lists of the phrase-bounded segments of text"""
+    return [tokens for tokens in (TOKEN_PATTERN.findall(part) for part in SEGMENT_PATTERN.split(text.lower())) if tokens]
+
+def is_candidate_token(token):
+    return len(token) > 1 and token not in STOP_WORDS and not re.fullmatch(r"[\d.,'/+-]+", token)
+
+def text_ngrams(text, max_tokens=MAX_PHRASE_TOKENS):
+    """Every phrase of up to max_tokens tokens in text, for checking which keywords a text contains"""
+    phrases = set()
+    for tokens in segments(text):
+        for i in range(len(tokens)):
+            for n in range(1, min(max_tokens, len(tokens) - i) + 1):
+                phrases.add(" ".join(tokens[i:i + n]))
+    return phrases
+
+def rank_keywords(text, top_k=20):
+    """[(phrase, score)] of the top_k keywords of text, best first"""
+    counts = {}
+    first_seen = {}
+    position = 0
+    for tokens in segments(text):
+        run = []
+        for token in tokens + [""]:
+            if token and is_candidate_token(token):
+                run.append(token)
+                # Phrases ending at this token: one per length
+                for n in range(1, min(MAX_PHRASE_TOKENS, len(run)) + 1):
+                    phrase = " ".join(run[-n:])
+                    counts[phrase] = counts.get(phrase, 0) + 1
+                    first_seen.setdefault(phrase, position)
+            else:
+                run = []
+            position += 1
+    if not counts:
+        return []
+
+    background = get_background()
+    known_terms = get_taxonomy().index
+    scored = []
+    subsumed = set()
+    for phrase, count in counts.items():
+        words = phrase.split(" ")
+        known = phrase in known_terms
+        if not known and (words[0] in FILLER_WORDS or words[-1] in FILLER_WORDS):
+            continue
+        # A word mentioned once is rarely what the posting is about, unless it is a known skill
+        if count < 2 and not known and len(words) == 1:
+            continue
+        if len(words) > 1:
+            # A one-off word sequence is rarely a phrase, unless it is a known skill
+            if count < 2 and not known:
+                continue
+            # Words that only ever occur inside this phrase are covered by it
+            for n in range(1, len(words)):
+                for i in range(len(words) - n + 1):
+                    part = " ".join(words[i:i + n])
+                    if counts.get(part, 0) <= count:
+                        subsumed.add(part)
+        idf = sum(background.idf(word) for word in words) / len(words)
+        score = (1 + math.log(count)) * idf
+        score *= 1 + POSITION_WEIGHT * (1 - first_seen[phrase] / position)
+        score *= 1 + PHRASE_WEIGHT * (len(words) - 1)
+        if known:
+            score *= KNOWN_SKILL_WEIGHT
+        scored.append((-score, first_seen[phrase], phrase))
+
+    best = heapq.nsmallest(top_k, (item for item in scored if item[2] not in subsumed))
+    return [(phrase, round(-score, 3)) for score, first, phrase in best]
+
+def canonical_keywords(phrases):
+    """{phrase: match key} where taxonomy synonyms share their skill's canonical name ("spark" and
+    "apache spark" both map to "apache spark") and other phrases are their own key"""
+    taxonomy = get_taxonomy()
+    return {
+        phrase: taxonomy.skills[taxonomy.index[phrase]].lower() if phrase in taxonomy.index else phrase
+        for phrase in phrases
+    }
+
+def extract_keywords(text, top_k=20):
+    """The top_k keyword phrases of text, best first"""
+    return [phrase for phrase, score in rank_keywords(text, top_k)]
+
+def compact_text(text, max_chars, top_k=40):
+    """Shorten text to about max_chars by keeping its most keyword-dense lines and sentences, in original order"""
+    if len(text) <= max_chars:
+        return text
+
+    keywords = dict(rank_keywords(text, top_k))
+    sentences = [sentence.strip() for line in text.splitlines() for sentence in re.split(r"(?<=[.!?])\s+", line)]
+    sentences = [sentence for sentence in sentences if sentence]
+    ranked = []
+    for index, sentence in enumerate(sentences):
+        found = text_ngrams(sentence).intersection(keywords)
+        ranked.append((-sum(keywords[phrase] for phrase in found) / math.sqrt(len(sentence)), index))
+
+    # The first line is usually the job title; keep it whatever its score
+    kept = {0}
+    used = len(sentences[0])
+    for score, index in sorted(ranked):
+        if score == 0 or index in kept:
+            continue
+        if used + len(sentences[index]) + 1 > max_chars:
+            continue
+        kept.add(index)
+        used += len(sentences[index]) + 1
+    return "\n".join(sentences[index] for index in sorted(kept))
@@ -0,0 +1,128 @@
+"""Asyncio load generator for the app's generation flows
+
+Runs the same backend calls as each app.py flow, concurrently, and reports throughput and tail latency.
+Point GEMINI_API_ENDPOINT at the mock server (python -m cvolve mock-llm) to avoid spending Gemini quota.
+"""
+import re
+import time
+import random
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Relative weight of each flow in the request mix
+DEFAULT_MIX = {"cv": 4, "cover_letter": 2, "interview_qa": 1, "ats": 2}
+
+SAMPLE_RESUME = """JANE DOE
++44 20 7946 0000 | jane.doe@example.com | London, UK
+Data engineer with ten years of experience building Python, SQL and Airflow pipelines on AWS.
+Acme Corp | Senior Data Engineer | 2018 - 2024
+Built batch and streaming pipelines, owned the dbt models and the Snowflake warehouse.
+Globex | Data Engineer | 2014 - 2018
+Migrated reporting to Spark and Kafka, automated data quality checks.
+MSc Computer Science | University of Manchester | 2012
+"""
+
+SAMPLE_JD = """Job title: Senior Data Engineer.
+We are looking for a Senior Data Engineer with Python, SQL, Airflow, dbt, Snowflake, Kafka and AWS experience
+to design reliable data pipelines, own data modeling and partner with analytics stakeholders.
+"""
+
+SECTIONS = {
+    "Professional Summary": True, "Key Skills": True, "Work Experience": True, "Education": True,
+    "Certifications": True, "Projects": True
+}
+
+def parse_mix(value):
+    """Parse "cv=4,ats=1" into a flow weight dict"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown flow: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def run_flow(flow, request_number, resume_text, generation_mode, record_user=None):
+    """One request of a flow, doing the same work as the corresponding app.py handler"""
+    from cv_generator import generate_cv_document, generate_cover_letter, generate_interview_qa, export_interview_qa, analyze_cv_ats_score
+    from templates import apply_template, create_word_document
+
+    # A unique JD per request keeps request coalescing and the LLM cache from hiding load
+    jd = f"{SAMPLE_JD}\nRequisition {request_number}"
+
+    if flow == "cv":
+        started = time.time()
+        cv_text, structured_cv = generate_cv_document(resume_text, jd, 90, "professional", SECTIONS, generation_mode=generation_mode)
+        apply_template(structured_cv or cv_text.replace("**", ""), "professional")
+        create_word_document(cv_text)
+        if record_user:
+            from database import save_cv_generation
+            from utils import calculate_ats_score
+            save_cv_generation(record_user, jd, resume_text, cv_text, "professional",
+                               calculate_ats_score(cv_text, jd), 90, time.time() - started)
+    elif flow == "cover_letter":
+        generate_cover_letter(resume_text, jd)
+    elif flow == "interview_qa":
+        export_interview_qa(generate_interview_qa(resume_text, jd))
+    elif flow == "ats":
+        analyze_cv_ats_score(resume_text, jd)
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+async def run_load(requests=100, concurrency=10, mix=None, resume_text=SAMPLE_RESUME, generation_mode="standard",
+                   record_user=None, seed=0):
+    """Run requests across the flow mix with bounded concurrency and return per-flow results"""
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    flows = rng.choices(list(mix), weights=list(mix.values()), k=requests)
+    results = defaultdict(lambda: {"latencies": [], "errors": defaultdict(int)})
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def one(request_number, flow):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await loop.run_in_executor(
+                        executor, run_flow, flow, request_number, resume_text, generation_mode, record_user
+                    )
+                    results[flow]["latencies"].append(time.perf_counter() - started)
+                except Exception as e:
+                    # Group errors by message without the per-request URL
+                    results[flow]["errors"][re.sub(r"\S+://\S+", "<url>", str(e))[:100]] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i, flow) for i, flow in enumerate(flows)))
+        elapsed = time.perf_counter() - started
+
+    return results, elapsed
+
+def format_report(results, elapsed):
+    """Throughput and latency percentiles per flow as a text table"""
+    lines = [
+        f"{'flow':<14}{'ok':>6}{'errors':>8}{'req/s':>8}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'max s':>9}"
+    ]
+    total_ok = total_errors = 0
+    for flow in sorted(results):
+        latencies = sorted(results[flow]["latencies"])
+        errors = sum(results[flow]["errors"].values())
+        total_ok += len(latencies)
+        total_errors += errors
+        lines.append(
+            f"{flow:<14}{len(latencies):>6}{errors:>8}{len(latencies) / elapsed:>8.2f}"
+            f"{percentile(latencies, 0.5):>9.2f}{percentile(latencies, 0.95):>9.2f}"
+            f"{percentile(latencies, 0.99):>9.2f}{(latencies[-1] if latencies else 0):>9.2f}"
+        )
+    lines.append(f"Total: {total_ok} ok, {total_errors} errors in {elapsed:.1f}s ({total_ok / elapsed:.2f} req/s)")
+    for flow in sorted(results):
+        for error, count in results[flow]["errors"].items():
+            lines.append(f"  {flow}: {count} x {error}")
+    return "\n".join(lines)
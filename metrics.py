@@ -0,0 +1,161 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Port of the /metrics endpoint started by start_metrics_server (unset = disabled)
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+# Interface the /metrics endpoint listens on; loopback by default so metrics aren't exposed on every interface
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Histogram buckets in seconds, from fast DB calls up to long multi-call generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_metrics = []
+_server = None
+_server_lock = threading.Lock()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.values = {}
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_number(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+# Database
+DB_CONNECTIONS = Counter("cvolve_db_connections_total", "Direct PostgreSQL connections opened by get_db_connection")
+DB_CONNECT_SECONDS = Histogram("cvolve_db_connect_seconds", "Time to open a direct PostgreSQL connection")
+DB_POOL_CHECKOUTS = Counter("cvolve_db_pool_checkouts_total", "Pooled connection checkouts by outcome", ["outcome"])
+DB_POOL_HOLD_SECONDS = Histogram("cvolve_db_pool_hold_seconds", "Time a pooled connection was held")
+
+# Gemini
+LLM_REQUESTS = Counter("cvolve_llm_requests_total", "Gemini generate_content calls by call site and outcome", ["call", "outcome"])
+LLM_REQUEST_SECONDS = Histogram("cvolve_llm_request_seconds", "Gemini generate_content latency", ["call"])
+LLM_TTFB_SECONDS = Histogram("cvolve_llm_ttfb_seconds", "Time to the first streamed Gemini chunk", ["call"])
+LLM_CACHE_REQUESTS = Counter("cvolve_llm_cache_requests_total", "In-process LLM response cache lookups", ["result"])
+
+# Documents
+RESUME_EXTRACT_SECONDS = Histogram("cvolve_resume_extract_seconds", "Resume text extraction time", ["file_type"])
+RENDER_SECONDS = Histogram("cvolve_render_seconds", "CV export render time", ["format", "template"])
+EXPORT_CACHE_REQUESTS = Counter("cvolve_export_cache_requests_total", "Session export cache lookups", ["result"])
+
+# Errors that are handled without surfacing to the user
+HANDLED_ERRORS = Counter("cvolve_handled_errors_total", "Errors caught and swallowed by fallbacks", ["where"])
+
+@contextmanager
+def timed(histogram, counter=None, **labels):
+    """Observe the block's duration and, if a counter is given, count it with outcome=ok or error"""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+        if counter is not None:
+            counter.inc(outcome=outcome, **labels)
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves GET /metrics"""
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the app logs
+        pass
+
+def start_metrics_server(port=None, host=None):
+    """Start the /metrics endpoint in a daemon thread once per process; return the server or None if disabled"""
+    global _server
+    port = port or METRICS_PORT
+    host = host or METRICS_HOST
+    if not port:
+        return None
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
@@ -0,0 +1,217 @@
+"""Local stand-in for the Gemini REST API, for load testing without spending quota
+
+Start it with `python -m cvolve mock-llm` and point the app at it with GEMINI_API_ENDPOINT=http://localhost:8090.
+"""
+import os
+import re
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned responses shared with the benchmark suite's Gemini stub
+RESPONSES_PATH = os.getenv(
+    "MOCK_LLM_RESPONSES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures", "gemini_responses.json")
+)
+
+GENERATE_PATH = re.compile(r"^/v1(?:beta)?/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$")
+
+ERROR_STATUSES = {
+    429: ("RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota). [mock]"),
+    503: ("UNAVAILABLE", "The model is overloaded. Please try again later. [mock]")
+}
+
+class MockLLMConfig:
+    """Latency distribution and error injection rates"""
+    def __init__(self, latency_median=2.0, latency_sigma=0.5, ttfb_fraction=0.2, stream_chunks=8,
+                 rate_429=0.0, rate_503=0.0, rate_max_tokens=0.0, seed=None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.ttfb_fraction = ttfb_fraction
+        self.stream_chunks = stream_chunks
+        self.rate_429 = rate_429
+        self.rate_503 = rate_503
+        self.rate_max_tokens = rate_max_tokens
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample_latency(self):
+        """Total response time in seconds, log-normally distributed around the median"""
+        with self.lock:
+            return self.latency_median * self.random.lognormvariate(0, self.latency_sigma)
+
+    def sample_outcome(self):
+        """"ok", "max_tokens" or an HTTP error status to inject"""
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.rate_429:
+            return 429
+        roll -= self.rate_429
+        if roll < self.rate_503:
+            return 503
+        roll -= self.rate_503
+        if roll < self.rate_max_tokens:
+            return "max_tokens"
+        return "ok"
+
+def load_responses(path=RESPONSES_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+def _schema_key(schema):
+    """Name of the app's pydantic model a responseSchema was generated from, matched by its properties"""
+    properties = set((schema or {}).get("properties", {}))
+    if {"roles", "summary_keywords"} <= properties:
+        return "CVPlan"
+    if {"roles", "summary"} <= properties:
+        return "StructuredCV"
+    for key, field in (("CVSummaryResult", "summary"), ("CVSkillsResult", "skills"), ("CVBulletsResult", "bullets")):
+        if properties == {field}:
+            return key
+    return None
+
+def pick_response(body, responses):
+    """Choose the canned output for a generateContent request body"""
+    generation_config = body.get("generationConfig") or body.get("generation_config") or {}
+    schema = generation_config.get("responseSchema") or generation_config.get("response_schema")
+    mime_type = generation_config.get("responseMimeType") or generation_config.get("response_mime_type")
+    prompt = " ".join(
+        part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+    )
+
+    key = _schema_key(schema) if schema else None
+    if key is None:
+        if mime_type == "application/json":
+            key = "ats"
+        elif "interview questions" in prompt:
+            key = "interview_qa"
+        elif "cover letter" in prompt:
+            key = "cover_letter"
+        else:
+            key = "cv_text"
+
+    response = responses[key]
+    return response if isinstance(response, str) else json.dumps(response), len(prompt)
+
+def _chunk(text, finish_reason=None, prompt_chars=0):
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finish_reason:
+        candidate["finishReason"] = finish_reason
+    chunk = {"candidates": [candidate], "modelVersion": "mock"}
+    if finish_reason:
+        prompt_tokens = prompt_chars // 4
+        output_tokens = len(text) // 4
+        chunk["usageMetadata"] = {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens
+        }
+    return chunk
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Serves generateContent and streamGenerateContent"""
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        match = GENERATE_PATH.match(self.path.split("?")[0])
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not match:
+            self._send_json(404, {"error": {"code": 404, "message": f"Unknown path {self.path}", "status": "NOT_FOUND"}})
+            return
+
+        config = self.server.config
+        latency = config.sample_latency()
+        outcome = config.sample_outcome()
+        self.server.count(outcome)
+
+        if outcome in ERROR_STATUSES:
+            # Real quota and overload errors come back quickly
+            time.sleep(min(latency, 0.05))
+            status, message = ERROR_STATUSES[outcome]
+            self._send_json(outcome, {"error": {"code": outcome, "message": message, "status": status}})
+            return
+
+        text, prompt_chars = pick_response(body, self.server.responses)
+        finish_reason = "STOP"
+        if outcome == "max_tokens":
+            text = text[:max(1, len(text) // 2)]
+            finish_reason = "MAX_TOKENS"
+
+        if match.group("method") == "generateContent":
+            time.sleep(latency)
+            self._send_json(200, _chunk(text, finish_reason, prompt_chars))
+        else:
+            self._stream(text, finish_reason, prompt_chars, latency)
+
+    def _stream(self, text, finish_reason, prompt_chars, latency):
+        """Stream a JSON array of response chunks (the REST transport's non-SSE streaming format)"""
+        chunk_count = max(1, min(self.server.config.stream_chunks, len(text)))
+        size = -(-len(text) // chunk_count)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        ttfb = latency * self.server.config.ttfb_fraction
+        gap = (latency - ttfb) / max(1, len(pieces) - 1)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        time.sleep(ttfb)
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(gap)
+            last = i == len(pieces) - 1
+            payload = json.dumps(_chunk(piece, finish_reason if last else None, prompt_chars))
+            self._write_chunk(("[" if i == 0 else ",\r\n") + payload + ("]" if last else ""))
+        self._write_chunk("")
+
+    def _write_chunk(self, data):
+        data = data.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+class MockLLMServer(ThreadingHTTPServer):
+    """HTTP server holding the mock configuration, canned responses and outcome counts"""
+    daemon_threads = True
+
+    def __init__(self, address, config, responses):
+        super().__init__(address, MockLLMHandler)
+        self.config = config
+        self.responses = responses
+        self.outcomes = {}
+        self.outcomes_lock = threading.Lock()
+
+    def count(self, outcome):
+        with self.outcomes_lock:
+            self.outcomes[str(outcome)] = self.outcomes.get(str(outcome), 0) + 1
+
+def serve(host="127.0.0.1", port=8090, config=None, responses_path=RESPONSES_PATH):
+    """Run the mock Gemini server until interrupted"""
+    server = MockLLMServer((host, port), config or MockLLMConfig(), load_responses(responses_path))
+    print(f"Mock Gemini API listening on http://{host}:{port} (set GEMINI_API_ENDPOINT to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served outcomes: {server.outcomes}")
+
+def start_in_thread(host="127.0.0.1", port=0, config=None, responses_path=RESPONSES_PATH):
+    """Start the mock server in a daemon thread and return it (port=0 picks a free port)"""
+    server = MockLLMServer((host, port), config or MockLLMConfig(), load_responses(responses_path))
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server
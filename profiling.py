@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import glob
+import cProfile
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Profile every rerun when set (admins can also enable it per session with ?profile=1)
+PROFILE_ENABLED = os.getenv("CVOLVE_PROFILE", "").lower() in ("1", "true", "yes")
+
+# "sample" writes collapsed stacks (.folded) for flamegraph.pl/speedscope; "cprofile" writes .pstats
+PROFILE_MODE = os.getenv("CVOLVE_PROFILE_MODE", "sample")
+
+# Only reruns slower than this are written to disk
+PROFILE_THRESHOLD_MS = float(os.getenv("CVOLVE_PROFILE_THRESHOLD_MS", "500"))
+
+# Profiles are written to PROFILE_DIR/<session id>/
+PROFILE_DIR = os.getenv("CVOLVE_PROFILE_DIR", "profiles")
+
+# Seconds between stack samples in sample mode
+SAMPLE_INTERVAL = float(os.getenv("CVOLVE_PROFILE_INTERVAL", "0.005"))
+
+# Oldest profiles of a session are deleted beyond this count
+MAX_PROFILES_PER_SESSION = 50
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread and counts collapsed stacks"""
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def folded(self):
+        """Collapsed stacks, one "frame;frame;frame count" line per unique stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _session_dir(session_id):
+    path = os.path.join(PROFILE_DIR, session_id or "default")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _prune(path):
+    profiles = sorted(glob.glob(os.path.join(path, "*.*")), key=os.path.getmtime)
+    for old_profile in profiles[:-MAX_PROFILES_PER_SESSION]:
+        os.remove(old_profile)
+
+@contextmanager
+def profile_rerun(session_id, enabled=True, label="rerun"):
+    """Profile the block and write a profile file if it ran longer than PROFILE_THRESHOLD_MS"""
+    if not enabled:
+        yield
+        return
+
+    profiler = None
+    sampler = None
+    if PROFILE_MODE == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        # st.rerun()/st.stop() end the block with an exception; the rerun is still worth keeping
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+
+        if elapsed_ms >= PROFILE_THRESHOLD_MS:
+            try:
+                path = _session_dir(session_id)
+                base = os.path.join(path, f"{time.strftime('%Y%m%d-%H%M%S')}_{label}_{elapsed_ms:.0f}ms")
+                if profiler:
+                    profiler.dump_stats(f"{base}.pstats")
+                else:
+                    with open(f"{base}.folded", "w") as f:
+                        f.write(sampler.folded())
+                _prune(path)
+            except OSError as e:
+                logger.warning("Could not write profile: %s", e)
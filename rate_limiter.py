@@ -0,0 +1,246 @@
+import os
+import time
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+
+# Per-user bucket: burst size and sustained requests per minute
+USER_BUCKET_CAPACITY = float(os.getenv("RATE_LIMIT_USER_CAPACITY", "5"))
+USER_REFILL_PER_MINUTE = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "6"))
+
+# Global bucket shared by every user: protects the Gemini quota
+GLOBAL_BUCKET_CAPACITY = float(os.getenv("RATE_LIMIT_GLOBAL_CAPACITY", "60"))
+GLOBAL_REFILL_PER_MINUTE = float(os.getenv("RATE_LIMIT_GLOBAL_PER_MINUTE", "120"))
+
+# "memory" (per process) or "postgres" (shared by every replica)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+
+GLOBAL_BUCKET_KEY = "global"
+
+# Seconds between sweeps of the in-memory store for buckets that have refilled completely
+MEMORY_SWEEP_INTERVAL = 60
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a rate limit check"""
+    allowed: bool
+    retry_after: float = 0.0
+    scope: str = ""
+
+    @property
+    def message(self):
+        """User-facing explanation of a rejection"""
+        if self.allowed:
+            return ""
+        wait = max(1, int(self.retry_after + 0.999))
+        if self.scope == "global":
+            return f"⏳ The service is busy right now. Please try again in {wait} seconds."
+        return f"⏳ You're sending requests too quickly. Please try again in {wait} seconds."
+
+class TokenBucket:
+    """Thread-safe in-process token bucket (clock is injectable for tests)"""
+    def __init__(self, capacity, refill_per_second, clock=time.monotonic):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def try_acquire(self, cost=1.0):
+        """Take tokens if available; return (allowed, seconds until enough tokens)"""
+        with self.lock:
+            self._refill(self.clock())
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return True, 0.0
+            return False, (cost - self.tokens) / self.refill_per_second
+
+    def refund(self, cost=1.0):
+        """Give back tokens taken for a request that was rejected elsewhere"""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + cost)
+
+    def is_full(self, now):
+        """True once the bucket has refilled, when it is no different from a new one"""
+        with self.lock:
+            self._refill(now)
+            return self.tokens >= self.capacity
+
+class MemoryBucketStore:
+    """Token buckets held in this process; full buckets are dropped periodically, so idle users cost nothing"""
+    def __init__(self, clock=time.monotonic):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.clock = clock
+        self.swept_at = clock()
+
+    def _sweep(self, now):
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if not bucket.is_full(now)}
+        self.swept_at = now
+
+    def _bucket(self, key, capacity, refill_per_second):
+        with self.lock:
+            now = self.clock()
+            if now - self.swept_at >= MEMORY_SWEEP_INTERVAL:
+                self._sweep(now)
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(capacity, refill_per_second, self.clock)
+            return bucket
+
+    def try_acquire(self, key, capacity, refill_per_second, cost=1.0):
+        return self._bucket(key, capacity, refill_per_second).try_acquire(cost)
+
+    def refund(self, key, capacity, refill_per_second, cost=1.0):
+        self._bucket(key, capacity, refill_per_second).refund(cost)
+
+    def bucket_count(self):
+        return len(self.buckets)
+
+class PostgresBucketStore:
+    """Token buckets stored in Postgres so every app replica shares the same limits"""
+    def __init__(self):
+        self.init_table()
+
+    def init_table(self):
+        """Initialize the rate limit bucket table"""
+        from database import pooled_connection
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    bucket_key VARCHAR(255) PRIMARY KEY,
+                    tokens DOUBLE PRECISION NOT NULL,
+                    updated_at TIMESTAMP NOT NULL DEFAULT clock_timestamp()
+                )
+            """)
+
+            cursor.close()
+
+    def try_acquire(self, key, capacity, refill_per_second, cost=1.0):
+        """Refill and take tokens in a single conditional upsert"""
+        from database import pooled_connection
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            params = {'key': key, 'capacity': capacity, 'rate': refill_per_second, 'cost': cost}
+            cursor.execute("""
+                INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at)
+                VALUES (%(key)s, %(capacity)s - %(cost)s, clock_timestamp())
+                ON CONFLICT (bucket_key) DO UPDATE SET
+                tokens = LEAST(%(capacity)s, rate_limit_buckets.tokens
+                    + EXTRACT(EPOCH FROM clock_timestamp() - rate_limit_buckets.updated_at) * %(rate)s) - %(cost)s,
+                updated_at = clock_timestamp()
+                WHERE LEAST(%(capacity)s, rate_limit_buckets.tokens
+                    + EXTRACT(EPOCH FROM clock_timestamp() - rate_limit_buckets.updated_at) * %(rate)s) >= %(cost)s
+                RETURNING tokens
+            """, params)
+            allowed = cursor.fetchone() is not None
+
+            retry_after = 0.0
+            if not allowed:
+                cursor.execute("""
+                    SELECT LEAST(%(capacity)s, tokens
+                        + EXTRACT(EPOCH FROM clock_timestamp() - updated_at) * %(rate)s)
+                    FROM rate_limit_buckets WHERE bucket_key = %(key)s
+                """, params)
+                row = cursor.fetchone()
+                available = float(row[0]) if row else 0.0
+                retry_after = max(0.0, (cost - available) / refill_per_second)
+
+            cursor.close()
+        return allowed, retry_after
+
+    def refund(self, key, capacity, refill_per_second, cost=1.0):
+        """Give back tokens taken for a request that was rejected by another bucket"""
+        from database import pooled_connection
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE rate_limit_buckets SET tokens = LEAST(%s, tokens + %s)
+                WHERE bucket_key = %s
+            """, (capacity, cost, key))
+
+            cursor.close()
+
+    def bucket_count(self):
+        from database import pooled_connection
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT COUNT(*) FROM rate_limit_buckets
+            """)
+
+            result = cursor.fetchone()
+            cursor.close()
+        return result[0] if result else 0
+
+class RateLimiter:
+    """Per-user and global token-bucket limiter for LLM-backed actions"""
+    def __init__(self, store,
+                 user_capacity=USER_BUCKET_CAPACITY, user_refill_per_minute=USER_REFILL_PER_MINUTE,
+                 global_capacity=GLOBAL_BUCKET_CAPACITY, global_refill_per_minute=GLOBAL_REFILL_PER_MINUTE):
+        self.store = store
+        self.user_limits = (user_capacity, user_refill_per_minute / 60.0)
+        self.global_limits = (global_capacity, global_refill_per_minute / 60.0)
+        self.stats = defaultdict(lambda: {"allowed": 0, "rejected_user": 0, "rejected_global": 0})
+        self.stats_lock = threading.Lock()
+
+    def _record(self, action, outcome):
+        with self.stats_lock:
+            self.stats[action][outcome] += 1
+
+    def acquire(self, user_email, action="generate", cost=1.0):
+        """Take one request's worth of tokens from the user's bucket and the global bucket"""
+        user_key = f"user:{user_email}"
+        allowed, retry_after = self.store.try_acquire(user_key, *self.user_limits, cost=cost)
+        if not allowed:
+            self._record(action, "rejected_user")
+            return RateLimitResult(False, retry_after, "user")
+
+        allowed, retry_after = self.store.try_acquire(GLOBAL_BUCKET_KEY, *self.global_limits, cost=cost)
+        if not allowed:
+            # The request never runs, so the user shouldn't pay for it
+            self.store.refund(user_key, *self.user_limits, cost=cost)
+            self._record(action, "rejected_global")
+            return RateLimitResult(False, retry_after, "global")
+
+        self._record(action, "allowed")
+        return RateLimitResult(True)
+
+    def refund(self, user_email, cost=1.0):
+        """Give back an allowed request's tokens when it was rejected afterwards (e.g. for lack of credits)"""
+        self.store.refund(f"user:{user_email}", *self.user_limits, cost=cost)
+        self.store.refund(GLOBAL_BUCKET_KEY, *self.global_limits, cost=cost)
+
+    def get_stats(self):
+        """Allowed/rejected counts per action since this process started"""
+        with self.stats_lock:
+            actions = {action: dict(counts) for action, counts in self.stats.items()}
+        return {
+            "backend": type(self.store).__name__,
+            "buckets": self.store.bucket_count(),
+            "user_limit": {"capacity": self.user_limits[0], "per_minute": self.user_limits[1] * 60},
+            "global_limit": {"capacity": self.global_limits[0], "per_minute": self.global_limits[1] * 60},
+            "actions": actions
+        }
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Process-wide rate limiter shared by every Streamlit session"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            store = PostgresBucketStore() if RATE_LIMIT_BACKEND == "postgres" else MemoryBucketStore()
+            _rate_limiter = RateLimiter(store)
+        return _rate_limiter
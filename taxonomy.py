@@ -0,0 +1,219 @@
+"""Skills and domain taxonomy used for domain detection and skill extraction
+
+The editable source is data/skills_taxonomy.txt. It is compiled into a hash index from normalized phrases
+to skills, and text is scanned once with longest-match lookups. The compiled index is cached
+in a compact binary file next to the source and rebuilt automatically when the source changes; run
+`python -m cvolve compile-taxonomy` to build it ahead of deployment.
+"""
+import os
+import re
+import zlib
+import struct
+import hashlib
+import threading
+from array import array
+from collections import defaultdict
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+TAXONOMY_SOURCE = os.getenv("TAXONOMY_SOURCE", os.path.join(DATA_DIR, "skills_taxonomy.txt"))
+TAXONOMY_BINARY = os.getenv("TAXONOMY_BINARY", os.path.join(DATA_DIR, "skills_taxonomy.bin"))
+
+BINARY_MAGIC = b"CVTX"
+BINARY_VERSION = 1
+HEADER = struct.Struct("<4sH32sIII")
+
+# Tokens keep the characters that are part of skill names: C++, C#, .NET, Node.js, CI/CD, A/B, T-SQL
+TOKEN_PATTERN = re.compile(r"\.?[a-z0-9][a-z0-9+#]*(?:[./'-][a-z0-9+#]+)*")
+
+# Soft skills shared by every kind of role: extracted as skills, but never chosen as a text's domain
+GENERAL_DOMAINS = ("professional_skills",)
+
+_taxonomy = None
+_taxonomy_lock = threading.Lock()
+
+def tokenize(text):
+    """Lowercase tokens of text, as used for both taxonomy terms and scanned documents"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def term_variants(term):
+    """A term as written plus its spaced and joined forms when it is hyphenated (front-end, front end, frontend)"""
+    variants = {" ".join(tokenize(term))}
+    if "-" in term:
+        variants.add(" ".join(tokenize(term.replace("-", " "))))
+        variants.add(" ".join(tokenize(term.replace("-", ""))))
+    return {variant for variant in variants if variant}
+
+class Taxonomy:
+    """Domains, canonical skills and the phrase index that maps text onto them"""
+    def __init__(self, domains, skills, skill_domains, terms, term_skills, source_hash=b"\0" * 32):
+        self.domains = domains  # [(key, label)]
+        self.skills = skills  # canonical skill names
+        self.skill_domains = skill_domains  # per skill: bitmask of domain indexes
+        self.index = dict(zip(terms, term_skills))
+        self.max_terms = max((term.count(" ") + 1 for term in terms), default=1)
+        self.source_hash = source_hash
+        self.domain_index = {key: i for i, (key, label) in enumerate(domains)}
+        self.general_domains = {self.domain_index[key] for key in GENERAL_DOMAINS if key in self.domain_index}
+
+    def match(self, text):
+        """Skill indexes found in text, in order of appearance (longest phrase wins at each position)"""
+        tokens = tokenize(text)
+        found = []
+        i = 0
+        while i < len(tokens):
+            for length in range(min(self.max_terms, len(tokens) - i), 0, -1):
+                skill = self.index.get(" ".join(tokens[i:i + length]))
+                if skill is not None:
+                    found.append(skill)
+                    i += length
+                    break
+            else:
+                i += 1
+        return found
+
+    def extract_skills(self, text):
+        """Canonical names of the skills mentioned in text, unique, in order of first mention"""
+        return [self.skills[skill] for skill in dict.fromkeys(self.match(text))]
+
+    def domains_of(self, skill_index):
+        mask = self.skill_domains[skill_index]
+        return [i for i in range(len(self.domains)) if mask >> i & 1]
+
+    def classify(self, text, skills=None):
+        """[(domain key, label, score)] best first; a skill shared by n domains adds 1/n to each"""
+        scores = defaultdict(float)
+        for skill in dict.fromkeys(self.match(text) if skills is None else skills):
+            domains = self.domains_of(skill)
+            for domain in domains:
+                if domain not in self.general_domains:
+                    scores[domain] += 1 / len(domains)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.domains[domain][0], self.domains[domain][1], round(score, 2)) for domain, score in ranked]
+
+    def skills_in_domains(self, skills, domain_keys):
+        """Canonical names of the given skill indexes that belong to any of the domains, unique, in order"""
+        bits = sum(1 << self.domain_index[key] for key in domain_keys)
+        return [self.skills[skill] for skill in dict.fromkeys(skills) if self.skill_domains[skill] & bits]
+
+    def domain_skills(self, domain_key):
+        """Canonical skills of a domain"""
+        bit = 1 << self.domain_index[domain_key]
+        return [name for name, mask in zip(self.skills, self.skill_domains) if mask & bit]
+
+    def to_bytes(self):
+        """Compact binary form: header, then zlib-compressed string table and index arrays"""
+        terms = list(self.index)
+        strings = [key for key, label in self.domains] + [label for key, label in self.domains] + self.skills + terms
+        payload = b"\0".join(string.encode("utf-8") for string in strings)
+        masks = array("Q", self.skill_domains)
+        term_skills = array("I", (self.index[term] for term in terms))
+        body = struct.pack("<I", len(payload)) + payload + masks.tobytes() + term_skills.tobytes()
+        header = HEADER.pack(BINARY_MAGIC, BINARY_VERSION, self.source_hash, len(self.domains), len(self.skills), len(terms))
+        return header + zlib.compress(body, 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, source_hash, domain_count, skill_count, term_count = HEADER.unpack_from(data)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError("Not a compiled taxonomy of this version")
+        body = zlib.decompress(data[HEADER.size:])
+        (payload_size,) = struct.unpack_from("<I", body)
+        strings = body[4:4 + payload_size].decode("utf-8").split("\0")
+        offset = 4 + payload_size
+        masks = array("Q")
+        masks.frombytes(body[offset:offset + 8 * skill_count])
+        term_skills = array("I")
+        term_skills.frombytes(body[offset + 8 * skill_count:])
+
+        keys = strings[:domain_count]
+        labels = strings[domain_count:2 * domain_count]
+        skills = strings[2 * domain_count:2 * domain_count + skill_count]
+        terms = strings[2 * domain_count + skill_count:]
+        if len(terms) != term_count or len(term_skills) != term_count:
+            raise ValueError("Compiled taxonomy is truncated")
+        return cls(list(zip(keys, labels)), skills, list(masks), terms, list(term_skills), source_hash)
+
+def parse_taxonomy(text):
+    """Parse the source format into ([(domain key, label)], {skill: set of domain indexes}, {term: skill})
+
+    "[key] Label" starts a domain; each following line is "Canonical Name | synonym, abbreviation, ...".
+    Lines starting with "#" are comments.
+    A leading "~" keeps the canonical name itself from being matched (for ambiguous names like Go or R).
+    """
+    domains = []
+    skill_domains = {}
+    term_skill = {}
+    for number, raw_line in enumerate(text.splitlines(), 1):
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        header = re.match(r"^\[(\w+)\]\s*(.+)$", line)
+        if header:
+            domains.append((header.group(1), header.group(2).strip()))
+            continue
+        if not domains:
+            raise ValueError(f"Line {number}: skill before the first [domain] header")
+
+        name, _, synonyms = line.partition("|")
+        name = name.strip()
+        match_name = not name.startswith("~")
+        name = name.lstrip("~").strip()
+        skill_domains.setdefault(name, set()).add(len(domains) - 1)
+
+        terms = ([name] if match_name else []) + [synonym.strip() for synonym in synonyms.split(",") if synonym.strip()]
+        for term in terms:
+            for variant in term_variants(term):
+                existing = term_skill.setdefault(variant, name)
+                if existing != name:
+                    raise ValueError(f"Line {number}: '{variant}' already means {existing}, not {name}")
+    if len(domains) > 64:
+        raise ValueError("At most 64 domains are supported")
+    return domains, skill_domains, term_skill
+
+def compile_taxonomy(source_path=TAXONOMY_SOURCE):
+    """Compile the taxonomy source file into a Taxonomy"""
+    with open(source_path, "rb") as f:
+        source = f.read()
+    domains, skill_domains, term_skill = parse_taxonomy(source.decode("utf-8"))
+    skills = sorted(skill_domains, key=str.lower)
+    skill_ids = {name: i for i, name in enumerate(skills)}
+    masks = [sum(1 << domain for domain in skill_domains[name]) for name in skills]
+    terms = sorted(term_skill)
+    return Taxonomy(domains, skills, masks, terms, [skill_ids[term_skill[term]] for term in terms],
+                    hashlib.sha256(source).digest())
+
+def save_taxonomy(taxonomy, path=TAXONOMY_BINARY):
+    """Write the compiled taxonomy atomically and return its size in bytes"""
+    data = taxonomy.to_bytes()
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return len(data)
+
+def load_taxonomy(source_path=TAXONOMY_SOURCE, binary_path=TAXONOMY_BINARY):
+    """Load the compiled taxonomy, recompiling (and re-saving, best effort) if the source has changed"""
+    with open(source_path, "rb") as f:
+        source_hash = hashlib.sha256(f.read()).digest()
+    try:
+        with open(binary_path, "rb") as f:
+            taxonomy = Taxonomy.from_bytes(f.read())
+        if taxonomy.source_hash == source_hash:
+            return taxonomy
+    except (OSError, ValueError, zlib.error, struct.error):
+        pass
+
+    taxonomy = compile_taxonomy(source_path)
+    try:
+        save_taxonomy(taxonomy, binary_path)
+    except OSError as e:
+        print(f"Could not cache compiled taxonomy: {e}")
+    return taxonomy
+
+def get_taxonomy():
+    """Process-wide taxonomy, loaded on first use"""
+    global _taxonomy
+    with _taxonomy_lock:
+        if _taxonomy is None:
+            _taxonomy = load_taxonomy()
+        return _taxonomy
@@ -7,6 +7,12 @@ from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
 from io import BytesIO
 import re
 from reportlab.platypus import HRFlowable
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt, Inches
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from metrics import timed, RENDER_SECONDS
 
 def get_available_templates():
     """Get available CV templates"""
@@ -41,18 +47,19 @@ def get_available_templates():
 def apply_template(cv_content, template_name):
     """Apply selected template to CV content"""
     
-    if template_name == "professional":
-        return create_professional_template(cv_content)
-    elif template_name == "modern":
-        return create_modern_template(cv_content)
-    elif template_name == "creative":
-        return create_creative_template(cv_content)
-    elif template_name == "technical":
-        return create_technical_template(cv_content)
-    elif template_name == "executive":
-        return create_executive_template(cv_content)
-    else:
-        return create_professional_template(cv_content)
+    with timed(RENDER_SECONDS, format="pdf", template=template_name):
+        if template_name == "professional":
+            return create_professional_template(cv_content)
+        elif template_name == "modern":
+            return create_modern_template(cv_content)
+        elif template_name == "creative":
+            return create_creative_template(cv_content)
+        elif template_name == "technical":
+            return create_technical_template(cv_content)
+        elif template_name == "executive":
+            return create_executive_template(cv_content)
+        else:
+            return create_professional_template(cv_content)
 
 def create_professional_template(cv_content):
     """Create professional template PDF"""
@@ -91,7 +98,7 @@ def create_professional_template(cv_content):
     )
     
     # Parse CV content into sections
-    sections = parse_cv_sections(cv_content)
+    sections = get_cv_sections(cv_content)
     # ✅ Enforce 2-page line budget
     sections = trim_sections_to_fit(sections, max_lines=100)
     
@@ -184,7 +191,7 @@ def create_modern_template(cv_content):
         alignment=TA_JUSTIFY        # ✅ Justify text
     )
     
-    sections = parse_cv_sections(cv_content)
+    sections = get_cv_sections(cv_content)
     story = []
     
     # Build modern layout
@@ -241,7 +248,7 @@ def create_creative_template(cv_content):
         alignment=TA_JUSTIFY        # ✅ Justify text
     )
     
-    sections = parse_cv_sections(cv_content)
+    sections = get_cv_sections(cv_content)
     story = []
     
     # Build creative layout
@@ -295,7 +302,7 @@ def create_technical_template(cv_content):
         alignment=TA_JUSTIFY        # ✅ Justify text
     )
     
-    sections = parse_cv_sections(cv_content)
+    sections = get_cv_sections(cv_content)
     story = []
     
     # Build technical layout
@@ -360,7 +367,7 @@ def create_executive_template(cv_content):
         alignment=TA_JUSTIFY        # ✅ Justify text
     )
     
-    sections = parse_cv_sections(cv_content)
+    sections = get_cv_sections(cv_content)
     story = []
     
     # Build executive layout
@@ -379,6 +386,12 @@ def create_executive_template(cv_content):
     buffer.seek(0)
     return buffer
 
+def get_cv_sections(cv_content):
+    """Get renderer sections from CV text, or directly from a structured CV without re-parsing"""
+    if hasattr(cv_content, "to_sections"):
+        return cv_content.to_sections()
+    return parse_cv_sections(cv_content)
+
 def parse_cv_sections(cv_content):
     sections = {}
     current_section = None
@@ -483,3 +496,73 @@ def trim_sections_to_fit(sections, max_lines=100):
     
     return sections  # Return best possible under max_lines
 
+def create_word_document(content):
+    current_section = ""
+    doc = Document()
+
+    # Set narrow margins
+    sections = doc.sections
+    for section in sections:
+        section.top_margin = Inches(0.5)
+        section.bottom_margin = Inches(0.5)
+        section.left_margin = Inches(0.4)
+        section.right_margin = Inches(0.4)
+
+    # Set base font and spacing
+    style = doc.styles['Normal']
+    font = style.font
+    font.name = 'Calibri'
+    font.size = Pt(11)
+
+    for line in content.split('\n'):
+        if not line.strip():
+            continue
+
+        text = line.strip()
+        clean_text = text.replace("**", "")  # ✅ Remove markdown asterisks only
+
+        # Detect if it's a section header (fully uppercase and ends with ":")
+        is_section_header = clean_text.endswith(':') and clean_text == clean_text.upper()
+
+        if is_section_header:
+            current_section = clean_text[:-1].lower()
+            doc.add_paragraph()
+
+        if current_section == "work experience" and "|" in clean_text and not clean_text.startswith("•"):
+            spacer_para = doc.add_paragraph()
+            spacer_para.paragraph_format.space_after = Pt(1)
+
+        para = doc.add_paragraph()
+        run = para.add_run(clean_text)
+
+        # ✅ Keep formatting rules
+        if is_section_header:
+            run.bold = True
+            add_bottom_border(para)
+
+        elif current_section == "work experience" and "|" in clean_text and not clean_text.startswith("•"):
+            run.bold = True
+
+        elif current_section == "projects" and not clean_text.startswith("•"):
+            run.bold = True
+
+        para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        para.paragraph_format.space_after = Pt(2)
+        para.paragraph_format.line_spacing = 1.0
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+def add_bottom_border(paragraph):
+    p = paragraph._p
+    pPr = p.get_or_add_pPr()
+    borders = OxmlElement('w:pBdr')
+    bottom = OxmlElement('w:bottom')
+    bottom.set(qn('w:val'), 'single')
+    bottom.set(qn('w:sz'), '12')     # thickness
+    bottom.set(qn('w:space'), '1')
+    bottom.set(qn('w:color'), 'auto')
+    borders.append(bottom)
+    pPr.append(borders)
@@ -0,0 +1,77 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Stage names recorded for a CV generation, in pipeline order (queue_wait only for queued jobs)
+STAGES = (
+    "queue_wait", "extract", "prompt_build", "llm_ttfb", "llm", "cleanup", "page_fit", "render_pdf", "render_docx"
+)
+
+_current_trace = contextvars.ContextVar("cvolve_trace", default=None)
+
+class Trace:
+    """Stage durations collected while handling one request"""
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        """Add time to a stage (stages entered several times, like LLM calls, accumulate)"""
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_first(self, stage, seconds):
+        """Record a stage only the first time it happens, e.g. time to the first streamed byte"""
+        with self.lock:
+            self.stages.setdefault(stage, seconds)
+
+    def elapsed(self):
+        """Seconds since the trace started"""
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        """Stage durations in seconds, rounded to milliseconds"""
+        with self.lock:
+            return {stage: round(seconds, 3) for stage, seconds in self.stages.items()}
+
+@contextmanager
+def trace():
+    """Collect stage timings for the code run inside the block (including propagated threads)"""
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+def current_trace():
+    """The active trace, or None outside a trace block"""
+    return _current_trace.get()
+
+@contextmanager
+def stage(name):
+    """Time the block as a stage of the active trace (no-op without one)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+def record_stage(name, seconds):
+    """Add a measured duration to the active trace"""
+    current = _current_trace.get()
+    if current is not None:
+        current.add(name, seconds)
+
+def record_first(name, seconds):
+    """Record a duration on the active trace unless the stage was already recorded"""
+    current = _current_trace.get()
+    if current is not None:
+        current.add_first(name, seconds)
+
+def propagate(fn):
+    """Wrap fn so it runs with the caller's trace, e.g. when submitted to a thread pool"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
@@ -7,14 +7,38 @@ import google.generativeai as genai
 from google.generativeai import types
 import streamlit as st
 from dotenv import load_dotenv
+from metrics import timed, LLM_REQUESTS, LLM_REQUEST_SECONDS
+from taxonomy import get_taxonomy
+from keywords import extract_keywords, text_ngrams, canonical_keywords
 
 # Load secrets into environment
 os.environ["DATABASE_URL"] = st.secrets["DATABASE_URL"]
 os.environ["GEMINI_API_KEY"] = st.secrets["GEMINI_API_KEY"]
 
+# JD keyword phrases the ATS keyword score is measured against
+ATS_KEYWORD_COUNT = 30
+
+# Most domains a JD is matched to, and the share of the best domain's score the others need
+MAX_JD_DOMAINS = 3
+JD_DOMAIN_SHARE = 0.5
+
+# Alternative Gemini API server, e.g. the local mock started with `python -m cvolve mock-llm`
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+def configure_gemini():
+    """Configure the Gemini client, talking REST to GEMINI_API_ENDPOINT when it is set"""
+    if GEMINI_API_ENDPOINT:
+        genai.configure(
+            api_key=os.getenv("GEMINI_API_KEY"),
+            transport="rest",
+            client_options={"api_endpoint": GEMINI_API_ENDPOINT}
+        )
+    else:
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
 # Initialize Gemini client
 try:
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    configure_gemini()
     client = genai.GenerativeModel("gemini-2.5-flash")
 except Exception as e:
     print(f"Error initializing Gemini client in utils: {e}")
@@ -23,15 +47,16 @@ except Exception as e:
 def get_gemini_response(prompt: str, model: str = "gemini-2.5-flash") -> str:
     """Get response from Gemini AI with error handling"""
     try:
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))  # ✅ Ensure dynamic config
+        configure_gemini()  # ✅ Ensure dynamic config
         model_instance = genai.GenerativeModel(model)  # ✅ Use dynamic model name
 
-        response = model_instance.generate_content(
-            prompt,
-            generation_config=types.GenerationConfig(
-                temperature=0.2
+        with timed(LLM_REQUEST_SECONDS, LLM_REQUESTS, call="utils"):
+            response = model_instance.generate_content(
+                prompt,
+                generation_config=types.GenerationConfig(
+                    temperature=0.2
+                )
             )
-        )
 
         return response.text if response.text else ""
     except Exception as e:
@@ -60,11 +85,14 @@ def optimize_keywords(cv_content: str, job_description: str = None, target_match
     if not job_description:
         return get_default_analysis()
 
-    # Normalize & extract keyword sets
-    jd_keywords = set(re.findall(r'\b[a-zA-Z][a-zA-Z0-9\-]+\b', job_description.lower()))
-    cv_keywords = set(re.findall(r'\b[a-zA-Z][a-zA-Z0-9\-]+\b', cv_content.lower()))
+    # Ranked JD keyword phrases, and which of them the CV contains. Both sides are compared by canonical skill, so
+    # a synonym in the CV counts ("spark" matches "Apache Spark") and a skill the JD names two ways counts once
+    jd_keywords = {}
+    for kw, key in canonical_keywords(extract_keywords(job_description, top_k=ATS_KEYWORD_COUNT)).items():
+        jd_keywords.setdefault(key, kw)
+    cv_keys = set(canonical_keywords(text_ngrams(cv_content)).values())
 
-    common_keywords = jd_keywords.intersection(cv_keywords)
+    common_keywords = [kw for key, kw in jd_keywords.items() if key in cv_keys]
     keyword_match_pct = round(len(common_keywords) / len(jd_keywords) * 100) if jd_keywords else 0
     keyword_score = min(40, keyword_match_pct)  # Cap at 40
 
@@ -79,7 +107,6 @@ def optimize_keywords(cv_content: str, job_description: str = None, target_match
     # ==== NEW: Domain & Job Title Matching ====
     title_match = 0
     domain_score = 0
-    missing_keywords = list(jd_keywords - cv_keywords)
 
     # Job title extraction
     job_title_match = re.search(r'(?i)(applying for|job title|position:?)\s*([\w\s]+)', job_description)
@@ -92,7 +119,7 @@ def optimize_keywords(cv_content: str, job_description: str = None, target_match
 
     # Domain relevance: if more than 70% of domain terms are missing, penalize
     domain_terms = extract_domain_keywords(job_description)
-    domain_overlap = set(domain_terms).intersection(cv_keywords)
+    domain_overlap = set(domain_terms).intersection(get_taxonomy().extract_skills(cv_content))
     if len(domain_overlap) < max(1, len(domain_terms) * 0.3):
         domain_score = 0
     else:
@@ -113,7 +140,7 @@ def optimize_keywords(cv_content: str, job_description: str = None, target_match
     if domain_score == 0:
         suggestions.append("Align your resume to the domain-specific keywords in the JD")
 
-    missing_keywords = list(jd_keywords - cv_keywords)
+    missing_keywords = [kw for key, kw in jd_keywords.items() if key not in cv_keys]
     filtered_missing_keywords = filter_keywords(missing_keywords)
 
     return {
@@ -138,15 +165,8 @@ def get_default_analysis():
     }
 
 def extract_keywords_from_text(text: str) -> List[str]:
-    """Extract potential keywords from text"""
-    # Remove common words and extract meaningful terms
-    words = re.findall(r'\b[A-Za-z]{3,}\b', text.lower())
-    
-    # Filter out common words
-    common_words = {'the', 'and', 'for', 'with', 'from', 'that', 'this', 'have', 'was', 'were', 'been', 'are', 'will', 'would', 'could', 'should'}
-    keywords = [word for word in set(words) if word not in common_words]
-    
-    return keywords[:20]  # Return top 20 keywords
+    """Top 20 keyword phrases of text, best first"""
+    return extract_keywords(text, top_k=20)
 
 def enforce_page_limit(content: str, max_pages: int = 2) -> str:
     """Enforce page limit by trimming content intelligently"""
@@ -470,14 +490,15 @@ def get_improvement_suggestions(cv_content: str, job_description: str) -> List[s
     return suggestions[:5]  # Return top 5 suggestions
 
 def extract_domain_keywords(job_description: str) -> List[str]:
-    """Extract domain-relevant keywords from JD"""
-    clinical_terms = ['clinic', 'dental', 'oral', 'patient', 'surgery', 'anesthesia', 'teeth', 'hygiene', 'prosthodontics', 'radiographs']
-    tech_terms = ['sql', 'python', 'tableau', 'pipeline', 'dashboard', 'kafka', 'data engineering']
-
-    # You can expand this logic to classify JD domain more smartly
-    if any(word in job_description.lower() for word in clinical_terms):
-        return clinical_terms
-    elif any(word in job_description.lower() for word in tech_terms):
-        return tech_terms
-    return []
+    """Skills the JD asks for from its main domains, as canonical taxonomy names"""
+    taxonomy = get_taxonomy()
+    skills = taxonomy.match(job_description)
+    ranked = taxonomy.classify(job_description, skills=skills)
+    if not ranked:
+        return []
+
+    # A JD can span domains (e.g. clinical + data); keep those scoring close to the best one
+    top_score = ranked[0][2]
+    domains = [key for key, label, score in ranked[:MAX_JD_DOMAINS] if score >= top_score * JD_DOMAIN_SHARE]
+    return taxonomy.skills_in_domains(skills, domains)
 